@@ -1,17 +1,22 @@
+from accounts import user_cache
 from accounts.models import User, Token
 
 class PasswordlessAuthenticationBackend(object):
 
     def authenticate(self, uid):
+        email = Token.consume(uid)
+        if email is None:
+            return None
         try:
-            token = Token.objects.get(uid=uid)
-            return User.objects.get(email=token.email)
+            return User.objects.get(email=email)
         except User.DoesNotExist:
-            return User.objects.create(email=token.email)
-        except Token.DoesNotExist:
-            return None
+            return User.objects.create(email=email)
 
     def get_user(self, email):
+        return user_cache.users.get(email, self.load_user)
+
+    @staticmethod
+    def load_user(email):
         try:
             return User.objects.get(email=email)
         except User.DoesNotExist:
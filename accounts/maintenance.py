@@ -0,0 +1,36 @@
+"""
+Housekeeping for login tokens.
+
+Every login email adds a token, and a token is no use once it has expired,
+whether or not it was used. `purge_login_tokens` deletes those in small
+chunks, each its own short transaction, like lists.maintenance does for
+idle lists.
+"""
+import time
+
+from accounts.models import Token
+
+
+def expired_tokens(now=None):
+    return Token.objects.filter(created_at__lt=Token.expiry_cutoff(now))
+
+
+def purge_login_tokens(chunk_size=1000, pause=0.0, dry_run=False, now=None):
+    """
+    Delete tokens created more than `LOGIN_TOKEN_TTL_MINUTES` ago, oldest
+    first, `chunk_size` at a time. Returns how many were (or, with
+    `dry_run`, would be) deleted.
+    """
+    expired = expired_tokens(now)
+    if dry_run:
+        return expired.count()
+    deleted = 0
+    while True:
+        ids = list(expired.order_by('created_at')
+                   .values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        Token.objects.filter(id__in=ids).delete()
+        deleted += len(ids)
+        if pause:
+            time.sleep(pause)
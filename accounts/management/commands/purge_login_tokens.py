@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from accounts.maintenance import purge_login_tokens
+
+
+class Command(BaseCommand):
+    help = 'Delete login tokens that have expired, used or not.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Tokens deleted per transaction.')
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help='Seconds to wait between transactions.')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        deleted = purge_login_tokens(
+            chunk_size=options['chunk_size'],
+            pause=options['pause'],
+            dry_run=options['dry_run'],
+        )
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(f'{verb} {deleted} login tokens')
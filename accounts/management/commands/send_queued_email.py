@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from accounts.outbox import OutboxWorker
+
+
+class Command(BaseCommand):
+    help = 'Send email from the outbox as it becomes due.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Send what's due now, then exit.")
+        parser.add_argument('--batch-size', type=int,
+                            default=settings.EMAIL_OUTBOX_BATCH_SIZE,
+                            help='Emails claimed at a time.')
+        parser.add_argument('--concurrency', type=int,
+                            default=settings.EMAIL_OUTBOX_CONCURRENCY,
+                            help='Most emails sent at once.')
+        parser.add_argument('--poll-interval', type=float,
+                            default=settings.EMAIL_OUTBOX_POLL_INTERVAL,
+                            help='Seconds to wait when nothing is due.')
+
+    def handle(self, *args, **options):
+        worker = OutboxWorker(batch_size=options['batch_size'],
+                              concurrency=options['concurrency'])
+        try:
+            if options['once']:
+                report = worker.drain()
+                self.stdout.write(
+                    f'Sent {report.sent} emails, {report.retried} to retry, '
+                    f'{report.failed} given up on')
+            else:
+                worker.run(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            worker.close()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 23:40
+from __future__ import unicode_literals
+
+import uuid
+
+from django.db import migrations, models
+import django.utils.timezone
+
+COPY_CHUNK_SIZE = 1000
+
+
+def copy_uids(apps, schema_editor):
+    """
+    Copy each token's uid into the new UUID column. Uids that aren't
+    UUIDs couldn't have come from a login email, so they get a fresh one.
+    """
+    Token = apps.get_model('accounts', 'Token')
+    db_alias = schema_editor.connection.alias
+    last_pk = 0
+    while True:
+        chunk = list(Token.objects.using(db_alias).filter(pk__gt=last_pk)
+                     .order_by('pk').values_list('pk', 'uid')
+                     [:COPY_CHUNK_SIZE])
+        if not chunk:
+            return
+        for pk, uid in chunk:
+            try:
+                new_uid = uuid.UUID(uid)
+            except ValueError:
+                new_uid = uuid.uuid4()
+            Token.objects.using(db_alias).filter(pk=pk).update(
+                new_uid=new_uid)
+        last_pk = chunk[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_auto_20190204_0329'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='token',
+            name='new_uid',
+            field=models.UUIDField(null=True),
+        ),
+        migrations.RunPython(copy_uids, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='token',
+            name='uid',
+        ),
+        migrations.RenameField(
+            model_name='token',
+            old_name='new_uid',
+            new_name='uid',
+        ),
+        migrations.AlterField(
+            model_name='token',
+            name='uid',
+            field=models.UUIDField(default=uuid.uuid4, unique=True),
+        ),
+        # Existing tokens get the time of the migration, so links already
+        # sent keep working for LOGIN_TOKEN_TTL_MINUTES.
+        migrations.AddField(
+            model_name='token',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='token',
+            name='used_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
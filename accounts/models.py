@@ -1,7 +1,15 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib import auth
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
 import uuid
 
+from accounts import user_cache
+
 auth.signals.user_logged_in.disconnect(auth.models.update_last_login)
 
 
@@ -14,5 +22,79 @@ class User(models.Model):
 
 
 class Token(models.Model):
+    """
+    A single-use login link, valid for `LOGIN_TOKEN_TTL_MINUTES` after it
+    was sent.
+    """
     email = models.EmailField()
-    uid = models.CharField(default=uuid.uuid4, max_length=40)
+    uid = models.UUIDField(default=uuid.uuid4, unique=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    used_at = models.DateTimeField(blank=True, null=True)
+
+    @staticmethod
+    def expiry_cutoff(now=None):
+        """
+        Returns the time before which tokens were created too long ago to
+        be used.
+        """
+        return (now or timezone.now()) - timedelta(
+            minutes=settings.LOGIN_TOKEN_TTL_MINUTES)
+
+    @property
+    def expires_at(self):
+        return self.created_at + timedelta(
+            minutes=settings.LOGIN_TOKEN_TTL_MINUTES)
+
+    @staticmethod
+    def consume(uid):
+        """
+        Mark the unused, unexpired token `uid` as used and return its email,
+        or return None if there's no such token. The token is claimed by a
+        single conditional UPDATE, so of two requests racing to use it only
+        one succeeds.
+        """
+        try:
+            uid = uuid.UUID(str(uid))
+        except ValueError:
+            return None
+        now = timezone.now()
+        usable = Token.objects.filter(uid=uid, used_at__isnull=True,
+                                      created_at__gt=Token.expiry_cutoff(now))
+        email = usable.values_list('email', flat=True).first()
+        if email is None or not usable.update(used_at=now):
+            return None
+        return email
+
+
+class OutboundEmail(models.Model):
+    """
+    An email waiting to be sent by `manage.py send_queued_email`, which
+    deletes it once it has been. See accounts.outbox.
+    """
+    to = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    created_at = models.DateTimeField(default=timezone.now)
+    # Not sent before this: pushed back while a worker is sending it, and
+    # after each failed attempt.
+    send_after = models.DateTimeField(default=timezone.now, db_index=True)
+    # No use after this, if set, so given up on rather than sent late.
+    send_before = models.DateTimeField(blank=True, null=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    # The worker currently sending it, if any.
+    claimed_by = models.UUIDField(blank=True, null=True)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Drop cached copies of a user that has changed, both straight away and
+    once the change is committed, in case another worker cached the old
+    row in between.
+    """
+    email = instance.email
+    user_cache.users.invalidate(email)
+    transaction.on_commit(lambda: user_cache.users.invalidate(email))
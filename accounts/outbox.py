@@ -0,0 +1,229 @@
+"""
+Outbound email, sent behind the request.
+
+Views `enqueue` email as rows of `OutboundEmail` and return straight away.
+`manage.py send_queued_email` runs an `OutboxWorker`, which claims due
+emails in batches and sends them over up to `EMAIL_OUTBOX_CONCURRENCY`
+SMTP connections at once, each kept open from one batch to the next.
+
+Claiming an email pushes its `send_after` back by `EMAIL_OUTBOX_LEASE`
+seconds, so several workers can run without sending anything twice, and
+an email claimed by a worker that dies is picked up again once the lease
+runs out. Emails are deleted once sent. One that can't be sent is retried
+after `EMAIL_OUTBOX_RETRY_BACKOFF` seconds, doubling with each attempt up
+to `EMAIL_OUTBOX_MAX_RETRY_BACKOFF`, until `EMAIL_OUTBOX_MAX_ATTEMPTS`
+attempts have failed, when it is left in the outbox for someone to look
+at. Emails enqueued with a `send_before`, like login links that stop
+working, are given up on in the same way once it has passed.
+
+Connections to the SMTP server time out after `EMAIL_TIMEOUT` seconds, and
+are closed whenever the outbox is empty. A connection the server dropped
+while it was idle is opened again, and the email retried, straight away.
+"""
+import logging
+import queue
+import smtplib
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections
+from django.utils import timezone
+
+from accounts.models import OutboundEmail
+from superlists import metrics
+
+logger = logging.getLogger(__name__)
+
+SendReport = namedtuple('SendReport', ['sent', 'retried', 'failed'])
+
+
+def enqueue(to, subject, body, from_email, send_before=None):
+    return OutboundEmail.objects.create(
+        to=to, subject=subject, body=body, from_email=from_email,
+        send_before=send_before)
+
+
+def due_emails(now=None):
+    return OutboundEmail.objects.filter(
+        send_after__lte=now or timezone.now(),
+        attempts__lt=settings.EMAIL_OUTBOX_MAX_ATTEMPTS)
+
+
+def claim(batch_size, now=None):
+    """
+    Returns up to `batch_size` due emails, oldest first, claimed so that
+    no other worker will send them until the lease runs out.
+    """
+    now = now or timezone.now()
+    ids = list(due_emails(now).order_by('send_after', 'id')
+               .values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return []
+    worker = uuid.uuid4()
+    # Only the emails no other worker claimed in the meantime.
+    due_emails(now).filter(id__in=ids).update(
+        claimed_by=worker,
+        send_after=now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE))
+    return list(OutboundEmail.objects.filter(claimed_by=worker)
+                .order_by('send_after', 'id'))
+
+
+def give_up_expired(now=None):
+    """
+    Give up on the due emails whose `send_before` has passed, returning
+    how many there were.
+    """
+    now = now or timezone.now()
+    expired = due_emails(now).filter(send_before__lte=now)
+    return expired.update(attempts=settings.EMAIL_OUTBOX_MAX_ATTEMPTS,
+                          last_error='Expired before it could be sent')
+
+
+def retry_backoff(attempts):
+    """
+    Returns the seconds to wait before the next attempt at sending an email
+    that has failed `attempts` times.
+    """
+    return min(settings.EMAIL_OUTBOX_RETRY_BACKOFF * 2 ** (attempts - 1),
+               settings.EMAIL_OUTBOX_MAX_RETRY_BACKOFF)
+
+
+class Sender(object):
+    """
+    Sends email over a single connection to the email backend, opened when
+    first needed and kept open until `close`, or until sending fails.
+    """
+
+    def __init__(self):
+        self.connection = None
+
+    def send(self, email):
+        """
+        Send `email`, returning None, or a description of what went wrong.
+        """
+        message = EmailMessage(email.subject, email.body, email.from_email,
+                               [email.to])
+        try:
+            reused = self.connection is not None
+            try:
+                self._send(message)
+            except smtplib.SMTPServerDisconnected:
+                if not reused:
+                    raise
+                # Dropped by the server while idle; try a fresh one.
+                self.close()
+                self._send(message)
+        except Exception as error:
+            # The connection may be in any state; start afresh next time.
+            self.close()
+            return f'{type(error).__name__}: {error}'
+        return None
+
+    def _send(self, message):
+        if self.connection is None:
+            self.connection = get_connection()
+            self.connection.open()
+        self.connection.send_messages([message])
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+            self.connection = None
+
+
+class OutboxWorker(object):
+    """
+    Sends batches of due emails, `concurrency` at a time.
+    """
+
+    def __init__(self, batch_size=None, concurrency=None):
+        self.batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+        self.concurrency = (concurrency or
+                            settings.EMAIL_OUTBOX_CONCURRENCY)
+        self.senders = queue.Queue()
+        for _ in range(self.concurrency):
+            self.senders.put(Sender())
+        self.pool = ThreadPoolExecutor(self.concurrency)
+
+    def _send(self, email):
+        sender = self.senders.get()
+        try:
+            return sender.send(email)
+        finally:
+            self.senders.put(sender)
+
+    def send_batch(self):
+        """
+        Claim and send one batch of due emails, returning a `SendReport`.
+        """
+        expired = give_up_expired()
+        if expired:
+            logger.error('Giving up on %d emails that expired unsent',
+                         expired)
+        emails = claim(self.batch_size)
+        errors = list(self.pool.map(self._send, emails))
+        sent = [email.id for email, error in zip(emails, errors)
+                if error is None]
+        OutboundEmail.objects.filter(id__in=sent).delete()
+        retried, failed = 0, expired
+        now = timezone.now()
+        for email, error in zip(emails, errors):
+            if error is None:
+                continue
+            attempts = email.attempts + 1
+            OutboundEmail.objects.filter(id=email.id).update(
+                attempts=attempts, last_error=error, claimed_by=None,
+                send_after=now + timedelta(seconds=retry_backoff(attempts)))
+            if attempts < settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                retried += 1
+            else:
+                failed += 1
+                logger.error('Giving up sending email %d to %s: %s',
+                             email.id, email.to, error)
+        metrics.emails_sent.inc(amount=len(sent))
+        if retried or failed:
+            metrics.email_send_errors.inc(amount=retried + failed)
+        if settings.METRICS_DIR:
+            metrics.registry.maybe_flush(settings.METRICS_DIR)
+        return SendReport(len(sent), retried, failed)
+
+    def drain(self):
+        """
+        Send batches until there's nothing due, returning the total
+        `SendReport`.
+        """
+        total = SendReport(0, 0, 0)
+        while True:
+            report = self.send_batch()
+            if not any(report):
+                return total
+            total = SendReport(*(a + b for a, b in zip(total, report)))
+
+    def run(self, poll_interval):
+        """
+        Send email as it becomes due, until interrupted.
+        """
+        while True:
+            close_old_connections()
+            if not any(self.drain()):
+                # Rather than leave them idle until the server drops them.
+                self.close_connections()
+                time.sleep(poll_interval)
+
+    def close_connections(self):
+        senders = [self.senders.get() for _ in range(self.concurrency)]
+        for sender in senders:
+            sender.close()
+            self.senders.put(sender)
+
+    def close(self):
+        self.pool.shutdown()
+        self.close_connections()
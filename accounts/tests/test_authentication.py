@@ -21,6 +21,12 @@ class AuthenticateTest(TestCase):
         new_user = User.objects.get(email=email)
         self.assertEqual(user, new_user)
 
+    def test_token_only_works_once(self):
+        token = Token.objects.create(email='edith@example.com')
+        backend = PasswordlessAuthenticationBackend()
+        self.assertIsNotNone(backend.authenticate(token.uid))
+        self.assertIsNone(backend.authenticate(token.uid))
+
     def test_returns_existing_user_with_correct_email_if_token_exists(self):
         email = 'edith@example.com'
         existing_user = User.objects.create(email=email)
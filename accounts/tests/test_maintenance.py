@@ -0,0 +1,45 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from accounts.maintenance import purge_login_tokens
+from accounts.models import Token
+
+
+def make_token(minutes_old, **kwargs):
+    return Token.objects.create(
+        email='a@example.com',
+        created_at=timezone.now() - timedelta(minutes=minutes_old), **kwargs)
+
+
+class PurgeLoginTokensTest(TestCase):
+
+    def test_deletes_expired_tokens_used_or_not(self):
+        make_token(61)
+        make_token(120, used_at=timezone.now())
+        fresh = make_token(5)
+        used = make_token(5, used_at=timezone.now())
+        self.assertEqual(purge_login_tokens(), 2)
+        self.assertEqual(set(Token.objects.all()), {fresh, used})
+
+    def test_works_in_chunks(self):
+        for _ in range(5):
+            make_token(61)
+        with self.assertNumQueries(3 * 2 + 1):
+            self.assertEqual(purge_login_tokens(chunk_size=2), 5)
+        self.assertEqual(Token.objects.count(), 0)
+
+    def test_dry_run_deletes_nothing(self):
+        make_token(61)
+        self.assertEqual(purge_login_tokens(dry_run=True), 1)
+        self.assertEqual(Token.objects.count(), 1)
+
+    def test_command_reports_count(self):
+        make_token(61)
+        out = StringIO()
+        call_command('purge_login_tokens', '--pause', '0', stdout=out)
+        self.assertEqual(out.getvalue(), 'Deleted 1 login tokens\n')
+        self.assertEqual(Token.objects.count(), 0)
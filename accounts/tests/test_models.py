@@ -1,6 +1,9 @@
+from datetime import timedelta
+
 from accounts.models import Token
 from django.test import TestCase
 from django.contrib import auth
+from django.utils import timezone
 
 User = auth.get_user_model()
 
@@ -28,3 +31,24 @@ class TokenModelTest(TestCase):
         token1 = Token.objects.create(email='a@example.com')
         token2 = Token.objects.create(email='a@example.com')
         self.assertNotEqual(token1.uid, token2.uid)
+
+    def test_consume_returns_email_once(self):
+        token = Token.objects.create(email='a@example.com')
+        self.assertEqual(Token.consume(token.uid), 'a@example.com')
+        self.assertIsNone(Token.consume(token.uid))
+        token.refresh_from_db()
+        self.assertIsNotNone(token.used_at)
+
+    def test_consume_accepts_uid_as_string(self):
+        token = Token.objects.create(email='a@example.com')
+        self.assertEqual(Token.consume(str(token.uid)), 'a@example.com')
+
+    def test_consume_rejects_expired_token(self):
+        token = Token.objects.create(
+            email='a@example.com',
+            created_at=timezone.now() - timedelta(minutes=61))
+        self.assertIsNone(Token.consume(token.uid))
+
+    def test_consume_rejects_malformed_uid(self):
+        self.assertIsNone(Token.consume('no-such-token'))
+        self.assertIsNone(Token.consume(None))
@@ -0,0 +1,191 @@
+import smtplib
+from datetime import timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import OutboundEmail
+from accounts.outbox import (OutboxWorker, Sender, claim, enqueue,
+                             retry_backoff)
+from superlists import metrics
+
+
+class CountingBackend(EmailBackend):
+    """
+    The locmem backend, counting the connections opened and closed, and
+    failing to send to addresses at fail.example.com, or at all once
+    `dropped` by the server, as new connections are while
+    `drop_connections` is set.
+    """
+
+    connections = 0
+    closed = 0
+    drop_connections = False
+
+    def open(self):
+        CountingBackend.connections += 1
+        self.dropped = CountingBackend.drop_connections
+
+    def close(self):
+        CountingBackend.closed += 1
+
+    def send_messages(self, messages):
+        if self.dropped:
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly '
+                                                 'closed')
+        for message in messages:
+            if message.to[0].endswith('@fail.example.com'):
+                raise smtplib.SMTPRecipientsRefused({message.to[0]: 'no'})
+        return super().send_messages(messages)
+
+
+def queue_emails(*addresses):
+    return [enqueue(address, 'Hello', f'Hello {address}', 'noreply@x')
+            for address in addresses]
+
+
+@override_settings(
+    EMAIL_BACKEND='accounts.tests.test_outbox.CountingBackend',
+    EMAIL_OUTBOX_RETRY_BACKOFF=30, EMAIL_OUTBOX_MAX_RETRY_BACKOFF=100,
+    EMAIL_OUTBOX_MAX_ATTEMPTS=3)
+class OutboxWorkerTest(TestCase):
+
+    def setUp(self):
+        CountingBackend.connections = CountingBackend.closed = 0
+        metrics.registry.reset()
+        self.worker = OutboxWorker(batch_size=2, concurrency=2)
+        self.addCleanup(self.worker.close)
+
+    def test_sends_and_deletes_due_emails(self):
+        queue_emails('a@example.com', 'b@example.com', 'c@example.com')
+        report = self.worker.drain()
+        self.assertEqual(report, (3, 0, 0))
+        self.assertEqual(sorted(email.to[0] for email in mail.outbox),
+                         ['a@example.com', 'b@example.com', 'c@example.com'])
+        self.assertEqual(mail.outbox[0].subject, 'Hello')
+        self.assertEqual(OutboundEmail.objects.count(), 0)
+        self.assertEqual(metrics.emails_sent.values, {(): 3})
+
+    def test_reuses_connections_between_batches(self):
+        queue_emails(*[f'{n}@example.com' for n in range(6)])
+        self.worker.drain()
+        self.assertEqual(len(mail.outbox), 6)
+        self.assertLessEqual(CountingBackend.connections, 2)
+
+    def test_retries_failures_with_backoff(self):
+        failing, = queue_emails('x@fail.example.com')
+        before = timezone.now()
+        report = self.worker.drain()
+        self.assertEqual(report, (0, 1, 0))
+        failing.refresh_from_db()
+        self.assertEqual(failing.attempts, 1)
+        self.assertIn('SMTPRecipientsRefused', failing.last_error)
+        self.assertIsNone(failing.claimed_by)
+        self.assertGreaterEqual(failing.send_after,
+                                before + timedelta(seconds=30))
+        # Not due again until the backoff is over.
+        self.assertEqual(self.worker.drain(), (0, 0, 0))
+
+    def test_gives_up_after_max_attempts(self):
+        failing, = queue_emails('x@fail.example.com')
+        for attempt in range(3):
+            OutboundEmail.objects.update(send_after=timezone.now())
+            report = self.worker.send_batch()
+        self.assertEqual(report, (0, 0, 1))
+        OutboundEmail.objects.update(send_after=timezone.now())
+        self.assertEqual(self.worker.send_batch(), (0, 0, 0))
+        failing.refresh_from_db()
+        self.assertEqual(failing.attempts, 3)
+
+    def test_failures_dont_hold_up_other_emails(self):
+        queue_emails('x@fail.example.com', 'a@example.com')
+        self.assertEqual(self.worker.drain(), (1, 1, 0))
+        self.assertEqual([email.to for email in mail.outbox],
+                         [['a@example.com']])
+
+    def test_gives_up_on_expired_emails(self):
+        expired, = queue_emails('a@example.com')
+        OutboundEmail.objects.update(send_before=timezone.now())
+        queue_emails('b@example.com')
+        self.assertEqual(self.worker.drain(), (1, 0, 1))
+        self.assertEqual([email.to for email in mail.outbox],
+                         [['b@example.com']])
+        expired.refresh_from_db()
+        self.assertEqual(expired.attempts, 3)
+        self.assertIn('Expired', expired.last_error)
+
+    def test_closes_connections(self):
+        queue_emails('a@example.com', 'b@example.com')
+        self.worker.drain()
+        self.worker.close_connections()
+        self.assertEqual(CountingBackend.closed, CountingBackend.connections)
+        queue_emails('c@example.com')
+        self.assertEqual(self.worker.drain(), (1, 0, 0))
+
+    def test_command_sends_once(self):
+        queue_emails('a@example.com')
+        out = StringIO()
+        call_command('send_queued_email', '--once', stdout=out)
+        self.assertEqual(
+            out.getvalue(), 'Sent 1 emails, 0 to retry, 0 given up on\n')
+        self.assertEqual(len(mail.outbox), 1)
+
+
+@override_settings(
+    EMAIL_BACKEND='accounts.tests.test_outbox.CountingBackend')
+class SenderTest(TestCase):
+
+    def setUp(self):
+        CountingBackend.connections = 0
+        self.sender = Sender()
+        self.addCleanup(self.sender.close)
+
+    def test_reconnects_when_server_drops_idle_connection(self):
+        first, second = queue_emails('a@example.com', 'b@example.com')
+        self.assertIsNone(self.sender.send(first))
+        self.sender.connection.dropped = True
+        self.assertIsNone(self.sender.send(second))
+        self.assertEqual(CountingBackend.connections, 2)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_retries_only_once(self):
+        first, second = queue_emails('a@example.com', 'b@example.com')
+        self.sender.send(first)
+        self.sender.connection.dropped = True
+        CountingBackend.drop_connections = True
+        self.addCleanup(setattr, CountingBackend, 'drop_connections', False)
+        self.assertIn('SMTPServerDisconnected', self.sender.send(second))
+        self.assertEqual(CountingBackend.connections, 2)
+        # Nor at all on a connection that has only just been opened.
+        self.assertIn('SMTPServerDisconnected', self.sender.send(second))
+        self.assertEqual(CountingBackend.connections, 3)
+
+
+@override_settings(EMAIL_OUTBOX_LEASE=300)
+class ClaimTest(TestCase):
+
+    def test_claimed_emails_are_not_claimed_again(self):
+        queue_emails('a@example.com', 'b@example.com', 'c@example.com')
+        first = claim(2)
+        second = claim(2)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({email.id for email in first} &
+                         {email.id for email in second})
+        self.assertEqual(claim(2), [])
+
+    def test_emails_are_claimed_again_after_lease(self):
+        queue_emails('a@example.com')
+        claim(1)
+        later = timezone.now() + timedelta(seconds=301)
+        self.assertEqual(len(claim(1, now=later)), 1)
+
+    @override_settings(EMAIL_OUTBOX_RETRY_BACKOFF=30,
+                       EMAIL_OUTBOX_MAX_RETRY_BACKOFF=100)
+    def test_retry_backoff_doubles_up_to_limit(self):
+        self.assertEqual([retry_backoff(n) for n in range(1, 5)],
+                         [30, 60, 100, 100])
@@ -0,0 +1,27 @@
+from django.test import TestCase
+
+from accounts.models import Token
+
+
+class AccountsViewBudgetsTest(TestCase):
+    """
+    Runs the real login flow, unmocked, so that the query budget middleware
+    fails the test if any step goes over its budget.
+    """
+
+    def test_login_flow(self):
+        self.client.post('/accounts/send_login_email',
+                         data={'email': 'edith@example.com'})
+        token = Token.objects.get()
+        response = self.client.get(f'/accounts/login?token={token.uid}')
+        self.assertGreater(response.wsgi_request.query_stats.count, 0)
+        self.client.get('/')
+        self.client.get('/accounts/lgout')
+
+    def test_returning_user_login(self):
+        for _ in range(2):
+            self.client.post('/accounts/send_login_email',
+                             data={'email': 'edith@example.com'})
+            token = Token.objects.latest('id')
+            self.client.get(f'/accounts/login?token={token.uid}')
+            self.client.get('/accounts/lgout')
@@ -0,0 +1,66 @@
+from unittest.mock import patch
+
+from django.core.cache import caches
+from django.test import TestCase
+
+from accounts.authentication import PasswordlessAuthenticationBackend
+from accounts.models import User
+from accounts.user_cache import UserCache, generation_key
+from superlists import metrics
+
+
+class UserCacheTest(TestCase):
+
+    def setUp(self):
+        caches['sessions'].clear()
+        metrics.registry.reset()
+        self.users = UserCache(10, ttl=60)
+        patcher = patch('accounts.user_cache.users', self.users)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create(email='edith@example.com')
+        self.backend = PasswordlessAuthenticationBackend()
+
+    def test_second_lookup_makes_no_queries(self):
+        self.backend.get_user('edith@example.com')
+        with self.assertNumQueries(0):
+            user = self.backend.get_user('edith@example.com')
+        self.assertEqual(user, self.user)
+        self.assertEqual(metrics.user_cache_lookups.values,
+                         {('miss',): 1, ('hit',): 1})
+
+    def test_returns_copies(self):
+        self.backend.get_user('edith@example.com').backend = 'changed'
+        user = self.backend.get_user('edith@example.com')
+        self.assertFalse(hasattr(user, 'backend'))
+
+    def test_missing_users_are_not_cached(self):
+        self.assertIsNone(self.backend.get_user('oni@example.com'))
+        User.objects.create(email='oni@example.com')
+        self.assertIsNotNone(self.backend.get_user('oni@example.com'))
+
+    def test_deleting_user_invalidates_it(self):
+        self.backend.get_user('edith@example.com')
+        self.user.delete()
+        self.assertIsNone(self.backend.get_user('edith@example.com'))
+
+    def test_saving_user_invalidates_it(self):
+        self.backend.get_user('edith@example.com')
+        self.user.save()
+        with self.assertNumQueries(1):
+            self.backend.get_user('edith@example.com')
+
+    def test_sees_invalidation_by_other_workers(self):
+        self.backend.get_user('edith@example.com')
+        # Another worker shares the generations, but not the cache itself.
+        UserCache(10, ttl=60).invalidate('edith@example.com')
+        with self.assertNumQueries(1):
+            self.backend.get_user('edith@example.com')
+
+    def test_lost_generation_means_a_lookup(self):
+        self.backend.get_user('edith@example.com')
+        caches['sessions'].delete(generation_key('edith@example.com'))
+        with self.assertNumQueries(1):
+            self.backend.get_user('edith@example.com')
+        with self.assertNumQueries(0):
+            self.backend.get_user('edith@example.com')
@@ -1,6 +1,8 @@
-from accounts.models import Token
+from accounts.models import OutboundEmail, Token
+from django.core import mail
 from django.test import TestCase
 from unittest.mock import patch, call
+from superlists import metrics
 
 @patch('accounts.views.auth')
 class LoginViewTest(TestCase):
@@ -44,20 +46,32 @@ class SendLoginEmailViewTest(TestCase):
         token = Token.objects.first()
         self.assertEqual(token.email, 'edith@example.com')
 
-    @patch('accounts.views.send_mail')
-    def test_sends_mail_to_address_from_post(self, mock_send_mail):
+    def test_queues_mail_to_address_from_post(self):
         self.client.post('/accounts/send_login_email', data={
             'email': 'edith@example.com'
         })
 
         token = Token.objects.first()
         expected_url = f'http://testserver/accounts/login?token={token.uid}'
-        self.assertEqual(mock_send_mail.called, True)
-        (subject, body, from_email, to_list), kwargs = mock_send_mail.call_args
-        self.assertIn(expected_url, body)
-        self.assertEqual(subject, 'Your login link for Superlists')
-        self.assertEqual(from_email, 'noreply@superlists')
-        self.assertEqual(to_list, ['edith@example.com'])
+        email = OutboundEmail.objects.get()
+        self.assertIn(expected_url, email.body)
+        self.assertEqual(email.subject, 'Your login link for Superlists')
+        self.assertEqual(email.from_email, 'noreply@superlists')
+        self.assertEqual(email.to, 'edith@example.com')
+
+    def test_mail_is_not_sent_after_token_expires(self):
+        self.client.post('/accounts/send_login_email', data={
+            'email': 'edith@example.com'
+        })
+        token = Token.objects.get()
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.send_before, token.expires_at)
+
+    def test_does_not_send_mail_during_request(self):
+        self.client.post('/accounts/send_login_email', data={
+            'email': 'edith@example.com'
+        })
+        self.assertEqual(mail.outbox, [])
 
     def test_adds_success_message(self):
         response = self.client.post('/accounts/send_login_email', data={
@@ -69,3 +83,12 @@ class SendLoginEmailViewTest(TestCase):
             message.message,
             "Check your email, we've sent you a link you can use to log in.")
         self.assertEqual(message.tags, "success")
+
+    def test_counts_login_emails_queued(self):
+        metrics.registry.reset()
+        self.client.post('/accounts/send_login_email', data={
+            'email': 'edith@example.com'
+        })
+        totals = metrics.registry.collect()
+        self.assertEqual(totals['superlists_login_emails_queued_total'],
+                         {(): 1})
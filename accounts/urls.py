@@ -1,6 +1,7 @@
 from django.conf.urls import url
 from django.contrib.auth.views import logout
 from accounts import views
+from superlists.query_budget import QueryBudget, register
 
 
 urlpatterns = [
@@ -8,3 +9,9 @@ urlpatterns = [
     url(r'^login$', views.login, name='login'),
     url(r'^lgout$', logout, {'next_page': '/'}, name='logout'),
 ]
+
+register(
+    send_login_email=QueryBudget(queries=2, time_ms=50),
+    login=QueryBudget(queries=7, time_ms=50),
+    logout=QueryBudget(queries=4, time_ms=20),
+)
@@ -0,0 +1,63 @@
+"""
+Users looked up by `AuthenticationMiddleware` on every request, cached in
+each process.
+
+Each entry is tagged with the user's generation, a random token kept in
+the `USER_CACHE_ALIAS` cache that every gunicorn worker shares, and is
+only used while that token is unchanged. Saving or deleting a user
+replaces its token, so every worker sees the change on its next lookup,
+and a token lost from the shared cache just means a trip to the database.
+"""
+import copy
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+from superlists import metrics
+from superlists.local_cache import LocalCache
+
+
+def generation_key(email):
+    return f'user-generation:{email}'
+
+
+class UserCache(object):
+
+    def __init__(self, max_entries, ttl):
+        self.local = LocalCache(max_entries, ttl)
+
+    @property
+    def shared(self):
+        return caches[settings.USER_CACHE_ALIAS]
+
+    def get(self, email, load):
+        """
+        Returns the user with `email`, calling `load(email)` for it, and
+        caching the result, if there isn't a current cached copy.
+        """
+        key = generation_key(email)
+        generation = self.shared.get(key)
+        entry = self.local.get(email)
+        if entry is not None and generation is not None and (
+                entry[1] == generation):
+            metrics.user_cache_lookups.inc('hit')
+            # A copy, as requests are free to change their user.
+            return copy.copy(entry[0])
+        metrics.user_cache_lookups.inc('miss')
+        if generation is None:
+            self.shared.add(key, uuid.uuid4().hex, None)
+            generation = self.shared.get(key)
+        # The generation is read before the user, so a change made in
+        # between leaves this entry out of date and unused.
+        user = load(email)
+        if user is not None and generation is not None:
+            self.local.set(email, (copy.copy(user), generation))
+        return user
+
+    def invalidate(self, email):
+        self.local.delete(email)
+        self.shared.set(generation_key(email), uuid.uuid4().hex, None)
+
+
+users = UserCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL)
@@ -1,8 +1,9 @@
+from accounts import outbox
 from accounts.models import Token
 from django.contrib import auth, messages
-from django.core.mail import send_mail
 from django.core.urlresolvers import reverse
 from django.shortcuts import redirect
+from superlists import metrics
 
 
 def send_login_email(request):
@@ -13,10 +14,12 @@ def send_login_email(request):
     )
     message_body = f'Use this link to log in:\n\n{url}'
     print(url)
-    send_mail('Your login link for Superlists',
-              message_body,
-              'noreply@superlists',
-              [email])
+    outbox.enqueue(email,
+                   'Your login link for Superlists',
+                   message_body,
+                   'noreply@superlists',
+                   send_before=token.expires_at)
+    metrics.login_emails_queued.inc()
     messages.success(
         request,
         "Check your email, we've sent you a link you can use to log in."
@@ -1,4 +1,5 @@
 from django.core import mail
+from django.core.management import call_command
 from selenium.webdriver.common.keys import Keys
 import os
 import poplib
@@ -16,6 +17,7 @@ class LoginTest(FunctionalTest):
 
     def wait_for_email(self, test_email, subject):
         if not self.staging_server:
+            call_command('send_queued_email', '--once')
             email = mail.outbox[0]
             self.assertIn(test_email, email.to)
             self.assertEqual(subject, email.subject)
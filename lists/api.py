@@ -1,15 +1,66 @@
+import builtins
 import json
-from django.http import HttpResponse
-from lists.forms import ExistingListItemForm
-from lists.models import List, Item
+import time
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connections, transaction
+from django.core.urlresolvers import reverse
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_POST
+from lists import events
+from lists.forms import (DUPLICATE_ITEM_ERROR, ExistingListItemForm,
+                         check_item_texts)
+from lists.models import List, Item, etag_for
+from lists.pagination import (owned_lists_page, parse_cursor,
+                              shared_lists_page)
+from lists.permissions import can_add_items
+from lists.search import search_items
 
+User = get_user_model()
+
+PERMISSION_ERROR = "You don't have permission to add to this list"
+SEARCH_LOGIN_ERROR = "Log in to search your lists"
+MOVE_TARGET_ERROR = "Items can only be moved after another item in the list"
+BATCH_FORMAT_ERROR = "Expected a JSON array of item texts"
+# Keeps the duplicate check's IN clause under SQLite's parameter limit.
+MAX_BATCH_ITEMS = 500
+BATCH_SIZE_ERROR = f"You can add at most {MAX_BATCH_ITEMS} items at once"
+
+
+def list_etag(request, list_id):
+    """
+    Computes the list's ETag from its version alone, so conditional GETs
+    that match are answered without reading any items. Responses to
+    `since` requests hold only part of the list, so their ETags include
+    the cursor. Writes get no ETag: the version would be the one from
+    before the write.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    version = List.objects.filter(id=list_id).values_list(
+        'version', flat=True).first()
+    if version is None:
+        return None
+    if 'since' in request.GET:
+        since = parse_cursor(request.GET['since']) or 0
+        return etag_for(list_id, version, since)
+    return etag_for(list_id, version)
+
+
+@condition(etag_func=list_etag)
 def list(request, list_id):
     list_ = List.objects.get(id=list_id)
     if request.method == 'POST':
+        if not can_add_items(request, list_):
+            return HttpResponse(json.dumps({'error': PERMISSION_ERROR}),
+                                status=403,
+                                content_type='application/json')
+        if request.content_type == 'application/json':
+            return create_items(request, list_)
         form = ExistingListItemForm(for_list=list_, data=request.POST)
-        if (form.is_valid()) and (not(list_.owner) or
-                                  (request.user == list_.owner) or
-                                  (request.user in list_.shared_with.all())):
+        if form.is_valid():
             Item.objects.create(text=request.POST['text'], list=list_)
             return HttpResponse(status=201)
         else:
@@ -17,9 +68,242 @@ def list(request, list_id):
             return HttpResponse(json.dumps(errors_dict),
                                 status=400,
                                 content_type='application/json')
+    if 'since' in request.GET:
+        response = items_since(list_, parse_cursor(request.GET['since']) or 0)
+    else:
+        item_dicts = [
+            {'id': item.id, 'text': item.text}
+            for item in list_.item_set.all()
+        ]
+        response = HttpResponse(json.dumps(item_dicts),
+                                content_type='application/json')
+    # Make browsers revalidate with If-None-Match on every poll.
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def create_items(request, list_):
+    """
+    Batch mode: adds every valid text in a JSON array body in one
+    transaction and reports the outcome of each, in order.
+    """
+    try:
+        texts = json.loads(request.body.decode('utf8'))
+    except ValueError:
+        texts = None
+    if (not isinstance(texts, builtins.list) or
+            not all(isinstance(text, str) for text in texts)):
+        return HttpResponse(json.dumps({'error': BATCH_FORMAT_ERROR}),
+                            status=400,
+                            content_type='application/json')
+    if len(texts) > MAX_BATCH_ITEMS:
+        return HttpResponse(json.dumps({'error': BATCH_SIZE_ERROR}),
+                            status=400,
+                            content_type='application/json')
+
+    results = check_item_texts(list_, texts)
+    new_texts = [text for text, error in results if error is None]
+    try:
+        with transaction.atomic():
+            first_position = list_.next_position()
+            Item.objects.bulk_create(
+                Item(list=list_, text=text, text_hash=Item.hash_text(text),
+                     position=first_position + index * Item.POSITION_GAP)
+                for index, text in enumerate(new_texts))
+            if new_texts:
+                list_.record_new_items(new_texts[0], len(new_texts))
+    except IntegrityError:
+        # Someone else added one of these texts since we checked.
+        return HttpResponse(json.dumps({'error': DUPLICATE_ITEM_ERROR}),
+                            status=409,
+                            content_type='application/json')
+
+    new_ids = dict(list_.item_set.filter(
+        text_hash__in=[Item.hash_text(text) for text in new_texts],
+    ).values_list('text', 'id'))
+    if new_texts:
+        list_.publish_new_items([{'id': new_ids[text], 'text': text}
+                                 for text in new_texts])
+    item_dicts = [
+        {'text': text, 'error': error} if error else
+        {'text': text, 'id': new_ids[text]}
+        for text, error in results
+    ]
+    return HttpResponse(json.dumps({'items': item_dicts}),
+                        status=201 if new_texts else 400,
+                        content_type='application/json')
+
+
+@require_POST
+def move_item(request, list_id, item_id):
+    """
+    Moves an item to just after the item whose id is POSTed as `after`, or
+    to the top of the list if `after` is empty.
+    """
+    list_ = get_object_or_404(List, id=list_id)
+    if not can_add_items(request, list_):
+        return HttpResponse(json.dumps({'error': PERMISSION_ERROR}),
+                            status=403,
+                            content_type='application/json')
+    item = get_object_or_404(list_.item_set, id=item_id)
+    previous = None
+    if request.POST.get('after'):
+        previous = list_.item_set.filter(
+            id=parse_cursor(request.POST['after'])).first()
+        if previous is None or previous == item:
+            return HttpResponse(json.dumps({'error': MOVE_TARGET_ERROR}),
+                                status=400,
+                                content_type='application/json')
+    item.list = list_
+    item.move_after(previous)
+    return HttpResponse(json.dumps({'id': item.id,
+                                    'position': item.position}),
+                        content_type='application/json')
+
+
+def items_since(list_, since):
+    """
+    Returns only the items of `list_` added after the item with id `since`,
+    along with the cursor to send on the next request.
+    """
     item_dicts = [
-        {'id': item.id, 'text': item.text}
-        for item in list_.item_set.all()
+        {'id': item_id, 'text': text}
+        for item_id, text in list_.item_set.filter(id__gt=since)
+                                           .values_list('id', 'text')
+    ]
+    cursor = max([since] + [item['id'] for item in item_dicts])
+    return HttpResponse(json.dumps({'items': item_dicts, 'cursor': cursor}),
+                        content_type='application/json')
+
+
+def list_events(request, list_id):
+    """
+    Streams changes to a list as server-sent events: `items` when items are
+    added, `sharees` when the list's sharees change, `reorder` when items
+    are moved, and `sync` when the list changed in a way this process
+    didn't see, meaning the client should fetch the whole list again;
+    `sync` comes with the current sharees. Streams end after
+    `LIST_EVENTS_MAX_DURATION` seconds; browsers reconnect by themselves,
+    sending the last version they saw as Last-Event-ID.
+
+    Each stream holds a worker thread, so a process serves at most
+    `LIST_EVENTS_MAX_STREAMS` at once, answering any more with a 503, and
+    leaving the rest of its threads for other requests.
+    """
+    list_ = List.objects.get(id=list_id)
+    last_version = parse_cursor(request.META.get('HTTP_LAST_EVENT_ID'))
+    if last_version is None:
+        last_version = list_.version
+    try:
+        subscription = events.hub.subscribe(
+            list_.id, limit=settings.LIST_EVENTS_MAX_STREAMS)
+    except events.TooManySubscriptions:
+        response = HttpResponse(status=503)
+        response['Retry-After'] = settings.LIST_EVENTS_RETRY_MS // 1000
+        return response
+    response = StreamingHttpResponse(EventStream(subscription, last_version),
+                                     content_type='text/event-stream')
+    patch_cache_control(response, no_cache=True)
+    # Stop nginx from buffering the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+class EventStream(object):
+    """
+    The events for `subscription`, which is given up when the response is
+    closed, even if the stream was never started.
+    """
+
+    def __init__(self, subscription, last_version):
+        self.subscription = subscription
+        self.events = event_stream(subscription, last_version)
+
+    def __iter__(self):
+        return self.events
+
+    def close(self):
+        self.events.close()
+        events.hub.unsubscribe(self.subscription)
+
+
+def event_stream(subscription, last_version):
+    list_id = subscription.list_id
+    try:
+        yield f'retry: {settings.LIST_EVENTS_RETRY_MS}\n\n'
+        deadline = time.monotonic() + settings.LIST_EVENTS_MAX_DURATION
+        check_version = True
+        while time.monotonic() < deadline:
+            if check_version:
+                version = List.objects.filter(id=list_id).values_list(
+                    'version', flat=True).first()
+                behind = version is not None and version > last_version
+                if behind:
+                    sharees = builtins.list(User.objects.filter(
+                        user_of=list_id).values_list('email', flat=True))
+                # Rather than hold a connection until the stream ends.
+                connections.close_all()
+                if behind:
+                    last_version = version
+                    yield events.format_event('sync', {'sharees': sharees},
+                                              version)
+                    continue
+            event = subscription.get(timeout=settings.LIST_EVENTS_HEARTBEAT)
+            check_version = event is None
+            if event is None:
+                yield events.format_heartbeat()
+            else:
+                name, data, version = event
+                if version is not None:
+                    last_version = max(last_version, version)
+                yield events.format_event(name, data, version)
+    finally:
+        events.hub.unsubscribe(subscription)
+
+
+def list_summary(list_):
+    return {
+        'id': list_.id,
+        'name': list_.name,
+        'item_count': list_.item_count,
+        'owner': list_.owner_id,
+        'url': list_.get_absolute_url(),
+    }
+
+
+def page_dict(page):
+    return {
+        'lists': [list_summary(list_) for list_ in page.lists],
+        'next': page.next_cursor,
+    }
+
+
+def user_lists(request, email):
+    owner = User.objects.get(email=email)
+    owned_lists = owned_lists_page(
+        owner, parse_cursor(request.GET.get('owned_after')))
+    shared_lists = shared_lists_page(
+        owner, parse_cursor(request.GET.get('shared_after')))
+    return HttpResponse(json.dumps({'owned': page_dict(owned_lists),
+                                    'shared': page_dict(shared_lists)}),
+                        content_type='application/json')
+
+
+def search(request):
+    if not request.user.is_authenticated:
+        return HttpResponse(json.dumps({'error': SEARCH_LOGIN_ERROR}),
+                            status=403,
+                            content_type='application/json')
+    page = search_items(request.user, request.GET.get('q', ''),
+                        parse_cursor(request.GET.get('page')) or 1)
+    result_dicts = [
+        {'id': result.item_id,
+         'text': result.text,
+         'list': {'id': result.list_id,
+                  'name': result.list_name,
+                  'url': reverse('view_list', args=[result.list_id])}}
+        for result in page.results
     ]
-    return HttpResponse(json.dumps(item_dicts),
+    return HttpResponse(json.dumps({'results': result_dicts,
+                                    'next_page': page.next_page}),
                         content_type='application/json')
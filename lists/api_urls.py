@@ -1,7 +1,22 @@
 from django.conf.urls import url
 from lists import api
+from superlists.query_budget import QueryBudget, register
 
 
 urlpatterns = [
     url(r'^lists/(\d+)/$', api.list, name='api_list'),
+    url(r'^lists/(\d+)/events/$', api.list_events, name='api_list_events'),
+    url(r'^lists/(\d+)/items/(\d+)/move/$', api.move_item,
+        name='api_move_item'),
+    url(r'^search/$', api.search, name='api_search'),
+    url(r'^users/(.+)/lists/$', api.user_lists, name='api_user_lists'),
 ]
+
+register(
+    api_list=QueryBudget(queries=8, time_ms=100),
+    # Only covers setting up the stream, not the events sent down it.
+    api_list_events=QueryBudget(queries=2, time_ms=20),
+    api_move_item=QueryBudget(queries=6, time_ms=50),
+    api_search=QueryBudget(queries=3, time_ms=100),
+    api_user_lists=QueryBudget(queries=3, time_ms=50),
+)
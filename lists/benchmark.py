@@ -0,0 +1,195 @@
+"""
+Request-level benchmarks for the list views.
+
+Each scenario drives one view through the Django test client, so the full
+middleware, template and database stack is measured without a network in
+between. Every request is timed and its queries counted, and the results
+are summarised as latency percentiles, queries per request and throughput
+in a JSON-friendly dict that `compare` can check against an earlier run.
+"""
+import math
+import random
+import time
+from collections import OrderedDict, namedtuple
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from lists.models import List
+
+User = get_user_model()
+
+Scenario = namedtuple('Scenario', ['name', 'method', 'login', 'request'])
+
+# Latency metrics checked by `compare`.
+COMPARED_METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'queries_mean')
+
+
+def percentile(sorted_values, percent):
+    """
+    Returns the nearest-rank `percent` percentile of `sorted_values`.
+    """
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(percent / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+class Targets(object):
+    """
+    Picks, at random but reproducibly, the users and lists each request
+    acts on.
+    """
+
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        self.list_ids = list(List.objects.values_list('id', flat=True))
+        self.owned = list(List.objects.filter(owner__isnull=False)
+                          .values_list('id', 'owner_id'))
+        self.emails = list(User.objects.values_list('email', flat=True))
+        if not self.owned or len(self.emails) < 2:
+            raise ValueError('Benchmarks need at least two users who own '
+                             'lists; run seed_lists first.')
+        self.counter = 0
+
+    def any_list(self):
+        return self.rng.choice(self.list_ids)
+
+    def owned_list(self):
+        return self.rng.choice(self.owned)
+
+    def other_user(self, email):
+        while True:
+            other = self.rng.choice(self.emails)
+            if other != email:
+                return other
+
+    def unique_text(self):
+        self.counter += 1
+        return f'Benchmark item {self.counter}'
+
+
+def _view_list_post(client, targets):
+    list_id, owner = targets.owned_list()
+    return (f'/lists/{list_id}/', {'text': targets.unique_text()}, owner)
+
+
+def _share_list(client, targets):
+    list_id, owner = targets.owned_list()
+    return (f'/lists/{list_id}/share',
+            {'sharee': targets.other_user(owner)}, owner)
+
+
+def _my_lists(client, targets):
+    _, owner = targets.owned_list()
+    return (f'/lists/users/{owner}/', None, owner)
+
+
+SCENARIOS = [
+    Scenario('home_page', 'get', False,
+             lambda client, targets: ('/', None, None)),
+    Scenario('new_list', 'post', False,
+             lambda client, targets: (
+                 '/lists/new', {'text': targets.unique_text()}, None)),
+    Scenario('view_list', 'get', False,
+             lambda client, targets: (
+                 f'/lists/{targets.any_list()}/', None, None)),
+    Scenario('view_list_post', 'post', True, _view_list_post),
+    Scenario('my_lists', 'get', True, _my_lists),
+    Scenario('share_list', 'post', True, _share_list),
+    Scenario('api_list', 'get', False,
+             lambda client, targets: (
+                 f'/api/lists/{targets.any_list()}/', None, None)),
+]
+
+# Safe to run against a database with real users' lists in it.
+READ_ONLY_SCENARIOS = [scenario.name for scenario in SCENARIOS
+                       if scenario.method == 'get']
+
+
+def run_scenario(scenario, targets, requests=100, warmup=5):
+    """
+    Make `warmup` untimed requests and then `requests` timed ones for
+    `scenario`. Returns a dict of summary statistics.
+    """
+    client = Client()
+    logged_in_as = None
+    timings, query_counts, errors = [], [], 0
+    started = None
+    for number in range(warmup + requests):
+        if number == warmup:
+            started = time.perf_counter()
+        path, data, user_email = scenario.request(client, targets)
+        if scenario.login and user_email != logged_in_as:
+            client.force_login(User.objects.get(email=user_email))
+            logged_in_as = user_email
+        send = getattr(client, scenario.method)
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = send(path, data) if data else send(path)
+            elapsed = time.perf_counter() - start
+        if number >= warmup:
+            timings.append(elapsed * 1000)
+            query_counts.append(len(queries))
+            if response.status_code >= 400:
+                errors += 1
+    total = time.perf_counter() - started if started else 0
+    # Don't leave the benchmark's sessions behind.
+    client.logout()
+    return summarise(timings, query_counts, errors, total)
+
+
+def summarise(timings, query_counts, errors, total_seconds):
+    timings = sorted(timings)
+    return OrderedDict([
+        ('requests', len(timings)),
+        ('errors', errors),
+        ('p50_ms', _round(percentile(timings, 50))),
+        ('p95_ms', _round(percentile(timings, 95))),
+        ('p99_ms', _round(percentile(timings, 99))),
+        ('mean_ms', _round(sum(timings) / len(timings)) if timings else None),
+        ('queries_mean', _round(sum(query_counts) / len(query_counts))
+         if query_counts else None),
+        ('queries_max', max(query_counts) if query_counts else None),
+        ('throughput_rps',
+         _round(len(timings) / total_seconds) if total_seconds else None),
+    ])
+
+
+def _round(value):
+    return None if value is None else round(value, 3)
+
+
+def run_benchmarks(requests=100, warmup=5, only=None, seed=0):
+    """
+    Runs every scenario, or those named in `only`, against the current
+    database. Returns an OrderedDict of results keyed by scenario name.
+    """
+    targets = Targets(seed)
+    results = OrderedDict()
+    for scenario in SCENARIOS:
+        if only and scenario.name not in only:
+            continue
+        results[scenario.name] = run_scenario(scenario, targets, requests,
+                                              warmup)
+    return results
+
+
+def compare(baseline, current, max_regression):
+    """
+    Returns a list of (scenario, metric, before, after) for each metric in
+    COMPARED_METRICS that is more than `max_regression` percent worse in
+    `current` than in `baseline`.
+    """
+    regressions = []
+    for name, after in current.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = before.get(metric), after.get(metric)
+            if old and new and new > old * (1 + max_regression / 100):
+                regressions.append((name, metric, old, new))
+    return regressions
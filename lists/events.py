@@ -0,0 +1,107 @@
+"""
+In-process fan-out of list change events to streaming clients.
+
+Each connected browser holds a `Subscription` to one list. Publishers push
+events into every subscription for that list; a subscriber that falls too
+far behind has its oldest events dropped, so one slow client can never
+block a writer. Each stream holds a worker thread, so subscribing can be
+refused with `TooManySubscriptions` beyond a limit. The hub only sees
+events published in this process, so streams also compare the list version
+from the database on each heartbeat to catch changes made by other workers.
+"""
+import json
+import queue
+import threading
+from collections import defaultdict
+
+SUBSCRIPTION_QUEUE_SIZE = 100
+
+
+class TooManySubscriptions(Exception):
+    pass
+
+
+class Subscription(object):
+
+    def __init__(self, list_id):
+        self.list_id = list_id
+        self.events = queue.Queue(maxsize=SUBSCRIPTION_QUEUE_SIZE)
+
+    def put(self, event):
+        while True:
+            try:
+                self.events.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self.events.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout):
+        """
+        Returns the next event, or None if none arrives within `timeout`
+        seconds.
+        """
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventHub(object):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+        self._count = 0
+
+    def subscribe(self, list_id, limit=None):
+        """
+        Returns a new `Subscription` to `list_id`, or raises
+        `TooManySubscriptions` if there are already `limit` to any list.
+        """
+        subscription = Subscription(list_id)
+        with self._lock:
+            if limit is not None and self._count >= limit:
+                raise TooManySubscriptions
+            self._subscriptions[list_id].add(subscription)
+            self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.list_id)
+            if subscriptions is not None and subscription in subscriptions:
+                subscriptions.remove(subscription)
+                self._count -= 1
+                if not subscriptions:
+                    del self._subscriptions[subscription.list_id]
+
+    def subscriber_count(self, list_id):
+        with self._lock:
+            return len(self._subscriptions.get(list_id, ()))
+
+    def publish(self, list_id, event, data, version=None):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(list_id, ()))
+        for subscription in subscriptions:
+            subscription.put((event, data, version))
+
+
+hub = EventHub()
+
+
+def format_event(event, data, version=None):
+    """
+    Serializes one event in the text/event-stream wire format.
+    """
+    lines = [f'event: {event}']
+    if version is not None:
+        lines.append(f'id: {version}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def format_heartbeat():
+    return ': heartbeat\n\n'
@@ -37,8 +37,30 @@ class ExistingListItemForm(ItemForm):
         self.instance.list = for_list
 
     def validate_unique(self):
-        try:
-            self.instance.validate_unique()
-        except ValidationError as e:
-            e.error_dict = {'text': [DUPLICATE_ITEM_ERROR]}
-            self._update_errors(e)
+        if self.instance.text and self.instance.is_duplicate():
+            self._update_errors(
+                ValidationError({'text': [DUPLICATE_ITEM_ERROR]}))
+
+
+def check_item_texts(for_list, texts):
+    """
+    Validate a batch of item texts for `for_list` the way
+    `ExistingListItemForm` validates a single one. Returns a list of
+    `(text, error)` pairs in input order, where `error` is None for texts
+    that can be saved. Existing duplicates are found with a single query.
+    """
+    texts = [text.strip() for text in texts]
+    existing = set(Item.objects.filter(
+        list=for_list,
+        text_hash__in={Item.hash_text(text) for text in texts},
+    ).values_list('text', flat=True))
+    results = []
+    for text in texts:
+        if not text:
+            results.append((text, EMPTY_ITEM_ERROR))
+        elif text in existing:
+            results.append((text, DUPLICATE_ITEM_ERROR))
+        else:
+            existing.add(text)
+            results.append((text, None))
+    return results
@@ -0,0 +1,63 @@
+"""
+Caching of rendered fragments of a list's page.
+
+Keys include the list's version, which changes whenever its items or
+sharees do, so a write makes every cached fragment of the list stale
+without anything having to be deleted; the stale entries simply age out.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+from superlists import metrics
+
+
+class FragmentCacheStats(object):
+    """
+    Process-wide hit and miss counters, also exported, added up across
+    workers, as `superlists_fragment_cache_lookups_total`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        metrics.fragment_cache_lookups.inc('hit' if hit else 'miss')
+
+    def as_dict(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+stats = FragmentCacheStats()
+
+
+def fragment_key(list_, name):
+    return f'list-fragment:{name}:{list_.id}:{list_.version}'
+
+
+def get_or_render(list_, name, render):
+    """
+    Returns the cached fragment `name` of `list_`'s current version,
+    calling `render()` to produce and cache it if there isn't one.
+    """
+    cache = caches[settings.LIST_FRAGMENT_CACHE]
+    key = fragment_key(list_, name)
+    content = cache.get(key)
+    stats.record(hit=content is not None)
+    if content is None:
+        content = render()
+        cache.set(key, content, settings.LIST_FRAGMENT_CACHE_TIMEOUT)
+    return content
@@ -0,0 +1,99 @@
+"""
+Housekeeping for data nobody will come back for.
+
+Every anonymous submission on the home page creates an owner-less list,
+and most are never looked at again. `prune_anonymous_lists` removes those
+that have been idle for longer than a TTL, optionally keeping a compact
+copy in `ArchivedList`. It works through them in small chunks, each in its
+own short transaction, pausing in between so that SQLite's single write
+lock is never held long enough to stall requests.
+"""
+import json
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from lists.models import ArchivedList, Item, List
+
+PruneReport = namedtuple('PruneReport',
+                         ['lists', 'items', 'bytes', 'archived_bytes'])
+
+
+def idle_anonymous_lists(ttl, now=None):
+    cutoff = (now or timezone.now()) - ttl
+    return List.objects.filter(owner__isnull=True, last_activity__lt=cutoff)
+
+
+def prune_anonymous_lists(ttl=None, archive=True, chunk_size=100, pause=0.0,
+                          dry_run=False, now=None):
+    """
+    Delete (and by default archive) anonymous lists idle for longer than
+    `ttl`, a timedelta defaulting to `ANONYMOUS_LIST_TTL_DAYS` days.
+
+    Returns a `PruneReport` of the lists and items removed, the bytes of
+    item text they held, and the bytes written to the archive.
+    """
+    if ttl is None:
+        ttl = timedelta(days=settings.ANONYMOUS_LIST_TTL_DAYS)
+    candidates = idle_anonymous_lists(ttl, now)
+    report = PruneReport(0, 0, 0, 0)
+    last_id = 0
+    while True:
+        ids = list(candidates.filter(id__gt=last_id).order_by('id')
+                   .values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return report
+        last_id = ids[-1]
+        if dry_run:
+            report = _add(report, _measure(ids))
+        else:
+            report = _add(report, _prune_chunk(candidates, ids, archive))
+        if pause:
+            time.sleep(pause)
+
+
+def _measure(list_ids):
+    texts = Item.objects.filter(list_id__in=list_ids).values_list(
+        'text', flat=True)
+    return PruneReport(len(list_ids), len(texts),
+                       sum(len(text.encode('utf8')) for text in texts), 0)
+
+
+def _prune_chunk(candidates, list_ids, archive):
+    with transaction.atomic():
+        # Someone may have added to a list since it was picked.
+        lists = {list_.id: list_ for list_ in candidates.filter(
+            id__in=list_ids).only('id', 'last_activity')}
+        item_texts = {list_id: [] for list_id in lists}
+        for list_id, text in Item.objects.filter(list_id__in=lists).order_by(
+                'list_id', 'position', 'id').values_list('list_id', 'text'):
+            item_texts[list_id].append(text)
+
+        archived = [
+            ArchivedList(original_id=list_id,
+                         items=json.dumps(item_texts[list_id]),
+                         last_activity=list_.last_activity)
+            for list_id, list_ in lists.items()
+        ] if archive else []
+        ArchivedList.objects.bulk_create(archived)
+
+        # Item has no delete signals or dependents, so this is a single
+        # DELETE rather than a delete per row.
+        Item.objects.filter(list_id__in=lists).delete()
+        List.objects.filter(id__in=lists).delete()
+
+    texts = [text for texts in item_texts.values() for text in texts]
+    return PruneReport(
+        len(lists), len(texts),
+        sum(len(text.encode('utf8')) for text in texts),
+        sum(len(archived_list.items.encode('utf8'))
+            for archived_list in archived),
+    )
+
+
+def _add(report, other):
+    return PruneReport(*(a + b for a, b in zip(report, other)))
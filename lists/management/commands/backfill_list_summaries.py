@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+
+from lists.models import Item, List
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized name and item count of every list.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        updated = backfill_list_summaries(options['chunk_size'])
+        self.stdout.write(f'Updated {updated} lists')
+
+
+def backfill_list_summaries(chunk_size=500):
+    """
+    Walk the lists table in primary key order, `chunk_size` rows at a time,
+    and rewrite `first_item_text` and `item_count` from the item set.
+    Returns the number of lists whose summary changed.
+    """
+    first_item_text = Item.objects.filter(
+        list=OuterRef('pk')).order_by('position', 'id').values('text')[:1]
+    updated = 0
+    last_pk = 0
+    while True:
+        chunk = list(
+            List.objects.filter(pk__gt=last_pk).order_by('pk')
+            .annotate(actual_count=Count('item'),
+                      actual_first_text=Subquery(first_item_text))
+            .values_list('pk', 'first_item_text', 'item_count',
+                         'actual_first_text', 'actual_count')[:chunk_size]
+        )
+        if not chunk:
+            return updated
+        with transaction.atomic():
+            for pk, text, count, actual_text, actual_count in chunk:
+                actual_text = actual_text or ''
+                if (text, count) != (actual_text, actual_count):
+                    List.objects.filter(pk=pk).update(
+                        first_item_text=actual_text, item_count=actual_count)
+                    updated += 1
+        last_pk = chunk[-1][0]
@@ -0,0 +1,178 @@
+import json
+import subprocess
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+from django.utils import timezone
+
+from lists.benchmark import (READ_ONLY_SCENARIOS, SCENARIOS, compare,
+                             run_benchmarks)
+from lists.seeding import seed_lists
+
+
+class Command(BaseCommand):
+    help = ('Time every list view against a freshly seeded test database '
+            'and report latency percentiles, queries and throughput as '
+            'JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--lists-per-user', type=int, default=10)
+        parser.add_argument('--anonymous-lists', type=int, default=1000)
+        parser.add_argument('--max-items', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--requests', type=int, default=100,
+                            help='Timed requests per scenario.')
+        parser.add_argument('--warmup', type=int, default=5,
+                            help='Untimed requests per scenario.')
+        parser.add_argument('--scenario', action='append',
+                            choices=[scenario.name for scenario in SCENARIOS],
+                            help='Only run this scenario; may be repeated.')
+        parser.add_argument('--existing-db', action='store_true',
+                            help='Run the read-only scenarios against the '
+                                 'configured database as it is, instead of '
+                                 'a seeded test database.')
+        parser.add_argument('--output', default='-',
+                            help='File to write JSON results to, or - for '
+                                 'stdout.')
+        parser.add_argument('--compare',
+                            help='JSON results of an earlier run to check '
+                                 'for regressions.')
+        parser.add_argument('--max-regression', type=float, default=20,
+                            help='Percent by which a metric may be worse '
+                                 'than in --compare before failing.')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1')
+        dataset = OrderedDict(
+            (name, options[name])
+            for name in ('users', 'lists_per_user', 'anonymous_lists',
+                         'max_items', 'seed'))
+        if options['existing_db']:
+            dataset = None
+            results = self.run_on_existing_database(options)
+        else:
+            results = self.run_on_test_database(dataset, options)
+
+        report = OrderedDict([
+            ('commit', current_commit()),
+            ('created', timezone.now().isoformat()),
+            ('database', connection.vendor),
+            ('dataset', dataset),
+            ('results', results),
+        ])
+        self.write_table(results)
+        if options['output'] == '-':
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            with open(options['output'], 'w') as out:
+                json.dump(report, out, indent=2)
+
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                baseline = json.load(baseline_file)['results']
+            regressions = compare(baseline, results,
+                                  options['max_regression'])
+            for name, metric, before, after in regressions:
+                self.stderr.write(
+                    f'{name} {metric} regressed: {before} -> {after}')
+            if regressions:
+                raise CommandError(
+                    f'{len(regressions)} metrics regressed by more than '
+                    f"{options['max_regression']}%")
+
+    def run(self, options):
+        return run_benchmarks(requests=options['requests'],
+                              warmup=options['warmup'],
+                              only=options['scenario'],
+                              seed=options['seed'])
+
+    def run_on_existing_database(self, options):
+        writes = set(options['scenario'] or []) - set(READ_ONLY_SCENARIOS)
+        if writes:
+            raise CommandError(
+                f"{', '.join(sorted(writes))} would change real data; only "
+                f"{', '.join(READ_ONLY_SCENARIOS)} can run with "
+                f'--existing-db')
+        options = dict(options,
+                       scenario=options['scenario'] or READ_ONLY_SCENARIOS)
+        with test_environment():
+            return self.run(options)
+
+    def run_on_test_database(self, dataset, options):
+        with test_environment(), isolated_from_site():
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False)
+            try:
+                seed_lists(**dataset)
+                return self.run(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def write_table(self, results):
+        self.stderr.write(
+            f"{'scenario':<16}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+            f"{'queries':>10}{'req/s':>10}")
+        for name, result in results.items():
+            self.stderr.write(
+                f'{name:<16}{result["p50_ms"]:>10.1f}'
+                f'{result["p95_ms"]:>10.1f}{result["p99_ms"]:>10.1f}'
+                f'{result["queries_mean"]:>10.1f}'
+                f'{result["throughput_rps"]:>10.1f}')
+
+
+@contextmanager
+def test_environment():
+    """
+    Set up the test environment, which lets the test client's requests past
+    ALLOWED_HOSTS, unless it already is, as under `manage.py test`.
+    """
+    try:
+        setup_test_environment()
+    except RuntimeError:
+        yield
+        return
+    try:
+        yield
+    finally:
+        teardown_test_environment()
+
+
+@contextmanager
+def isolated_from_site():
+    """
+    Swap every cache for a private one, and stop reading from replicas,
+    which are copies of the site's database. Lists in a test database
+    reuse the ids and versions of the site's lists, so they would
+    otherwise read and write the site's cached fragments.
+    """
+    private = {
+        alias: {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': f'benchmark-{alias}',
+            'OPTIONS': config.get('OPTIONS', {}),
+        }
+        for alias, config in settings.CACHES.items()
+    }
+    with override_settings(CACHES=private, DATABASE_REPLICAS=[]):
+        try:
+            yield
+        finally:
+            for alias in private:
+                caches[alias].clear()
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from lists.transfer import CHUNK_SIZE, export_ndjson
+
+
+class Command(BaseCommand):
+    help = 'Stream all users, lists, items and sharing as NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?', default='-',
+                            help='File to write to, or - for stdout.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if options['output'] == '-':
+            count = export_ndjson(self.stdout, options['chunk_size'])
+        else:
+            with open(options['output'], 'w', encoding='utf8') as out:
+                count = export_ndjson(out, options['chunk_size'])
+        self.stderr.write(f'Exported {count} records')
@@ -0,0 +1,24 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from lists.transfer import CHUNK_SIZE, import_ndjson
+
+
+class Command(BaseCommand):
+    help = 'Import users, lists, items and sharing from NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', nargs='?', default='-',
+                            help='File to read from, or - for stdin.')
+        parser.add_argument('--batch-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if options['input'] == '-':
+            counts = import_ndjson(sys.stdin, options['batch_size'])
+        else:
+            with open(options['input'], encoding='utf8') as lines:
+                counts = import_ndjson(lines, options['batch_size'])
+        self.stdout.write(
+            'Imported {user} users, {list} lists, {item} items and '
+            '{share} shares'.format(**counts))
@@ -0,0 +1,65 @@
+import pstats
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from superlists.profiling import profile_files
+
+
+class Command(BaseCommand):
+    help = ('Merge request profiles written by ProfilingMiddleware: '
+            'collapsed stacks into one flamegraph-ready file, or pstats '
+            'dumps into one set of statistics.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=settings.PROFILING_DIR)
+        parser.add_argument('--view', action='append',
+                            help='Only merge profiles of this URL name; may '
+                                 'be repeated.')
+        parser.add_argument('--format', choices=['collapsed', 'pstats'],
+                            default='collapsed')
+        parser.add_argument('--output', default='-',
+                            help='File to write to. For pstats, - prints '
+                                 'the slowest functions instead.')
+        parser.add_argument('--top', type=int, default=30,
+                            help='Functions to print for pstats.')
+
+    def handle(self, *args, **options):
+        extension = ('.collapsed' if options['format'] == 'collapsed'
+                     else '.prof')
+        paths = [path for path in profile_files(options['dir'],
+                                                options['view'])
+                 if path.endswith(extension)]
+        if not paths:
+            raise CommandError(f'No {extension} profiles in '
+                               f"{options['dir']}")
+        if options['format'] == 'collapsed':
+            self.merge_collapsed(paths, options['output'])
+        else:
+            self.merge_pstats(paths, options['output'], options['top'])
+        self.stderr.write(f'Merged {len(paths)} profiles')
+
+    def merge_collapsed(self, paths, output):
+        stacks = Counter()
+        for path in paths:
+            with open(path) as lines:
+                for line in lines:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    stacks[stack] += int(count)
+        lines = [f'{stack} {count}\n' for stack, count in
+                 sorted(stacks.items())]
+        if output == '-':
+            self.stdout.write(''.join(lines), ending='')
+        else:
+            with open(output, 'w') as out:
+                out.writelines(lines)
+
+    def merge_pstats(self, paths, output, top):
+        stats = pstats.Stats(paths[0], stream=self.stdout)
+        for path in paths[1:]:
+            stats.add(path)
+        if output == '-':
+            stats.sort_stats('cumulative').print_stats(top)
+        else:
+            stats.dump_stats(output)
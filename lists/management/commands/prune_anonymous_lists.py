@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from lists.maintenance import prune_anonymous_lists
+
+
+class Command(BaseCommand):
+    help = ('Archive, or delete, anonymous lists that have been idle for '
+            'longer than a TTL.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl-days', type=float,
+                            default=settings.ANONYMOUS_LIST_TTL_DAYS)
+        parser.add_argument('--delete', action='store_true',
+                            help="Don't keep an archived copy.")
+        parser.add_argument('--chunk-size', type=int, default=100,
+                            help='Lists removed per transaction.')
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help='Seconds to wait between transactions.')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        report = prune_anonymous_lists(
+            ttl=timedelta(days=options['ttl_days']),
+            archive=not options['delete'],
+            chunk_size=options['chunk_size'],
+            pause=options['pause'],
+            dry_run=options['dry_run'],
+        )
+        verb = 'Would remove' if options['dry_run'] else 'Removed'
+        self.stdout.write(
+            f'{verb} {report.lists} lists and {report.items} items '
+            f'({report.bytes} bytes of item text)')
+        if report.archived_bytes:
+            self.stdout.write(
+                f'Archived {report.archived_bytes} bytes to ArchivedList')
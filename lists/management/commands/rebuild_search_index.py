@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from lists.search import install_search_index, uninstall_search_index
+
+
+class Command(BaseCommand):
+    help = ('Recreate the item search index and its sync triggers, and '
+            'reindex every item.')
+
+    def handle(self, *args, **options):
+        with connection.schema_editor() as schema_editor:
+            uninstall_search_index(schema_editor)
+            install_search_index(schema_editor)
+        self.stdout.write('Rebuilt search index')
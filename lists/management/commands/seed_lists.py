@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from lists.search import install_search_index, uninstall_search_index
+from lists.seeding import seed_lists
+
+
+class Command(BaseCommand):
+    help = ('Generate users, shared and anonymous lists with long-tailed '
+            'item counts, for testing at production sizes. The defaults '
+            'create over a million items.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--lists-per-user', type=int, default=20)
+        parser.add_argument('--anonymous-lists', type=int, default=250000)
+        parser.add_argument('--max-items', type=int, default=500)
+        parser.add_argument('--share-ratio', type=float, default=0.2,
+                            help='Fraction of owned lists that are shared.')
+        parser.add_argument('--max-sharees', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Lists inserted per transaction.')
+        parser.add_argument('--keep-search-index', action='store_true',
+                            help='Update the search index as items are '
+                                 'inserted, rather than rebuilding it after.')
+
+    def handle(self, *args, **options):
+        # Keeping the search index in step costs more than the inserts
+        # themselves; one rebuild at the end is much quicker.
+        if not options['keep_search_index']:
+            with connection.schema_editor() as schema_editor:
+                uninstall_search_index(schema_editor)
+        try:
+            report = seed_lists(
+                users=options['users'],
+                lists_per_user=options['lists_per_user'],
+                anonymous_lists=options['anonymous_lists'],
+                max_items=options['max_items'],
+                share_ratio=options['share_ratio'],
+                max_sharees=options['max_sharees'],
+                seed=options['seed'],
+                batch_size=options['batch_size'],
+            )
+        finally:
+            # Even if seeding failed part way, so that search keeps up with
+            # the lists that were created, and with those created later.
+            if not options['keep_search_index']:
+                with connection.schema_editor() as schema_editor:
+                    install_search_index(schema_editor)
+        self.stdout.write(
+            f'Created {report.users} users, {report.lists} lists, '
+            f'{report.items} items and {report.shares} shares')
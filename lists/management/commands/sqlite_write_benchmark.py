@@ -0,0 +1,120 @@
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections, transaction
+
+from superlists.sqlite_backend import base as tuned
+
+ENGINES = OrderedDict([
+    ('stock', 'django.db.backends.sqlite3'),
+    ('tuned', 'superlists.sqlite_backend'),
+])
+ALIAS = 'write_benchmark'
+
+SCHEMA = [
+    'CREATE TABLE list (id INTEGER PRIMARY KEY, item_count INTEGER)',
+    """CREATE TABLE item (id INTEGER PRIMARY KEY, list_id INTEGER,
+                          text TEXT, position INTEGER)""",
+    'CREATE INDEX item_position ON item (list_id, position)',
+]
+
+
+def add_item(list_id, text):
+    """
+    The writes behind an item POST: read the last position, insert the
+    item, update the list's summary, all in one transaction.
+    """
+    with transaction.atomic(using=ALIAS):
+        with connections[ALIAS].cursor() as cursor:
+            cursor.execute('SELECT MAX(position) FROM item WHERE list_id = %s',
+                           [list_id])
+            position = (cursor.fetchone()[0] or 0) + 1024
+            cursor.execute('INSERT INTO item (list_id, text, position) '
+                           'VALUES (%s, %s, %s)', [list_id, text, position])
+            cursor.execute('UPDATE list SET item_count = item_count + 1 '
+                           'WHERE id = %s', [list_id])
+
+
+def worker(args):
+    settings_dict, number, writes, lists = args
+    connections.databases[ALIAS] = settings_dict
+    errors = 0
+    for write in range(writes):
+        try:
+            add_item(write % lists + 1, f'worker {number} item {write}')
+        except DatabaseError:
+            errors += 1
+    connections[ALIAS].close()
+    counters = {metric.name: metric.values.get((), 0) for metric in (
+        tuned.lock_waits, tuned.busy_failures)}
+    return errors, counters
+
+
+class Command(BaseCommand):
+    help = ('Compare item-write throughput of the stock and tuned SQLite '
+            'backends with several processes writing at once.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=200,
+                            help='Items added by each process.')
+        parser.add_argument('--lists', type=int, default=10)
+        parser.add_argument('--timeout', type=float, default=0.1,
+                            help='Seconds a writer waits for the lock; '
+                                 'the stock driver default is 5.')
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        results = OrderedDict()
+        try:
+            for name, engine in ENGINES.items():
+                path = os.path.join(directory, f'{name}.sqlite3')
+                results[name] = self.run(engine, path, options)
+        finally:
+            del connections.databases[ALIAS]
+            shutil.rmtree(directory)
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run(self, engine, path, options):
+        if engine == ENGINES['stock']:
+            engine_options = {'timeout': options['timeout']}
+        else:
+            engine_options = {
+                'pragmas': {'busy_timeout': int(options['timeout'] * 1000)}}
+        settings_dict = {'ENGINE': engine, 'NAME': path,
+                         'OPTIONS': engine_options}
+        connections.databases[ALIAS] = dict(settings_dict)
+        with connections[ALIAS].cursor() as cursor:
+            for statement in SCHEMA:
+                cursor.execute(statement)
+            cursor.executemany('INSERT INTO list (item_count) VALUES (0)',
+                               [()] * options['lists'])
+        connections[ALIAS].close()
+        del connections[ALIAS]
+
+        jobs = [(settings_dict, number, options['writes'], options['lists'])
+                for number in range(options['processes'])]
+        start = time.perf_counter()
+        with multiprocessing.Pool(options['processes']) as pool:
+            outcomes = pool.map(worker, jobs)
+        elapsed = time.perf_counter() - start
+
+        errors = sum(errors for errors, _ in outcomes)
+        written = options['processes'] * options['writes'] - errors
+        result = OrderedDict([
+            ('engine', engine),
+            ('written', written),
+            ('errors', errors),
+            ('seconds', round(elapsed, 3)),
+            ('writes_per_second', round(written / elapsed, 1)),
+        ])
+        for _, counters in outcomes:
+            for counter, value in counters.items():
+                result[counter] = result.get(counter, 0) + value
+        return result
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 23:12
+from __future__ import unicode_literals
+
+import hashlib
+
+from django.db import migrations, models
+
+BACKFILL_CHUNK_SIZE = 1000
+
+
+def backfill_text_hashes(apps, schema_editor):
+    Item = apps.get_model('lists', 'Item')
+    db_alias = schema_editor.connection.alias
+    last_pk = 0
+    while True:
+        chunk = list(Item.objects.using(db_alias).filter(pk__gt=last_pk)
+                     .order_by('pk').values_list('pk', 'text')
+                     [:BACKFILL_CHUNK_SIZE])
+        if not chunk:
+            return
+        for pk, text in chunk:
+            Item.objects.using(db_alias).filter(pk=pk).update(
+                text_hash=hashlib.sha256(text.encode('utf8')).hexdigest())
+        last_pk = chunk[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lists', '0010_list_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='text_hash',
+            field=models.CharField(default='', editable=False, max_length=64),
+        ),
+        migrations.RunPython(backfill_text_hashes,
+                             migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['list', 'text_hash'], name='lists_item_text_hash_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 23:14
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import F
+
+POSITION_GAP = 1024
+
+
+def number_existing_items(apps, schema_editor):
+    # Ids already increase in display order, so spacing them out gives
+    # every list the same order with gaps to move items into.
+    Item = apps.get_model('lists', 'Item')
+    Item.objects.using(schema_editor.connection.alias).update(
+        position=F('id') * POSITION_GAP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lists', '0011_item_text_hash'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='item',
+            options={'ordering': ('position', 'id')},
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='position',
+            field=models.BigIntegerField(blank=True, default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.RunPython(number_existing_items,
+                             migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='item',
+            name='position',
+            field=models.BigIntegerField(blank=True, default=None, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['list', 'position'], name='lists_item_position_idx'),
+        ),
+    ]
@@ -1,6 +1,17 @@
+import hashlib
+
 from django.conf import settings
 from django.core.urlresolvers import reverse
-from django.db import models
+from django.db import models, transaction
+from django.db.models import (Case, F, Max, OuterRef, Q, Subquery, Value,
+                              When)
+from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from lists import events
+from superlists import metrics
 
 
 class List(models.Model):
@@ -12,6 +23,28 @@ class List(models.Model):
     shared_with = models.ManyToManyField(settings.AUTH_USER_MODEL,
                                          related_name='user_of')
 
+    # Denormalized from the item set so that listing pages don't need to
+    # touch the items table; kept up to date by `Item.save`, `Item.delete`
+    # and `Item.move_after`. The first item is the first one shown, in
+    # position order.
+    first_item_text = models.TextField(default='', editable=False)
+    item_count = models.PositiveIntegerField(default=0, editable=False)
+
+    # Bumped on every change to the list's items or sharees; clients use it
+    # to tell whether anything has changed since they last looked.
+    version = models.PositiveIntegerField(default=0, editable=False)
+
+    # When the list's items or sharees last changed. Idle anonymous lists
+    # are pruned on this (see lists.maintenance).
+    last_activity = models.DateTimeField(default=timezone.now,
+                                         editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'last_activity'],
+                         name='lists_list_activity_idx'),
+        ]
+
     def get_absolute_url(self):
         """
         Returns the absolute url to this list.
@@ -23,7 +56,82 @@ class List(models.Model):
         """
         Returns the name of the list (first element)
         """
-        return self.item_set.first().text
+        return self.first_item_text
+
+    def record_new_items(self, first_text, count=1):
+        """
+        Update the denormalized item summary after `count` items have been
+        added, the earliest of which has text `first_text`. Done in a single
+        UPDATE so concurrent inserts don't lose counts.
+        """
+        List.objects.filter(pk=self.pk).update(
+            first_item_text=Case(
+                When(item_count=0, then=Value(first_text)),
+                default=F('first_item_text')),
+            item_count=F('item_count') + count,
+            version=F('version') + 1,
+            last_activity=timezone.now(),
+        )
+        if not self.item_count:
+            self.first_item_text = first_text
+        self.item_count += count
+        self.version += 1
+        transaction.on_commit(
+            lambda: metrics.items_created.inc(amount=count))
+
+    def recalculate_summary(self):
+        """
+        Recompute the denormalized item summary from the item set.
+        """
+        first_item = self.item_set.order_by('position', 'id').first()
+        self.first_item_text = first_item.text if first_item else ''
+        self.item_count = self.item_set.count()
+        List.objects.filter(pk=self.pk).update(
+            first_item_text=self.first_item_text,
+            item_count=self.item_count,
+            version=F('version') + 1,
+            last_activity=timezone.now(),
+        )
+        self.version += 1
+
+    def publish_new_items(self, item_dicts):
+        """
+        Tell clients streaming this list about newly added items, once the
+        transaction that added them has committed.
+        """
+        list_id, version = self.id, self.version
+        transaction.on_commit(lambda: events.hub.publish(
+            list_id, 'items', item_dicts, version))
+
+    def publish_reorder(self):
+        """
+        Tell clients streaming this list that its items have been reordered.
+        """
+        list_id, version = self.id, self.version
+        transaction.on_commit(lambda: events.hub.publish(
+            list_id, 'reorder', {}, version))
+
+    def next_position(self):
+        """
+        Returns the position that puts a new item after all existing ones.
+        """
+        last = self.item_set.aggregate(last=Max('position'))['last']
+        return (last or 0) + Item.POSITION_GAP
+
+    @property
+    def etag(self):
+        """
+        Returns a strong ETag identifying the current version of the list.
+        """
+        return etag_for(self.id, self.version)
+
+    @staticmethod
+    def bump_versions(list_ids):
+        """
+        Mark the lists with ids in `list_ids` as changed.
+        """
+        List.objects.filter(pk__in=list_ids).update(
+            version=F('version') + 1, last_activity=timezone.now())
 
     @staticmethod
     def create_new(first_item_text, owner=None):
@@ -42,10 +150,181 @@ class Item(models.Model):
     """
     text = models.TextField(default="")
     list = models.ForeignKey(List, default=None)
+    # Fixed-width digest of `text`, so duplicate checks can use the
+    # (list, text_hash) index instead of comparing unbounded text values.
+    text_hash = models.CharField(max_length=64, default='', editable=False)
+    # Display order within the list. Positions are spaced POSITION_GAP apart
+    # so an item can usually be moved by rewriting only its own position.
+    position = models.BigIntegerField(blank=True, default=None,
+                                      editable=False)
+
+    POSITION_GAP = 1024
 
     class Meta:
-        ordering = ('id', )
+        ordering = ('position', 'id')
         unique_together = ('list', 'text')
+        indexes = [
+            models.Index(fields=['list', 'text_hash'],
+                         name='lists_item_text_hash_idx'),
+            models.Index(fields=['list', 'position'],
+                         name='lists_item_position_idx'),
+        ]
 
     def __str__(self):
         return self.text
+
+    @staticmethod
+    def hash_text(text):
+        """
+        Returns the hex digest stored in `text_hash` for `text`.
+        """
+        return hashlib.sha256(text.encode('utf8')).hexdigest()
+
+    def is_duplicate(self):
+        """
+        Returns whether another item in the same list has the same text.
+        """
+        return Item.objects.filter(
+            list_id=self.list_id,
+            text_hash=Item.hash_text(self.text),
+            text=self.text,
+        ).exclude(pk=self.pk).exists()
+
+    def move_after(self, previous):
+        """
+        Move this item to just after `previous`, or to the top of the list if
+        `previous` is None.
+
+        Normally this takes the midpoint of the neighbouring positions and
+        updates a single row. When the neighbours are adjacent, the items
+        that follow are spread out over the smallest stretch of the list
+        with room for them, or appended at the end.
+        """
+        others = Item.objects.filter(list_id=self.list_id).exclude(pk=self.pk)
+        if previous is None:
+            lower = None
+            following = others
+        else:
+            lower = previous.position
+            following = others.filter(
+                Q(position__gt=lower) | Q(position=lower, id__gt=previous.id))
+        following = following.order_by('position', 'id')
+        upper = following.first()
+
+        with transaction.atomic():
+            if upper is None:
+                self._set_position((lower or 0) + Item.POSITION_GAP)
+            elif lower is None:
+                self._set_position(upper.position - Item.POSITION_GAP)
+            elif upper.position - lower > 1:
+                self._set_position((lower + upper.position) // 2)
+            else:
+                self._spread_after(lower, following)
+            # The list is named after whichever item is now at the top.
+            List.objects.filter(pk=self.list_id).update(
+                first_item_text=first_item_text(),
+                version=F('version') + 1, last_activity=timezone.now())
+            self.list.version += 1
+        self.list.publish_reorder()
+
+    def _set_position(self, position):
+        self.position = position
+        Item.objects.filter(pk=self.pk).update(position=position)
+
+    def _spread_after(self, lower, following):
+        """
+        Renumber this item followed by the first items of `following` evenly
+        between `lower` and the first following item far enough away to
+        leave a gap of at least POSITION_GAP // 16 between each of them.
+        """
+        moving = [self]
+        for item in following.iterator():
+            spacing = (item.position - lower) // (len(moving) + 1)
+            if spacing >= Item.POSITION_GAP // 16:
+                break
+            moving.append(item)
+        else:
+            spacing = Item.POSITION_GAP
+        for index, item in enumerate(moving, start=1):
+            item._set_position(lower + index * spacing)
+
+    def save(self, *args, **kwargs):
+        self.text_hash = Item.hash_text(self.text)
+        adding = self._state.adding
+        if self.position is None:
+            self.position = self.list.next_position()
+        super().save(*args, **kwargs)
+        if adding:
+            self.list.record_new_items(self.text)
+            self.list.publish_new_items([{'id': self.id, 'text': self.text}])
+
+    def delete(self, *args, **kwargs):
+        list_ = self.list
+        result = super().delete(*args, **kwargs)
+        list_.recalculate_summary()
+        return result
+
+
+def first_item_text():
+    """
+    Returns an expression for the text of the first item shown in the list
+    whose primary key is the outer query's `pk`, or '' if it has none.
+    """
+    return Coalesce(
+        Subquery(Item.objects.filter(list=OuterRef('pk'))
+                 .order_by('position', 'id').values('text')[:1]),
+        Value(''))
+
+
+class ArchivedList(models.Model):
+    """
+    A compact copy of an anonymous list pruned for being idle: a single row
+    holding its item texts, in display order, as a JSON array.
+    """
+    original_id = models.PositiveIntegerField(db_index=True)
+    items = models.TextField()
+    last_activity = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+
+def etag_for(list_id, version, since=None):
+    if since is not None:
+        return f'"list-{list_id}-v{version}-since-{since}"'
+    return f'"list-{list_id}-v{version}"'
+
+
+@receiver(m2m_changed, sender=List.shared_with.through)
+def bump_version_on_share_change(sender, instance, action, reverse, pk_set,
+                                 **kwargs):
+    """
+    Sharing or unsharing a list changes what its page shows, so it gets a
+    new version. Handles changes made from either side of the relation.
+    """
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            List.bump_versions([instance.pk])
+            instance.version += 1
+            publish_sharees([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        List.bump_versions(pk_set)
+        publish_sharees(pk_set)
+    elif action == 'pre_clear':
+        list_ids = set(instance.user_of.values_list('pk', flat=True))
+        List.bump_versions(list_ids)
+        publish_sharees(list_ids)
+
+
+def publish_sharees(list_ids):
+    """
+    Tell clients streaming the given lists who they are now shared with,
+    once the current transaction has committed.
+    """
+    def publish():
+        for list_id in list_ids:
+            if events.hub.subscriber_count(list_id):
+                list_ = List.objects.get(pk=list_id)
+                sharees = list(list_.shared_with.values_list('email',
+                                                            flat=True))
+                events.hub.publish(list_id, 'sharees', sharees, list_.version)
+    list_ids = set(list_ids)
+    transaction.on_commit(publish)
@@ -0,0 +1,43 @@
+from collections import namedtuple
+
+from lists.models import List
+
+MY_LISTS_PAGE_SIZE = 50
+
+Page = namedtuple('Page', ['lists', 'cursor', 'next_cursor'])
+
+
+def parse_cursor(value):
+    """
+    Turn a cursor query parameter into a list id, or None for the first page.
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def keyset_page(queryset, cursor=None, page_size=MY_LISTS_PAGE_SIZE):
+    """
+    Return the page of `queryset` following the list id `cursor`.
+
+    Rows are walked in id order and the page is found with an indexed
+    `id > cursor` range scan, so every page costs the same no matter how deep
+    into the result set it is. One extra row is fetched to tell whether a
+    next page exists.
+    """
+    if cursor is not None:
+        queryset = queryset.filter(id__gt=cursor)
+    rows = list(queryset.order_by('id')[:page_size + 1])
+    next_cursor = rows[page_size - 1].id if len(rows) > page_size else None
+    return Page(rows[:page_size], cursor, next_cursor)
+
+
+def owned_lists_page(owner, cursor=None, page_size=MY_LISTS_PAGE_SIZE):
+    return keyset_page(List.objects.filter(owner=owner), cursor, page_size)
+
+
+def shared_lists_page(sharee, cursor=None, page_size=MY_LISTS_PAGE_SIZE):
+    return keyset_page(
+        List.objects.filter(shared_with=sharee).select_related('owner'),
+        cursor, page_size)
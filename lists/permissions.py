@@ -0,0 +1,30 @@
+from lists.models import List
+
+SharedWith = List.shared_with.through
+
+
+def can_add_items(request, list_):
+    """
+    Returns whether the user making `request` may add items to `list_`.
+
+    Anonymous lists are open to everyone; owned lists only to their owner
+    and the users they have been shared with. The answer is memoized on the
+    request, so repeated checks for the same list are free.
+    """
+    cache = request.__dict__.setdefault('_can_add_items_cache', {})
+    if list_.id not in cache:
+        cache[list_.id] = _can_add_items(request.user, list_)
+    return cache[list_.id]
+
+
+def _can_add_items(user, list_):
+    if not list_.owner_id:
+        return True
+    if not user.is_authenticated:
+        return False
+    if user.pk == list_.owner_id:
+        return True
+    # An EXISTS on the (list_id, user_id) unique index of the through table,
+    # rather than loading every sharee.
+    return SharedWith.objects.filter(
+        list_id=list_.id, user_id=user.pk).exists()
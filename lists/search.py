@@ -0,0 +1,171 @@
+"""
+Full-text search over the items of the lists a user can see.
+
+On SQLite, items are indexed in an FTS5 table kept in sync with the items
+table by triggers, so every way of writing items (including bulk_create)
+updates the index. The index covers every list, so a search finds the
+matches in all of them before keeping those in the user's lists. On
+PostgreSQL a GIN index over the items' tsvector plays the same part.
+Other backends fall back to an unindexed LIKE. Searches read from
+whichever database the router picks for items, which may be a replica.
+"""
+import re
+from collections import namedtuple
+
+from django.db import connections, router
+
+from lists.models import Item
+
+SEARCH_PAGE_SIZE = 20
+
+SearchResult = namedtuple('SearchResult',
+                          ['item_id', 'text', 'list_id', 'list_name'])
+SearchPage = namedtuple('SearchPage', ['results', 'page', 'next_page'])
+
+SQLITE_INSTALL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS lists_item_fts USING fts5(
+        text, content='lists_item', content_rowid='id')""",
+    """CREATE TRIGGER IF NOT EXISTS lists_item_fts_insert
+        AFTER INSERT ON lists_item BEGIN
+        INSERT INTO lists_item_fts(rowid, text) VALUES (new.id, new.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS lists_item_fts_delete
+        AFTER DELETE ON lists_item BEGIN
+        INSERT INTO lists_item_fts(lists_item_fts, rowid, text)
+            VALUES ('delete', old.id, old.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS lists_item_fts_update
+        AFTER UPDATE OF text ON lists_item BEGIN
+        INSERT INTO lists_item_fts(lists_item_fts, rowid, text)
+            VALUES ('delete', old.id, old.text);
+        INSERT INTO lists_item_fts(rowid, text) VALUES (new.id, new.text);
+    END""",
+    "INSERT INTO lists_item_fts(lists_item_fts) VALUES ('rebuild')",
+]
+SQLITE_UNINSTALL = [
+    'DROP TRIGGER IF EXISTS lists_item_fts_insert',
+    'DROP TRIGGER IF EXISTS lists_item_fts_delete',
+    'DROP TRIGGER IF EXISTS lists_item_fts_update',
+    'DROP TABLE IF EXISTS lists_item_fts',
+]
+POSTGRESQL_INSTALL = [
+    """CREATE INDEX IF NOT EXISTS lists_item_text_search_idx ON lists_item
+        USING GIN (to_tsvector('english', text))""",
+]
+POSTGRESQL_UNINSTALL = [
+    'DROP INDEX IF EXISTS lists_item_text_search_idx',
+]
+
+# Only lists the user owns or that are shared with them.
+VISIBLE_LISTS = """
+    (SELECT id FROM lists_list WHERE owner_id = %s
+     UNION
+     SELECT list_id FROM lists_list_shared_with WHERE user_id = %s)
+"""
+
+SQLITE_SEARCH = f"""
+    SELECT item.id, item.text, list.id, list.first_item_text
+    FROM lists_item_fts
+    JOIN lists_item item ON item.id = lists_item_fts.rowid
+    JOIN lists_list list ON list.id = item.list_id
+    WHERE lists_item_fts MATCH %s AND item.list_id IN {VISIBLE_LISTS}
+    ORDER BY bm25(lists_item_fts), item.id
+    LIMIT %s OFFSET %s
+"""
+
+POSTGRESQL_SEARCH = f"""
+    SELECT item.id, item.text, list.id, list.first_item_text
+    FROM lists_item item
+    JOIN lists_list list ON list.id = item.list_id
+    WHERE to_tsvector('english', item.text) @@ plainto_tsquery('english', %s)
+      AND item.list_id IN {VISIBLE_LISTS}
+    ORDER BY ts_rank(to_tsvector('english', item.text),
+                     plainto_tsquery('english', %s)) DESC, item.id
+    LIMIT %s OFFSET %s
+"""
+
+FALLBACK_SEARCH = f"""
+    SELECT item.id, item.text, list.id, list.first_item_text
+    FROM lists_item item
+    JOIN lists_list list ON list.id = item.list_id
+    WHERE item.text LIKE %s ESCAPE '!' AND item.list_id IN {VISIBLE_LISTS}
+    ORDER BY item.id
+    LIMIT %s OFFSET %s
+"""
+
+
+def install_search_index(schema_editor):
+    """
+    Create the search index for the database behind `schema_editor` and
+    fill it from the existing items. Safe to run again, for example after
+    a migration has rebuilt the items table and dropped its triggers.
+    """
+    for statement in _statements(schema_editor.connection.vendor, True):
+        schema_editor.execute(statement)
+
+
+def uninstall_search_index(schema_editor):
+    for statement in _statements(schema_editor.connection.vendor, False):
+        schema_editor.execute(statement)
+
+
+def _statements(vendor, install):
+    if vendor == 'sqlite':
+        return SQLITE_INSTALL if install else SQLITE_UNINSTALL
+    if vendor == 'postgresql':
+        return POSTGRESQL_INSTALL if install else POSTGRESQL_UNINSTALL
+    return []
+
+
+def terms(query):
+    return re.findall(r'\w+', query)
+
+
+def fts5_query(query):
+    """
+    Turn free text into an FTS5 query matching items containing every word,
+    treating the last word as a prefix so results appear while typing.
+    """
+    words = terms(query)
+    if not words:
+        return ''
+    return ' '.join(f'"{word}"' for word in words) + '*'
+
+
+def like_pattern(query):
+    """
+    Returns a LIKE pattern matching text that contains `query`, with its
+    wildcards escaped by `!`, which unlike a backslash needs no escaping
+    in SQL string literals on any backend.
+    """
+    for char in '!%_':
+        query = query.replace(char, '!' + char)
+    return f'%{query}%'
+
+
+def search_items(user, query, page=1, page_size=SEARCH_PAGE_SIZE):
+    """
+    Returns a page of the items matching `query` in lists `user` owns or
+    that are shared with them, best matches first.
+    """
+    page = max(page, 1)
+    if not user.is_authenticated or not terms(query):
+        return SearchPage([], page, None)
+    offset = (page - 1) * page_size
+    limit = page_size + 1
+    connection = connections[router.db_for_read(Item)]
+    if connection.vendor == 'sqlite':
+        sql = SQLITE_SEARCH
+        params = [fts5_query(query), user.pk, user.pk, limit, offset]
+    elif connection.vendor == 'postgresql':
+        sql = POSTGRESQL_SEARCH
+        params = [query, user.pk, user.pk, query, limit, offset]
+    else:
+        sql = FALLBACK_SEARCH
+        params = [like_pattern(query), user.pk, user.pk, limit, offset]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    results = [SearchResult(*row) for row in rows[:page_size]]
+    next_page = page + 1 if len(rows) > page_size else None
+    return SearchPage(results, page, next_page)
@@ -0,0 +1,128 @@
+"""
+Synthetic data at production scale, for reproducing slow pages locally.
+
+`seed_lists` creates users who own lists and share some of them with each
+other, plus owner-less lists like those made from the home page. Item
+counts follow a long-tailed (Pareto) distribution: most lists hold a
+handful of items and a few hold hundreds. Everything is drawn from a
+seeded random generator, so the same arguments always give the same data.
+
+Rows are written with bulk inserts, a batch of lists at a time, with the
+denormalized list summaries, text hashes and positions filled in directly
+rather than through `Item.save`.
+"""
+import random
+from collections import namedtuple
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from lists.models import Item, List
+
+User = get_user_model()
+SharedWith = List.shared_with.through
+
+SeedReport = namedtuple('SeedReport', ['users', 'lists', 'items', 'shares'])
+
+WORDS = (
+    'buy', 'peacock', 'feathers', 'use', 'to', 'make', 'a', 'fly', 'milk',
+    'call', 'mum', 'book', 'flights', 'fix', 'the', 'bike', 'water', 'plants',
+    'pay', 'rent', 'write', 'tests', 'refactor', 'deploy', 'read', 'goat',
+    'walk', 'dog', 'clean', 'kitchen', 'email', 'landlord', 'order', 'pizza',
+    'learn', 'django', 'renew', 'passport', 'pick', 'up', 'dry', 'cleaning',
+)
+
+# Pareto shape for items per list: most lists get one or two items, the
+# mean is about four, and one list in a few hundred gets over a hundred.
+ITEM_COUNT_SHAPE = 1.2
+
+# Items are by far the most numerous rows, and building a model instance and
+# compiling an INSERT for each costs several times more than the insert
+# itself, so they bypass bulk_create.
+INSERT_ITEM_SQL = 'INSERT INTO {} ({}) VALUES (%s, %s, %s, %s)'.format(
+    Item._meta.db_table,
+    ', '.join(Item._meta.get_field(name).column
+              for name in ('list', 'text', 'text_hash', 'position')))
+
+# How far back seeded lists were last active.
+ACTIVITY_SPREAD = timedelta(days=60)
+
+
+def seed_email(seed, number):
+    return f'seed{seed}-user{number}@example.com'
+
+
+def seed_lists(users=100, lists_per_user=10, anonymous_lists=1000,
+               max_items=500, share_ratio=0.2, max_sharees=3, seed=0,
+               batch_size=1000, now=None):
+    """
+    Create `users` users with `lists_per_user` lists each, `share_ratio` of
+    which are shared with up to `max_sharees` other seeded users, and
+    `anonymous_lists` owner-less lists. Each list has between 1 and
+    `max_items` items. Lists are inserted `batch_size` at a time.
+
+    Returns a `SeedReport` of the rows created.
+    """
+    rng = random.Random(seed)
+    now = now or timezone.now()
+
+    emails = [seed_email(seed, number) for number in range(users)]
+    existing = set(User.objects.filter(email__in=emails)
+                   .values_list('email', flat=True))
+    User.objects.bulk_create(User(email=email) for email in emails
+                             if email not in existing)
+    report = SeedReport(users - len(existing), 0, 0, 0)
+
+    owners = [email for email in emails for _ in range(lists_per_user)]
+    owners += [None] * anonymous_lists
+    next_id = (List.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+    for start in range(0, len(owners), batch_size):
+        batch = owners[start:start + batch_size]
+        counts = _create_batch(rng, next_id + start, batch, emails, now,
+                               max_items, share_ratio, max_sharees)
+        report = SeedReport(report.users, *(
+            total + count for total, count in zip(report[1:], counts)))
+    return report
+
+
+def _create_batch(rng, first_id, owners, emails, now, max_items, share_ratio,
+                  max_sharees):
+    lists, items, shares = [], [], []
+    for list_id, owner in enumerate(owners, start=first_id):
+        texts = _item_texts(rng, max_items)
+        lists.append(List(
+            id=list_id,
+            owner_id=owner,
+            first_item_text=texts[0],
+            item_count=len(texts),
+            version=len(texts),
+            last_activity=now - ACTIVITY_SPREAD * rng.random(),
+        ))
+        items.extend(
+            (list_id, text, Item.hash_text(text), index * Item.POSITION_GAP)
+            for index, text in enumerate(texts, start=1))
+        if owner is not None and len(emails) > 1 and (
+                rng.random() < share_ratio):
+            others = [email for email in rng.sample(
+                emails, min(max_sharees + 1, len(emails))) if email != owner]
+            shares.extend(SharedWith(list_id=list_id, user_id=email)
+                          for email in others[:rng.randint(1, max_sharees)])
+    with transaction.atomic():
+        List.objects.bulk_create(lists)
+        with connection.cursor() as cursor:
+            cursor.executemany(INSERT_ITEM_SQL, items)
+        SharedWith.objects.bulk_create(shares)
+    return len(lists), len(items), len(shares)
+
+
+def _item_texts(rng, max_items):
+    count = min(max_items, int(rng.paretovariate(ITEM_COUNT_SHAPE)))
+    # The number keeps texts unique within the list.
+    return [
+        ' '.join(rng.choices(WORDS, k=rng.randint(1, 5))).capitalize()
+        + f' item {number}'
+        for number in range(1, count + 1)
+    ]
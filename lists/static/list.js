@@ -1,23 +1,113 @@
 window.Superlists = {};
 
+window.Superlists.cursor = 0;
+window.Superlists.itemCount = 0;
+window.Superlists.pollInterval = 10000;
+
+window.Superlists.itemRow = function (item) {
+  window.Superlists.itemCount += 1;
+  window.Superlists.cursor = Math.max(window.Superlists.cursor, item.id);
+  return '\n<tr><td>' + window.Superlists.itemCount + ': ' + item.text + '</td></tr>';
+};
+
 window.Superlists.updateItems = function (url) {
-  $.get(url).done(function (response) {
+  // ifModified makes jQuery send the last ETag it saw for this url, so an
+  // unchanged list costs a bodiless 304.
+  $.ajax({url: url, ifModified: true}).done(function (response, status) {
+    if (status === 'notmodified') {
+      return;
+    }
     var rows = '';
+    window.Superlists.cursor = 0;
+    window.Superlists.itemCount = 0;
     for (var i=0; i<response.length; i++) {
-      var item = response[i];
-      rows += '\n<tr><td>' + (i+1) + ': ' + item.text + '</td></tr>';
+      rows += window.Superlists.itemRow(response[i]);
     }
     $('#id_list_table').html(rows);
   });
 }
 
-window.Superlists.initialize = function (url) {
+window.Superlists.appendNewItems = function (url) {
+  $.get(url, {'since': window.Superlists.cursor}).done(function (response) {
+    window.Superlists.addItems(response.items);
+    window.Superlists.cursor = Math.max(window.Superlists.cursor,
+                                        response.cursor);
+  });
+}
+
+window.Superlists.addItems = function (items) {
+  var rows = '';
+  for (var i=0; i<items.length; i++) {
+    if (items[i].id > window.Superlists.cursor) {
+      rows += window.Superlists.itemRow(items[i]);
+    }
+  }
+  $('#id_list_table').append(rows);
+}
+
+window.Superlists.updateSharees = function (sharees) {
+  var container = $('#id_shared_with').empty();
+  if (sharees.length) {
+    container.append('<span><h3>Shared with:</h3></span>');
+    var list = $('<ul id="id_shared_with_list" class="list-sharee"></ul>');
+    for (var i=0; i<sharees.length; i++) {
+      list.append($('<li></li>').text(sharees[i]));
+    }
+    container.append(list);
+  }
+}
+
+window.Superlists.listen = function (url, eventsUrl) {
+  if (!window.EventSource) {
+    return window.setInterval(function () {
+      window.Superlists.appendNewItems(url);
+    }, window.Superlists.pollInterval);
+  }
+  var source = new EventSource(eventsUrl);
+  source.addEventListener('items', function (event) {
+    window.Superlists.addItems(JSON.parse(event.data));
+  });
+  source.addEventListener('sharees', function (event) {
+    window.Superlists.updateSharees(JSON.parse(event.data));
+  });
+  source.addEventListener('sync', function (event) {
+    window.Superlists.updateSharees(JSON.parse(event.data).sharees);
+    window.Superlists.updateItems(url);
+  });
+  source.addEventListener('reorder', function () {
+    window.Superlists.updateItems(url);
+  });
+  source.addEventListener('error', function () {
+    // Refused while the server has too many streams open; poll instead.
+    if (source.readyState === EventSource.CLOSED) {
+      window.setInterval(function () {
+        window.Superlists.updateItems(url);
+      }, window.Superlists.pollInterval);
+    }
+  });
+  return source;
+}
+
+window.Superlists.fillCsrfTokens = function () {
+  var inputs = $('input.lazy-csrf-token');
+  if (inputs.length) {
+    $.get(inputs.first().data('url')).done(function (response) {
+      inputs.val(response.token);
+    });
+  }
+}
+
+window.Superlists.initialize = function (url, eventsUrl) {
+  window.Superlists.fillCsrfTokens();
   $('input[name="text"]').on('keypress', function () {
     $('.has-error').hide();
   });
 
   if (url) {
     window.Superlists.updateItems(url);
+    if (eventsUrl) {
+      window.Superlists.listen(url, eventsUrl);
+    }
 
     var form = $('#id_item_form');
     form.on('submit', function (event) {
@@ -27,7 +117,7 @@ window.Superlists.initialize = function (url) {
         'csrfmiddlewaretoken': form.find('input[name="csrfmiddlewaretoken"]').val(),
       }).done(function () {
         $('.has-error').hide();
-        window.Superlists.updateItems(url);
+        window.Superlists.appendNewItems(url);
       }).fail(function (response) {
         if (response.responseJSON['error']) {
           $('.help-block').html(response.responseJSON['error']);
@@ -0,0 +1,37 @@
+from django import template
+
+from lists.fragment_cache import get_or_render
+
+register = template.Library()
+
+
+@register.tag('list_fragment')
+def do_list_fragment(parser, token):
+    """
+    Caches the enclosed template fragment per version of a list::
+
+        {% list_fragment list 'items' %} ... {% endlist_fragment %}
+    """
+    bits = token.split_contents()
+    if len(bits) != 3:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' tag takes a list and a fragment name")
+    nodelist = parser.parse(('endlist_fragment',))
+    parser.delete_first_token()
+    return ListFragmentNode(nodelist,
+                            parser.compile_filter(bits[1]),
+                            parser.compile_filter(bits[2]))
+
+
+class ListFragmentNode(template.Node):
+
+    def __init__(self, nodelist, list_expr, name_expr):
+        self.nodelist = nodelist
+        self.list_expr = list_expr
+        self.name_expr = name_expr
+
+    def render(self, context):
+        list_ = self.list_expr.resolve(context)
+        name = self.name_expr.resolve(context)
+        return get_or_render(list_, name,
+                             lambda: self.nodelist.render(context))
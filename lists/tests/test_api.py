@@ -1,9 +1,15 @@
 import json
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
+from lists.api import MAX_BATCH_ITEMS
 from lists.forms import DUPLICATE_ITEM_ERROR, EMPTY_ITEM_ERROR
 from lists.models import List, Item
 
+User = get_user_model()
+
 
 class ListAPITest(TestCase):
     base_url = '/api/lists/{}/'
@@ -29,6 +35,81 @@ class ListAPITest(TestCase):
             ]
         )
 
+    def test_get_since_returns_only_newer_items_and_cursor(self):
+        list_ = List.objects.create()
+        item1 = Item.objects.create(list=list_, text='item 1')
+        item2 = Item.objects.create(list=list_, text='item 2')
+        item3 = Item.objects.create(list=list_, text='item 3')
+        response = self.client.get(self.base_url.format(list_.id),
+                                   {'since': item1.id})
+        self.assertEqual(
+            json.loads(response.content.decode('utf8')),
+            {'items': [{'id': item2.id, 'text': item2.text},
+                       {'id': item3.id, 'text': item3.text}],
+             'cursor': item3.id}
+        )
+
+    def test_get_since_with_nothing_new_keeps_cursor(self):
+        list_ = List.objects.create()
+        item = Item.objects.create(list=list_, text='item 1')
+        response = self.client.get(self.base_url.format(list_.id),
+                                   {'since': item.id})
+        self.assertEqual(json.loads(response.content.decode('utf8')),
+                         {'items': [], 'cursor': item.id})
+
+    def test_get_returns_etag_from_list_version(self):
+        list_ = List.objects.create()
+        Item.objects.create(list=list_, text='item 1')
+        list_.refresh_from_db()
+        response = self.client.get(self.base_url.format(list_.id))
+        self.assertEqual(response['ETag'], list_.etag)
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_matching_if_none_match_returns_304_without_reading_items(self):
+        list_ = List.objects.create()
+        Item.objects.create(list=list_, text='item 1')
+        list_.refresh_from_db()
+        with self.assertNumQueries(1):
+            response = self.client.get(self.base_url.format(list_.id),
+                                       HTTP_IF_NONE_MATCH=list_.etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_etag_changes_when_item_added(self):
+        list_ = List.objects.create()
+        etag = self.client.get(self.base_url.format(list_.id))['ETag']
+        Item.objects.create(list=list_, text='item 1')
+        response = self.client.get(self.base_url.format(list_.id),
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_changes_when_list_shared(self):
+        list_ = List.objects.create()
+        etag = self.client.get(self.base_url.format(list_.id))['ETag']
+        User.objects.create(email='a@b.com').user_of.add(list_)
+        response = self.client.get(self.base_url.format(list_.id),
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_since_responses_have_their_own_etag(self):
+        list_ = List.objects.create()
+        item = Item.objects.create(list=list_, text='item 1')
+        full = self.client.get(self.base_url.format(list_.id))
+        delta = self.client.get(self.base_url.format(list_.id),
+                                {'since': item.id},
+                                HTTP_IF_NONE_MATCH=full['ETag'])
+        self.assertEqual(delta.status_code, 200)
+        self.assertNotEqual(delta['ETag'], full['ETag'])
+
+    def test_posts_get_no_etag(self):
+        list_ = List.objects.create()
+        response = self.client.post(self.base_url.format(list_.id),
+                                    {'text': 'new item'},
+                                    HTTP_IF_NONE_MATCH=list_.etag)
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('ETag', response)
+
     def test_POSTing_a_new_item(self):
         list_ = List.objects.create()
         response = self.client.post(
@@ -70,3 +151,174 @@ class ListAPITest(TestCase):
             json.loads(response.content.decode('utf8')),
             {'error': DUPLICATE_ITEM_ERROR}
         )
+
+    def test_POST_to_someone_elses_list_is_forbidden(self):
+        owner = User.objects.create(email='a@b.com')
+        list_ = List.objects.create(owner=owner)
+        response = self.client.post(self.base_url.format(list_.id),
+                                    {'text': 'sneaky'})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(list_.item_set.count(), 0)
+
+
+class BatchCreateAPITest(TestCase):
+    base_url = '/api/lists/{}/'
+
+    def post_batch(self, list_, texts):
+        return self.client.post(self.base_url.format(list_.id),
+                                data=json.dumps(texts),
+                                content_type='application/json')
+
+    def test_creates_all_items(self):
+        list_ = List.objects.create()
+        response = self.post_batch(list_, ['one', 'two', 'three'])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([item.text for item in list_.item_set.all()],
+                         ['one', 'two', 'three'])
+
+    def test_returns_result_per_item(self):
+        list_ = List.objects.create()
+        Item.objects.create(list=list_, text='old')
+        response = self.post_batch(list_, ['new', '', 'old', 'new'])
+        new_item = list_.item_set.get(text='new')
+        self.assertEqual(
+            json.loads(response.content.decode('utf8')),
+            {'items': [
+                {'text': 'new', 'id': new_item.id},
+                {'text': '', 'error': EMPTY_ITEM_ERROR},
+                {'text': 'old', 'error': DUPLICATE_ITEM_ERROR},
+                {'text': 'new', 'error': DUPLICATE_ITEM_ERROR},
+            ]}
+        )
+
+    def test_updates_list_summary(self):
+        list_ = List.objects.create()
+        self.post_batch(list_, ['one', 'two'])
+        list_.refresh_from_db()
+        self.assertEqual(list_.name, 'one')
+        self.assertEqual(list_.item_count, 2)
+        self.assertEqual(list_.version, 1)
+
+    def test_uses_constant_number_of_queries(self):
+        query_counts = []
+        for size in (5, 50):
+            list_ = List.objects.create()
+            with CaptureQueriesContext(connection) as queries:
+                self.post_batch(list_, [f'item {i}' for i in range(size)])
+            query_counts.append(len(queries))
+        self.assertEqual(query_counts[0], query_counts[1])
+
+    def test_rejects_oversized_batches(self):
+        list_ = List.objects.create()
+        response = self.post_batch(
+            list_, [f'item {i}' for i in range(MAX_BATCH_ITEMS + 1)])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Item.objects.count(), 0)
+
+    def test_returns_400_if_nothing_valid(self):
+        list_ = List.objects.create()
+        response = self.post_batch(list_, ['', '  '])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Item.objects.count(), 0)
+
+    def test_rejects_body_that_is_not_an_array_of_strings(self):
+        list_ = List.objects.create()
+        for body in ({'text': 'one'}, [1, 2], 'one'):
+            response = self.post_batch(list_, body)
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(Item.objects.count(), 0)
+
+    def test_needs_permission(self):
+        owner = User.objects.create(email='a@b.com')
+        list_ = List.objects.create(owner=owner)
+        response = self.post_batch(list_, ['one'])
+        self.assertEqual(response.status_code, 403)
+
+
+class MoveItemAPITest(TestCase):
+
+    def setUp(self):
+        self.list = List.objects.create()
+        self.items = [Item.objects.create(list=self.list, text=f'item {i}')
+                      for i in range(3)]
+
+    def move(self, item, after):
+        return self.client.post(
+            f'/api/lists/{self.list.id}/items/{item.id}/move/',
+            {'after': after.id if after else ''})
+
+    def texts(self):
+        response = self.client.get(f'/api/lists/{self.list.id}/')
+        return [item['text']
+                for item in json.loads(response.content.decode('utf8'))]
+
+    def test_moves_item_after_another(self):
+        response = self.move(self.items[2], self.items[0])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.texts(), ['item 0', 'item 2', 'item 1'])
+
+    def test_moves_item_to_top(self):
+        self.move(self.items[2], None)
+        self.assertEqual(self.texts(), ['item 2', 'item 0', 'item 1'])
+
+    def test_list_page_shows_new_order(self):
+        self.move(self.items[2], None)
+        response = self.client.get(f'/lists/{self.list.id}/')
+        content = response.content.decode('utf8')
+        self.assertLess(content.index('item 2'), content.index('item 0'))
+
+    def test_rejects_target_from_another_list(self):
+        other = Item.objects.create(list=List.objects.create(), text='x')
+        response = self.move(self.items[2], other)
+        self.assertEqual(response.status_code, 400)
+
+    def test_needs_permission(self):
+        owner = User.objects.create(email='a@b.com')
+        list_ = List.create_new(first_item_text='one', owner=owner)
+        item = list_.item_set.get()
+        response = self.client.post(
+            f'/api/lists/{list_.id}/items/{item.id}/move/', {'after': ''})
+        self.assertEqual(response.status_code, 403)
+
+    def test_only_accepts_post(self):
+        response = self.client.get(
+            f'/api/lists/{self.list.id}/items/{self.items[2].id}/move/')
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(self.texts(), ['item 0', 'item 1', 'item 2'])
+
+    def test_unknown_item_is_not_found(self):
+        other = Item.objects.create(list=List.objects.create(), text='x')
+        response = self.move(other, None)
+        self.assertEqual(response.status_code, 404)
+
+
+class UserListsAPITest(TestCase):
+    base_url = '/api/users/{}/lists/'
+
+    def test_returns_owned_and_shared_lists(self):
+        owner = User.objects.create(email='a@b.com')
+        other = User.objects.create(email='other@b.com')
+        mine = List.create_new(first_item_text='mine', owner=owner)
+        theirs = List.create_new(first_item_text='theirs', owner=other)
+        theirs.shared_with.add(owner)
+        response = self.client.get(self.base_url.format(owner.email))
+        self.assertEqual(response['content-type'], 'application/json')
+        data = json.loads(response.content.decode('utf8'))
+        self.assertEqual(data['owned'], {
+            'lists': [{'id': mine.id, 'name': 'mine', 'item_count': 1,
+                       'owner': 'a@b.com', 'url': mine.get_absolute_url()}],
+            'next': None,
+        })
+        self.assertEqual(
+            [list_['owner'] for list_ in data['shared']['lists']],
+            ['other@b.com'])
+
+    def test_follows_cursors(self):
+        owner = User.objects.create(email='a@b.com')
+        first = List.create_new(first_item_text='first', owner=owner)
+        second = List.create_new(first_item_text='second', owner=owner)
+        response = self.client.get(self.base_url.format(owner.email),
+                                   {'owned_after': first.id})
+        data = json.loads(response.content.decode('utf8'))
+        self.assertEqual([list_['id'] for list_ in data['owned']['lists']],
+                         [second.id])
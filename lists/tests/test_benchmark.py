@@ -0,0 +1,141 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from lists.benchmark import (READ_ONLY_SCENARIOS, SCENARIOS, Targets,
+                             compare, percentile, run_benchmarks, summarise)
+from lists.management.commands.benchmark import isolated_from_site
+from lists.models import Item, List
+from lists.seeding import seed_lists
+
+
+class PercentileTest(TestCase):
+
+    def test_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 99), 7)
+
+    def test_empty(self):
+        self.assertIsNone(percentile([], 50))
+
+    def test_summarise(self):
+        result = summarise([3, 1, 2], [4, 6, 5], errors=1, total_seconds=2)
+        self.assertEqual(result['p50_ms'], 2)
+        self.assertEqual(result['queries_mean'], 5)
+        self.assertEqual(result['queries_max'], 6)
+        self.assertEqual(result['throughput_rps'], 1.5)
+        self.assertEqual(result['errors'], 1)
+
+
+class CompareTest(TestCase):
+
+    def test_reports_metrics_over_threshold(self):
+        baseline = {'view_list': {'p50_ms': 10, 'p95_ms': 20,
+                                  'p99_ms': 30, 'queries_mean': 3}}
+        current = {'view_list': {'p50_ms': 11, 'p95_ms': 30,
+                                 'p99_ms': 30, 'queries_mean': 3},
+                   'new_scenario': {'p50_ms': 100}}
+        self.assertEqual(compare(baseline, current, max_regression=20),
+                         [('view_list', 'p95_ms', 20, 30)])
+
+
+class RunBenchmarksTest(TestCase):
+
+    def setUp(self):
+        seed_lists(users=3, lists_per_user=2, anonymous_lists=2, max_items=5)
+
+    def test_runs_every_scenario_without_errors(self):
+        results = run_benchmarks(requests=3, warmup=1)
+        self.assertEqual(list(results),
+                         [scenario.name for scenario in SCENARIOS])
+        for name, result in results.items():
+            self.assertEqual(result['requests'], 3, name)
+            self.assertEqual(result['errors'], 0, name)
+            self.assertGreater(result['p99_ms'], 0, name)
+        self.assertGreater(results['view_list']['queries_mean'], 0)
+
+    def test_post_scenarios_write(self):
+        lists, items = List.objects.count(), Item.objects.count()
+        run_benchmarks(requests=2, warmup=0,
+                       only=['new_list', 'view_list_post'])
+        self.assertEqual(List.objects.count(), lists + 2)
+        self.assertEqual(Item.objects.count(), items + 4)
+
+    def test_needs_seeded_data(self):
+        List.objects.all().delete()
+        with self.assertRaises(ValueError):
+            Targets()
+
+
+class BenchmarkCommandTest(TestCase):
+
+    def setUp(self):
+        seed_lists(users=3, lists_per_user=2, anonymous_lists=2, max_items=5)
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('benchmark', '--existing-db', '--requests=2',
+                     '--warmup=0', '--scenario=api_list', *args,
+                     stdout=out, stderr=StringIO())
+        return json.loads(out.getvalue())
+
+    def test_writes_json_report(self):
+        report = self.run_command()
+        self.assertEqual(report['database'], 'sqlite')
+        self.assertEqual(list(report['results']), ['api_list'])
+
+    def test_fails_on_regression(self):
+        fd, path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        with open(path, 'w') as out:
+            json.dump({'results': {'api_list': {'p50_ms': 0.0001}}}, out)
+        with self.assertRaises(CommandError):
+            self.run_command(f'--compare={path}')
+
+    def test_needs_at_least_one_request(self):
+        with self.assertRaises(CommandError):
+            self.run_command('--requests=0')
+
+    def test_existing_db_refuses_write_scenarios(self):
+        with self.assertRaises(CommandError):
+            self.run_command('--scenario=share_list')
+
+    def test_existing_db_runs_only_read_only_scenarios(self):
+        out = StringIO()
+        call_command('benchmark', '--existing-db', '--requests=1',
+                     '--warmup=0', stdout=out, stderr=StringIO())
+        results = json.loads(out.getvalue())['results']
+        self.assertEqual(list(results), READ_ONLY_SCENARIOS)
+        self.assertNotIn('new_list', results)
+
+
+class IsolatedFromSiteTest(TestCase):
+
+    @override_settings(
+        CACHES={'fragments': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'site-fragments',
+        }},
+        DATABASE_REPLICAS=['replica1'])
+    def test_uses_private_caches_and_no_replicas(self):
+        site_cache = caches['fragments']
+        self.addCleanup(site_cache.clear)
+        site_cache.set('list-fragment:items:1:1', 'live')
+        with isolated_from_site():
+            self.assertEqual(settings.DATABASE_REPLICAS, [])
+            self.assertIsNone(caches['fragments'].get(
+                'list-fragment:items:1:1'))
+            caches['fragments'].set('list-fragment:items:1:2', 'benchmark')
+        self.assertIsNone(site_cache.get('list-fragment:items:1:2'))
+        self.assertEqual(site_cache.get('list-fragment:items:1:1'), 'live')
@@ -0,0 +1,182 @@
+import json
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from lists import events
+from lists.events import EventHub, format_event
+from lists.models import Item, List
+
+User = get_user_model()
+
+
+class EventHubTest(TestCase):
+
+    def test_publish_reaches_subscribers_of_that_list_only(self):
+        hub = EventHub()
+        ours = hub.subscribe(1)
+        theirs = hub.subscribe(2)
+        hub.publish(1, 'items', [{'id': 1, 'text': 'hi'}], 3)
+        self.assertEqual(ours.get(timeout=0),
+                         ('items', [{'id': 1, 'text': 'hi'}], 3))
+        self.assertIsNone(theirs.get(timeout=0))
+
+    def test_unsubscribe_stops_delivery(self):
+        hub = EventHub()
+        subscription = hub.subscribe(1)
+        hub.unsubscribe(subscription)
+        hub.publish(1, 'items', [], 1)
+        self.assertIsNone(subscription.get(timeout=0))
+        self.assertEqual(hub.subscriber_count(1), 0)
+
+    def test_slow_subscriber_drops_oldest_events(self):
+        hub = EventHub()
+        subscription = hub.subscribe(1)
+        for version in range(events.SUBSCRIPTION_QUEUE_SIZE + 5):
+            hub.publish(1, 'items', [], version)
+        self.assertEqual(subscription.get(timeout=0), ('items', [], 5))
+
+    def test_publish_from_another_thread_wakes_subscriber(self):
+        hub = EventHub()
+        subscription = hub.subscribe(1)
+        threading.Timer(0.01, hub.publish, (1, 'sync', {}, 1)).start()
+        self.assertEqual(subscription.get(timeout=5), ('sync', {}, 1))
+
+    def test_refuses_subscriptions_over_limit(self):
+        hub = EventHub()
+        first = hub.subscribe(1, limit=2)
+        hub.subscribe(2, limit=2)
+        with self.assertRaises(events.TooManySubscriptions):
+            hub.subscribe(3, limit=2)
+        hub.unsubscribe(first)
+        hub.unsubscribe(first)
+        hub.subscribe(3, limit=2)
+        self.assertEqual(hub.subscriber_count(3), 1)
+
+    def test_format_event(self):
+        self.assertEqual(format_event('items', [{'id': 1}], 4),
+                         'event: items\nid: 4\ndata: [{"id": 1}]\n\n')
+
+
+@override_settings(LIST_EVENTS_HEARTBEAT=0.01, LIST_EVENTS_MAX_DURATION=5)
+class ListEventsViewTest(TestCase):
+
+    def open_stream(self, list_, **headers):
+        response = self.client.get(f'/api/lists/{list_.id}/events/',
+                                   **headers)
+        self.addCleanup(response.close)
+        return response, iter(response.streaming_content)
+
+    def test_is_an_uncached_event_stream(self):
+        list_ = List.objects.create()
+        response, stream = self.open_stream(list_)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertEqual(next(stream), b'retry: 3000\n\n')
+
+    def test_forwards_published_events(self):
+        list_ = List.objects.create()
+        response, stream = self.open_stream(list_)
+        next(stream)
+        events.hub.publish(list_.id, 'items', [{'id': 7, 'text': 'x'}], 1)
+        self.assertEqual(
+            next(stream),
+            b'event: items\nid: 1\ndata: [{"id": 7, "text": "x"}]\n\n')
+
+    def test_sends_heartbeats(self):
+        list_ = List.objects.create()
+        response, stream = self.open_stream(list_)
+        next(stream)
+        self.assertEqual(next(stream), b': heartbeat\n\n')
+
+    def test_sends_sync_when_version_moved_elsewhere(self):
+        list_ = List.objects.create()
+        response, stream = self.open_stream(list_)
+        next(stream)
+        next(stream)  # heartbeat
+        List.bump_versions([list_.id])
+        self.assertEqual(
+            next(stream), b'event: sync\nid: 1\ndata: {"sharees": []}\n\n')
+
+    def test_sync_sends_sharees(self):
+        list_ = List.objects.create()
+        list_.shared_with.add(User.objects.create(email='a@b.com'))
+        List.bump_versions([list_.id])
+        response, stream = self.open_stream(list_, HTTP_LAST_EVENT_ID='0')
+        next(stream)
+        event = next(stream).decode()
+        self.assertTrue(event.startswith('event: sync\n'))
+        self.assertIn('data: {"sharees": ["a@b.com"]}', event)
+
+    def test_sends_sync_at_once_if_client_is_behind(self):
+        list_ = List.objects.create()
+        Item.objects.create(list=list_, text='missed')
+        response, stream = self.open_stream(list_, HTTP_LAST_EVENT_ID='0')
+        next(stream)
+        self.assertEqual(
+            next(stream), b'event: sync\nid: 1\ndata: {"sharees": []}\n\n')
+
+    def test_unsubscribes_when_closed(self):
+        list_ = List.objects.create()
+        response, stream = self.open_stream(list_)
+        next(stream)
+        self.assertEqual(events.hub.subscriber_count(list_.id), 1)
+        response.close()
+        self.assertEqual(events.hub.subscriber_count(list_.id), 0)
+
+    def test_unsubscribes_when_closed_before_streaming(self):
+        list_ = List.objects.create()
+        response = self.client.get(f'/api/lists/{list_.id}/events/')
+        self.assertEqual(events.hub.subscriber_count(list_.id), 1)
+        response.close()
+        self.assertEqual(events.hub.subscriber_count(list_.id), 0)
+
+    @override_settings(LIST_EVENTS_MAX_STREAMS=1)
+    def test_refuses_streams_over_limit(self):
+        list_ = List.objects.create()
+        self.open_stream(list_)
+        response = self.client.get(f'/api/lists/{list_.id}/events/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '3')
+
+    @patch('lists.api.connections')
+    def test_closes_database_connections_between_polls(self, mock_conns):
+        list_ = List.objects.create()
+        response, stream = self.open_stream(list_)
+        next(stream)
+        next(stream)  # heartbeat, after checking the version
+        self.assertTrue(mock_conns.close_all.called)
+
+
+class PublishOnCommitTest(TransactionTestCase):
+
+    def subscribe(self, list_):
+        subscription = events.hub.subscribe(list_.id)
+        self.addCleanup(events.hub.unsubscribe, subscription)
+        return subscription
+
+    def test_new_item_is_published(self):
+        list_ = List.objects.create()
+        subscription = self.subscribe(list_)
+        item = Item.objects.create(list=list_, text='new item')
+        self.assertEqual(subscription.get(timeout=0),
+                         ('items', [{'id': item.id, 'text': 'new item'}], 1))
+
+    def test_batch_is_published_as_one_event(self):
+        list_ = List.objects.create()
+        subscription = self.subscribe(list_)
+        self.client.post(f'/api/lists/{list_.id}/',
+                         data=json.dumps(['one', 'two']),
+                         content_type='application/json')
+        name, data, version = subscription.get(timeout=0)
+        self.assertEqual(name, 'items')
+        self.assertEqual([item['text'] for item in data], ['one', 'two'])
+
+    def test_sharee_changes_are_published(self):
+        list_ = List.objects.create()
+        subscription = self.subscribe(list_)
+        list_.shared_with.add(User.objects.create(email='a@b.com'))
+        self.assertEqual(subscription.get(timeout=0),
+                         ('sharees', ['a@b.com'], 1))
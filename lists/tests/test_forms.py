@@ -2,7 +2,8 @@ import unittest
 from unittest.mock import patch, Mock
 from django.test import TestCase
 from lists.forms import (DUPLICATE_ITEM_ERROR, EMPTY_ITEM_ERROR,
-                         ExistingListItemForm, ItemForm, NewListForm)
+                         ExistingListItemForm, ItemForm, NewListForm,
+                         check_item_texts)
 from lists.models import Item, List
 
 
@@ -45,6 +46,13 @@ class ExistingListItemFormTest(TestCase):
         self.assertFalse(form.is_valid())
         self.assertEqual(form.errors['text'], [DUPLICATE_ITEM_ERROR])
 
+    def test_duplicate_check_uses_text_hash(self):
+        list_ = List.objects.create()
+        Item.objects.create(list=list_, text='no twins!')
+        Item.objects.filter(list=list_).update(text_hash='stale')
+        form = ExistingListItemForm(for_list=list_, data={'text': 'no twins!'})
+        self.assertTrue(form.is_valid())
+
     def test_form_save(self):
         list_ = List.objects.create()
         form = ExistingListItemForm(for_list=list_, data={'text': 'hi'})
@@ -52,6 +60,25 @@ class ExistingListItemFormTest(TestCase):
         self.assertEqual(new_item, Item.objects.all()[0])
 
 
+class CheckItemTextsTest(TestCase):
+
+    def test_flags_empty_and_duplicate_texts(self):
+        list_ = List.objects.create()
+        Item.objects.create(list=list_, text='old')
+        self.assertEqual(
+            check_item_texts(list_, [' new ', '', 'old', 'new']),
+            [('new', None),
+             ('', EMPTY_ITEM_ERROR),
+             ('old', DUPLICATE_ITEM_ERROR),
+             ('new', DUPLICATE_ITEM_ERROR)]
+        )
+
+    def test_checks_existing_items_in_one_query(self):
+        list_ = List.objects.create()
+        with self.assertNumQueries(1):
+            check_item_texts(list_, [f'item {i}' for i in range(20)])
+
+
 class NewListFormTest(unittest.TestCase):
     @patch('lists.forms.List.create_new')
     def test_save_creates_new_list_from_post_data_if_user_not_authenticated(
@@ -0,0 +1,102 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.template import Context, Template, TemplateSyntaxError
+from django.test import TestCase, override_settings
+
+from lists.fragment_cache import fragment_key, stats
+from lists.models import Item, List
+from superlists import metrics
+
+User = get_user_model()
+
+LOCMEM_CACHES = dict(settings.CACHES, fragments={
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'test-fragments',
+})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ListFragmentCacheTest(TestCase):
+
+    def setUp(self):
+        caches['fragments'].clear()
+        stats.reset()
+        self.list = List.objects.create()
+
+    def render(self, list_):
+        return Template(
+            "{% load list_fragments %}"
+            "{% list_fragment list 'items' %}"
+            "{% for item in list.item_set.all %}{{ item.text }};{% endfor %}"
+            "{% endlist_fragment %}"
+        ).render(Context({'list': list_}))
+
+    def test_second_render_is_a_hit_without_queries(self):
+        Item.objects.create(list=self.list, text='one')
+        list_ = List.objects.get(id=self.list.id)
+        self.assertEqual(self.render(list_), 'one;')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.render(list_), 'one;')
+        self.assertEqual(stats.as_dict(), {'hits': 1, 'misses': 1})
+
+    def test_lookups_are_exported_as_metrics(self):
+        metrics.registry.reset()
+        list_ = List.objects.get(id=self.list.id)
+        self.render(list_)
+        self.render(list_)
+        self.assertEqual(metrics.fragment_cache_lookups.values,
+                         {('hit',): 1, ('miss',): 1})
+
+    def test_new_version_is_a_miss(self):
+        self.render(List.objects.get(id=self.list.id))
+        Item.objects.create(list=self.list, text='one')
+        self.assertEqual(self.render(List.objects.get(id=self.list.id)),
+                         'one;')
+        self.assertEqual(stats.as_dict(), {'hits': 0, 'misses': 2})
+
+    def test_key_includes_list_version(self):
+        self.list.version = 7
+        self.assertEqual(fragment_key(self.list, 'items'),
+                         f'list-fragment:items:{self.list.id}:7')
+
+    def test_tag_needs_list_and_name(self):
+        with self.assertRaises(TemplateSyntaxError):
+            Template("{% load list_fragments %}"
+                     "{% list_fragment list %}{% endlist_fragment %}")
+
+    def test_list_page_shows_new_items_and_sharees(self):
+        self.client.get(f'/lists/{self.list.id}/')
+        Item.objects.create(list=self.list, text='new item')
+        self.list.shared_with.add(User.objects.create(email='a@b.com'))
+        response = self.client.get(f'/lists/{self.list.id}/')
+        self.assertContains(response, 'new item')
+        self.assertContains(response, 'a@b.com')
+
+    def test_list_page_reuses_fragments(self):
+        Item.objects.create(list=self.list, text='one')
+        self.client.get(f'/lists/{self.list.id}/')
+        stats.reset()
+        self.client.get(f'/lists/{self.list.id}/')
+        self.assertEqual(stats.as_dict(), {'hits': 2, 'misses': 0})
+
+
+@override_settings(CACHES=dict(LOCMEM_CACHES, fragments={
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.path.join(tempfile.gettempdir(),
+                             'superlists-test-fragments'),
+}))
+class FileBasedFragmentCacheTest(TestCase):
+
+    def test_works_with_file_cache(self):
+        caches['fragments'].clear()
+        stats.reset()
+        list_ = List.objects.create()
+        Item.objects.create(list=list_, text='one')
+        self.client.get(f'/lists/{list_.id}/')
+        response = self.client.get(f'/lists/{list_.id}/')
+        self.assertContains(response, 'one')
+        self.assertEqual(stats.as_dict(), {'hits': 2, 'misses': 2})
@@ -0,0 +1,96 @@
+import json
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from lists.maintenance import prune_anonymous_lists
+from lists.models import ArchivedList, Item, List
+
+User = get_user_model()
+
+
+def make_idle(list_, days):
+    List.objects.filter(id=list_.id).update(
+        last_activity=timezone.now() - timedelta(days=days))
+
+
+class PruneAnonymousListsTest(TestCase):
+
+    def test_removes_idle_anonymous_lists(self):
+        idle = List.create_new(first_item_text='abandoned')
+        Item.objects.create(list=idle, text='also abandoned')
+        make_idle(idle, 31)
+        report = prune_anonymous_lists(ttl=timedelta(days=30))
+        self.assertFalse(List.objects.filter(id=idle.id).exists())
+        self.assertEqual(Item.objects.count(), 0)
+        self.assertEqual((report.lists, report.items, report.bytes),
+                         (1, 2, len('abandoned') + len('also abandoned')))
+
+    def test_keeps_recent_and_owned_lists(self):
+        recent = List.create_new(first_item_text='recent')
+        make_idle(recent, 1)
+        owned = List.create_new(first_item_text='mine',
+                                owner=User.objects.create(email='a@b.com'))
+        make_idle(owned, 100)
+        prune_anonymous_lists(ttl=timedelta(days=30))
+        self.assertEqual(List.objects.count(), 2)
+
+    def test_new_items_count_as_activity(self):
+        list_ = List.create_new(first_item_text='old')
+        make_idle(list_, 100)
+        Item.objects.create(list=list_, text='new')
+        report = prune_anonymous_lists(ttl=timedelta(days=30))
+        self.assertEqual(report.lists, 0)
+
+    def test_archives_items_in_display_order(self):
+        list_ = List.create_new(first_item_text='first')
+        second = Item.objects.create(list=list_, text='second')
+        second.move_after(None)
+        make_idle(list_, 31)
+        report = prune_anonymous_lists(ttl=timedelta(days=30))
+        archived = ArchivedList.objects.get()
+        self.assertEqual(archived.original_id, list_.id)
+        self.assertEqual(json.loads(archived.items), ['second', 'first'])
+        self.assertEqual(report.archived_bytes, len(archived.items))
+
+    def test_can_delete_without_archiving(self):
+        make_idle(List.create_new(first_item_text='gone'), 31)
+        prune_anonymous_lists(ttl=timedelta(days=30), archive=False)
+        self.assertEqual(ArchivedList.objects.count(), 0)
+        self.assertEqual(List.objects.count(), 0)
+
+    def test_removes_sharing_of_pruned_lists(self):
+        list_ = List.create_new(first_item_text='shared')
+        list_.shared_with.add(User.objects.create(email='a@b.com'))
+        make_idle(list_, 31)
+        prune_anonymous_lists(ttl=timedelta(days=30))
+        self.assertEqual(List.shared_with.through.objects.count(), 0)
+
+    def test_works_in_chunks(self):
+        for i in range(5):
+            make_idle(List.create_new(first_item_text=f'list {i}'), 31)
+        report = prune_anonymous_lists(ttl=timedelta(days=30), chunk_size=2)
+        self.assertEqual(report.lists, 5)
+        self.assertEqual(List.objects.count(), 0)
+
+    def test_dry_run_changes_nothing(self):
+        make_idle(List.create_new(first_item_text='idle'), 31)
+        report = prune_anonymous_lists(ttl=timedelta(days=30), dry_run=True)
+        self.assertEqual((report.lists, report.items), (1, 1))
+        self.assertEqual(List.objects.count(), 1)
+
+
+class PruneAnonymousListsCommandTest(TestCase):
+
+    def test_reports_what_was_reclaimed(self):
+        make_idle(List.create_new(first_item_text='idle'), 31)
+        out = StringIO()
+        call_command('prune_anonymous_lists', '--ttl-days=30', '--pause=0',
+                     stdout=out)
+        self.assertIn('Removed 1 lists and 1 items (4 bytes of item text)',
+                      out.getvalue())
+        self.assertIn('Archived', out.getvalue())
@@ -0,0 +1,55 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from lists.models import Item, List
+from lists.search import search_items
+
+User = get_user_model()
+
+
+class BackfillListSummariesTest(TestCase):
+
+    def test_backfills_stale_summaries(self):
+        list_ = List.objects.create()
+        Item.objects.create(list=list_, text='first item')
+        Item.objects.create(list=list_, text='second item')
+        List.objects.update(first_item_text='', item_count=0)
+
+        call_command('backfill_list_summaries', stdout=StringIO())
+
+        list_ = List.objects.get(id=list_.id)
+        self.assertEqual(list_.name, 'first item')
+        self.assertEqual(list_.item_count, 2)
+
+    def test_takes_name_from_first_item_shown(self):
+        list_ = List.objects.create()
+        Item.objects.create(list=list_, text='first item')
+        second = Item.objects.create(list=list_, text='second item')
+        second.move_after(None)
+        List.objects.update(first_item_text='')
+
+        call_command('backfill_list_summaries', stdout=StringIO())
+
+        self.assertEqual(List.objects.get(id=list_.id).name, 'second item')
+
+    def test_reports_number_of_lists_updated(self):
+        for text in ('a', 'b', 'c'):
+            List.create_new(first_item_text=text)
+        List.objects.filter(first_item_text='b').update(item_count=7)
+        out = StringIO()
+        call_command('backfill_list_summaries', '--chunk-size=2', stdout=out)
+        self.assertIn('Updated 1 lists', out.getvalue())
+
+
+class RebuildSearchIndexTest(TestCase):
+
+    def test_reindexes_existing_items(self):
+        user = User.objects.create(email='a@b.com')
+        List.create_new(first_item_text='peacock feathers', owner=user)
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(
+            [result.text for result in search_items(user, 'peacock').results],
+            ['peacock feathers'])
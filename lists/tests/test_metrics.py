@@ -0,0 +1,171 @@
+import os
+import shutil
+import tempfile
+import threading
+from unittest.mock import patch
+
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from lists.models import Item, List
+from superlists import metrics
+from superlists.metrics import Registry
+
+
+class RegistryTest(TestCase):
+
+    def setUp(self):
+        self.registry = Registry()
+        self.counter = self.registry.counter('things_total', 'Things.',
+                                             ['kind'])
+        self.histogram = self.registry.histogram(
+            'wait_seconds', 'Waits.', buckets=(0.1, 1))
+
+    def test_counter_exposition(self):
+        self.counter.inc('a')
+        self.counter.inc('a', amount=2)
+        self.counter.inc('b"')
+        self.assertEqual(self.registry.exposition().splitlines()[:4], [
+            '# HELP things_total Things.',
+            '# TYPE things_total counter',
+            'things_total{kind="a"} 3',
+            'things_total{kind="b\\""} 1',
+        ])
+
+    def test_histogram_exposition(self):
+        for value in (0.05, 0.5, 0.7, 5):
+            self.histogram.observe(value)
+        self.assertEqual(self.registry.exposition().splitlines()[-7:], [
+            '# HELP wait_seconds Waits.',
+            '# TYPE wait_seconds histogram',
+            'wait_seconds_bucket{le="0.1"} 1',
+            'wait_seconds_bucket{le="1"} 3',
+            'wait_seconds_bucket{le="+Inf"} 4',
+            'wait_seconds_sum 6.25',
+            'wait_seconds_count 4',
+        ])
+
+    def test_checks_label_count(self):
+        with self.assertRaises(ValueError):
+            self.counter.inc()
+
+    def test_adds_up_processes_sharing_a_directory(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        other = Registry()
+        other_counter = other.counter('things_total', 'Things.', ['kind'])
+        other_histogram = other.histogram('wait_seconds', 'Waits.',
+                                          buckets=(0.1, 1))
+        self.counter.inc('a')
+        self.histogram.observe(0.05)
+        other_counter.inc('a', amount=4)
+        other_counter.inc('c')
+        other_histogram.observe(0.5)
+        other.flush(directory)
+
+        totals = self.registry.collect(directory)
+
+        self.assertEqual(totals['things_total'], {('a',): 5, ('c',): 1})
+        self.assertEqual(totals['wait_seconds'],
+                         {(): ([1, 1], 0.55, 2)})
+
+    def test_concurrent_flushes_and_collects(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        errors = []
+
+        def flush_and_collect():
+            try:
+                for _ in range(50):
+                    self.counter.inc('a')
+                    self.registry.flush(directory)
+                    self.registry.collect(directory)
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=flush_and_collect)
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(self.registry.collect(directory)['things_total'],
+                         {('a',): 400})
+        self.assertEqual([name for name in os.listdir(directory)
+                          if name.endswith('.tmp')], [])
+
+    def test_collect_skips_unreadable_files(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with open(os.path.join(directory, 'partial.json'), 'w') as out:
+            out.write('{"things_total": [[["a"], ')
+        self.counter.inc('a')
+        with self.assertLogs('superlists.metrics', 'WARNING'):
+            totals = self.registry.collect(directory)
+        self.assertEqual(totals['things_total'], {('a',): 1})
+
+
+class MetricsMiddlewareTest(TestCase):
+
+    def setUp(self):
+        metrics.registry.reset()
+
+    def test_counts_responses_and_db_use_by_url_name(self):
+        list_ = List.create_new(first_item_text='an item')
+        self.client.get(f'/lists/{list_.id}/')
+        self.client.post(f'/lists/{list_.id}/', data={'text': 'another'})
+        self.client.get(f'/lists/{list_.id}/')
+        totals = metrics.registry.collect()
+        responses = totals['superlists_responses_total']
+        self.assertEqual(responses[('view_list', '200')], 2)
+        self.assertEqual(responses[('view_list', '302')], 1)
+        self.assertGreater(
+            totals['superlists_db_queries_total'][('view_list',)], 0)
+        _, _, count = totals['superlists_request_duration_seconds'][
+            ('view_list', 'GET')]
+        self.assertEqual(count, 2)
+
+    @override_settings(METRICS_DIR=None)
+    def test_serves_text_exposition(self):
+        self.client.get('/')
+        response = self.client.get('/metrics')
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        self.assertContains(
+            response, 'superlists_responses_total{view="home",status="200"} 1')
+        self.assertContains(
+            response, '# TYPE superlists_request_duration_seconds histogram')
+
+    def test_writes_metrics_files_when_given_a_directory(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with self.settings(METRICS_DIR=directory):
+            self.client.get('/')
+            response = self.client.get('/metrics')
+        self.assertContains(response, 'view="home"')
+
+
+    def test_flush_errors_dont_fail_requests(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        metrics.registry.last_flush = 0
+        with self.settings(METRICS_DIR=directory), \
+                patch('superlists.metrics.Registry._flush',
+                      side_effect=OSError('disk full')), \
+                self.assertLogs('superlists.metrics', 'ERROR'):
+            response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+
+class ItemsCreatedMetricTest(TransactionTestCase):
+
+    def setUp(self):
+        metrics.registry.reset()
+
+    def test_counts_items_once_committed(self):
+        list_ = List.create_new(first_item_text='an item')
+        Item.objects.create(list=list_, text='another')
+        self.client.post(f'/api/lists/{list_.id}/',
+                         data='["three", "four"]',
+                         content_type='application/json')
+        self.assertEqual(
+            metrics.registry.collect()['superlists_items_created_total'],
+            {(): 4})
@@ -2,7 +2,9 @@ from lists.models import Item, List
 
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 User = get_user_model()
 
@@ -49,11 +51,104 @@ class ItemModelTest(TestCase):
             list(Item.objects.all()),
             [item1, item2, item3])
 
+    def test_saving_stores_text_hash(self):
+        list_ = List.objects.create()
+        item = Item.objects.create(list=list_, text='some text')
+        self.assertEqual(len(item.text_hash), 64)
+        self.assertEqual(item.text_hash, Item.hash_text('some text'))
+        item.text = 'other text'
+        item.save()
+        self.assertEqual(Item.objects.get(id=item.id).text_hash,
+                         Item.hash_text('other text'))
+
+    def test_is_duplicate(self):
+        list_ = List.objects.create()
+        item = Item.objects.create(list=list_, text='blah')
+        self.assertFalse(item.is_duplicate())
+        self.assertTrue(Item(list=list_, text='blah').is_duplicate())
+        self.assertFalse(Item(list=list_, text='blah2').is_duplicate())
+        self.assertFalse(
+            Item(list=List.objects.create(), text='blah').is_duplicate())
+
     def test_string_representation(self):
         item = Item(text='some text')
         self.assertEqual(str(item), 'some text')
 
 
+class ItemPositionTest(TestCase):
+
+    def setUp(self):
+        self.list = List.objects.create()
+        self.items = [Item.objects.create(list=self.list, text=f'item {i}')
+                      for i in range(4)]
+
+    def texts(self):
+        return [item.text for item in self.list.item_set.all()]
+
+    def test_new_items_are_appended_with_gaps(self):
+        self.assertEqual([item.position for item in self.items],
+                         [1024, 2048, 3072, 4096])
+
+    def test_move_after_is_a_single_update_when_there_is_room(self):
+        item = self.items[3]
+        with CaptureQueriesContext(connection) as queries:
+            item.move_after(self.items[0])
+        item_updates = [query for query in queries.captured_queries
+                        if query['sql'].startswith('UPDATE "lists_item"')]
+        self.assertEqual(len(item_updates), 1)
+        self.assertEqual(self.texts(),
+                         ['item 0', 'item 3', 'item 1', 'item 2'])
+
+    def test_move_to_top(self):
+        self.items[2].move_after(None)
+        self.assertEqual(self.texts(),
+                         ['item 2', 'item 0', 'item 1', 'item 3'])
+
+    def test_move_to_end(self):
+        self.items[0].move_after(self.items[3])
+        self.assertEqual(self.texts(),
+                         ['item 1', 'item 2', 'item 3', 'item 0'])
+
+    def test_move_bumps_list_version(self):
+        version = List.objects.get(id=self.list.id).version
+        self.items[0].move_after(self.items[3])
+        self.assertEqual(List.objects.get(id=self.list.id).version,
+                         version + 1)
+
+    def test_moving_to_top_renames_list(self):
+        self.items[2].move_after(None)
+        self.assertEqual(List.objects.get(id=self.list.id).name, 'item 2')
+
+    def test_moving_first_item_down_renames_list(self):
+        self.items[0].move_after(self.items[1])
+        self.assertEqual(List.objects.get(id=self.list.id).name, 'item 1')
+
+    def test_deleting_an_item_keeps_name_of_first_shown(self):
+        self.items[3].move_after(None)
+        Item.objects.get(id=self.items[0].id).delete()
+        self.assertEqual(List.objects.get(id=self.list.id).name, 'item 3')
+
+    def test_renumbers_locally_when_neighbours_are_adjacent(self):
+        Item.objects.filter(id=self.items[1].id).update(position=1025)
+        Item.objects.filter(id=self.items[2].id).update(position=1026)
+        item = Item.objects.get(id=self.items[3].id)
+        item.move_after(Item.objects.get(id=self.items[0].id))
+        self.assertEqual(self.texts(),
+                         ['item 0', 'item 3', 'item 1', 'item 2'])
+        positions = [item.position for item in self.list.item_set.all()]
+        self.assertEqual(positions[0], 1024)
+        self.assertTrue(all(b - a >= Item.POSITION_GAP // 16
+                            for a, b in zip(positions, positions[1:])))
+
+    def test_repeated_moves_into_same_slot_keep_order(self):
+        for _ in range(20):
+            last = self.list.item_set.last()
+            first = self.list.item_set.first()
+            last.move_after(first)
+        self.assertEqual(len(set(self.list.item_set.values_list(
+            'position', flat=True))), 4)
+
+
 class ListModelTest(TestCase):
 
     def test_get_absolute_url(self):
@@ -90,6 +185,51 @@ class ListModelTest(TestCase):
         Item.objects.create(list=list_, text='second item')
         self.assertEqual(list_.name, 'first item')
 
+    def test_list_name_does_not_query_items(self):
+        list_ = List.create_new(first_item_text='first item')
+        Item.objects.create(list=list_, text='second item')
+        list_ = List.objects.get(id=list_.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(list_.name, 'first item')
+
+    def test_item_count_tracks_created_items(self):
+        list_ = List.create_new(first_item_text='one')
+        Item.objects.create(list=list_, text='two')
+        Item(list=list_, text='three').save()
+        self.assertEqual(list_.item_count, 3)
+        self.assertEqual(List.objects.get(id=list_.id).item_count, 3)
+
+    def test_saving_existing_item_does_not_change_count(self):
+        list_ = List.objects.create()
+        item = Item.objects.create(list=list_, text='one')
+        item.text = 'changed'
+        item.save()
+        self.assertEqual(List.objects.get(id=list_.id).item_count, 1)
+
+    def test_deleting_first_item_renames_list(self):
+        list_ = List.objects.create()
+        first = Item.objects.create(list=list_, text='first item')
+        Item.objects.create(list=list_, text='second item')
+        first.delete()
+        list_ = List.objects.get(id=list_.id)
+        self.assertEqual(list_.name, 'second item')
+        self.assertEqual(list_.item_count, 1)
+
+    def test_version_increases_when_items_added(self):
+        list_ = List.objects.create()
+        Item.objects.create(list=list_, text='one')
+        Item.objects.create(list=list_, text='two')
+        self.assertEqual(List.objects.get(id=list_.id).version, 2)
+
+    def test_version_increases_when_sharees_change(self):
+        list_ = List.objects.create()
+        user = User.objects.create(email='a@b.com')
+        list_.shared_with.add(user)
+        list_.shared_with.remove(user)
+        user.user_of.add(list_)
+        user.user_of.clear()
+        self.assertEqual(List.objects.get(id=list_.id).version, 4)
+
     def test_list_can_add_shared_with(self):
         list_ = List.objects.create()
         user = User.objects.create(email="a@b.com")
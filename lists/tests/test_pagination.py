@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from lists.models import List
+from lists.pagination import keyset_page, parse_cursor, shared_lists_page
+
+User = get_user_model()
+
+
+class KeysetPageTest(TestCase):
+
+    def setUp(self):
+        self.lists = [List.objects.create() for _ in range(5)]
+
+    def test_first_page_and_next_cursor(self):
+        page = keyset_page(List.objects.all(), page_size=2)
+        self.assertEqual(page.lists, self.lists[:2])
+        self.assertEqual(page.next_cursor, self.lists[1].id)
+
+    def test_follows_cursor(self):
+        page = keyset_page(List.objects.all(), self.lists[1].id, page_size=2)
+        self.assertEqual(page.lists, self.lists[2:4])
+        self.assertEqual(page.cursor, self.lists[1].id)
+
+    def test_last_page_has_no_next_cursor(self):
+        page = keyset_page(List.objects.all(), self.lists[2].id, page_size=2)
+        self.assertEqual(page.lists, self.lists[3:])
+        self.assertIsNone(page.next_cursor)
+
+    def test_each_page_is_one_query(self):
+        with self.assertNumQueries(1):
+            keyset_page(List.objects.all(), self.lists[3].id, page_size=2)
+
+    def test_parse_cursor_ignores_garbage(self):
+        self.assertIsNone(parse_cursor(None))
+        self.assertIsNone(parse_cursor('abc'))
+        self.assertEqual(parse_cursor('12'), 12)
+
+
+class SharedListsPageTest(TestCase):
+
+    def test_loads_owners_in_same_query(self):
+        sharee = User.objects.create(email='a@b.com')
+        for i in range(3):
+            owner = User.objects.create(email=f'owner{i}@b.com')
+            List.objects.create(owner=owner).shared_with.add(sharee)
+        with self.assertNumQueries(1):
+            page = shared_lists_page(sharee)
+            owners = [list_.owner.email for list_ in page.lists]
+        self.assertEqual(len(owners), 3)
@@ -0,0 +1,61 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpRequest
+from django.test import TestCase
+
+from lists.models import List
+from lists.permissions import can_add_items
+
+User = get_user_model()
+
+
+def request_for(user):
+    request = HttpRequest()
+    request.user = user
+    return request
+
+
+class CanAddItemsTest(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create(email='owner@example.com')
+        self.list = List.objects.create(owner=self.owner)
+
+    def test_anyone_can_add_to_anonymous_list(self):
+        list_ = List.objects.create()
+        self.assertTrue(can_add_items(request_for(AnonymousUser()), list_))
+
+    def test_owner_can_add(self):
+        self.assertTrue(can_add_items(request_for(self.owner), self.list))
+
+    def test_anonymous_user_cannot_add_to_owned_list(self):
+        self.assertFalse(
+            can_add_items(request_for(AnonymousUser()), self.list))
+
+    def test_sharee_can_add(self):
+        sharee = User.objects.create(email='sharee@example.com')
+        self.list.shared_with.add(sharee)
+        self.assertTrue(can_add_items(request_for(sharee), self.list))
+
+    def test_stranger_cannot_add(self):
+        stranger = User.objects.create(email='stranger@example.com')
+        self.assertFalse(can_add_items(request_for(stranger), self.list))
+
+    def test_query_count_does_not_grow_with_sharees(self):
+        sharee = User.objects.create(email='sharee@example.com')
+        self.list.shared_with.add(sharee)
+        for count in (1, 10, 100):
+            self.list.shared_with.add(*[
+                User.objects.create(email=f'user{count}-{i}@example.com')
+                for i in range(count)])
+            with self.assertNumQueries(1):
+                self.assertTrue(
+                    can_add_items(request_for(sharee), self.list))
+
+    def test_result_is_memoized_per_request(self):
+        sharee = User.objects.create(email='sharee@example.com')
+        self.list.shared_with.add(sharee)
+        request = request_for(sharee)
+        can_add_items(request, self.list)
+        with self.assertNumQueries(0):
+            self.assertTrue(can_add_items(request, self.list))
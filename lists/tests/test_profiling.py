@@ -0,0 +1,141 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from lists.models import List
+from superlists.profiling import StackSampler, profile_files, rotate
+
+
+class StackSamplerTest(TestCase):
+
+    def test_counts_collapsed_stacks_of_thread(self):
+        def wait_for_samples():
+            while not sampler.stacks:
+                time.sleep(0.001)
+
+        sampler = StackSampler(threading.get_ident(), 0.0001)
+        sampler.start()
+        wait_for_samples()
+        sampler.stop()
+        [stack] = sampler.stacks.most_common(1)
+        frames = stack[0].split(';')
+        self.assertIn('wait_for_samples (lists/tests/test_profiling.py:',
+                      frames[-1])
+        self.assertIn('test_counts_collapsed_stacks_of_thread', frames[-2])
+
+
+class ProfilingMiddlewareTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings = override_settings(
+            PROFILING_DIR=self.directory, PROFILING_SAMPLE_RATE=0,
+            PROFILING_ALLOWED_IPS=['127.0.0.1'],
+            PROFILING_CLIENT_IP_HEADER=None,
+            PROFILING_SAMPLER_INTERVAL=0.0001)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.list = List.create_new(first_item_text='an item')
+
+    def test_profiles_nothing_by_default(self):
+        response = self.client.get(f'/lists/{self.list.id}/')
+        self.assertNotIn('X-Profile', response)
+        self.assertEqual(profile_files(self.directory), [])
+
+    def test_header_from_allowed_ip_writes_collapsed_stacks(self):
+        response = self.client.get(f'/lists/{self.list.id}/',
+                                   HTTP_X_PROFILE='1')
+        self.assertEqual(profile_files(self.directory),
+                         [os.path.join(self.directory, response['X-Profile'])])
+        self.assertTrue(response['X-Profile'].startswith('view_list/'))
+        self.assertTrue(response['X-Profile'].endswith('.collapsed'))
+
+    def test_ignores_header_from_other_ips(self):
+        self.client.get(f'/lists/{self.list.id}/', HTTP_X_PROFILE='1',
+                        REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(profile_files(self.directory), [])
+
+    @override_settings(PROFILING_SAMPLE_RATE=1, PROFILING_MODE='cprofile')
+    def test_sampled_requests_can_use_cprofile(self):
+        response = self.client.get('/')
+        self.assertNotIn('X-Profile', response)
+        [path] = profile_files(self.directory)
+        self.assertTrue(path.endswith('.prof'))
+        self.assertIn(os.path.join(self.directory, 'home'), path)
+
+    def test_rotate_keeps_newest_files(self):
+        for number in range(5):
+            self.client.get('/', HTTP_X_PROFILE='1')
+        oldest = profile_files(self.directory)[:3]
+        rotate(self.directory, 2)
+        remaining = profile_files(self.directory)
+        self.assertEqual(len(remaining), 2)
+        self.assertFalse(set(oldest) & set(remaining))
+
+    def test_skips_files_removed_by_another_worker(self):
+        for number in range(3):
+            self.client.get('/', HTTP_X_PROFILE='1')
+        gone = profile_files(self.directory)[0]
+        getmtime = os.path.getmtime
+
+        def removed_first(path):
+            if path == gone:
+                raise FileNotFoundError(path)
+            return getmtime(path)
+
+        with patch('os.path.getmtime', removed_first):
+            self.assertEqual(len(profile_files(self.directory)), 2)
+
+    def test_failing_to_write_profile_doesnt_fail_request(self):
+        with patch('superlists.profiling.rotate', side_effect=OSError), \
+                self.assertLogs('superlists.profiling', 'ERROR'):
+            response = self.client.get('/', HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile', response)
+
+
+class MergeProfilesTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, url_name, name, content):
+        os.makedirs(os.path.join(self.directory, url_name), exist_ok=True)
+        with open(os.path.join(self.directory, url_name, name), 'w') as out:
+            out.write(content)
+
+    def merge(self, *args):
+        out = StringIO()
+        call_command('merge_profiles', f'--dir={self.directory}', *args,
+                     stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_adds_up_collapsed_stacks(self):
+        self.write('view_list', 'a.collapsed', 'main;view 3\nmain;db 1\n')
+        self.write('view_list', 'b.collapsed', 'main;view 2\n')
+        self.write('home', 'c.collapsed', 'main;home 5\n')
+        self.assertEqual(self.merge(),
+                         'main;db 1\nmain;home 5\nmain;view 5\n')
+        self.assertEqual(self.merge('--view=view_list'),
+                         'main;db 1\nmain;view 5\n')
+
+    @override_settings(PROFILING_SAMPLE_RATE=1, PROFILING_MODE='cprofile')
+    def test_merges_pstats(self):
+        with self.settings(PROFILING_DIR=self.directory):
+            self.client.get('/')
+            self.client.get('/')
+        self.assertIn('home_page', self.merge('--format=pstats'))
+
+    def test_complains_when_nothing_to_merge(self):
+        with self.assertRaises(CommandError):
+            self.merge()
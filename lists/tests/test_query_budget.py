@@ -0,0 +1,202 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.core.signals import request_started
+from django.core.urlresolvers import resolve
+from django.db import connection
+from django.db.utils import ConnectionHandler
+from django.test import RequestFactory, TestCase, override_settings
+
+from lists.models import Item, List
+from superlists.query_budget import (QueryBudget, QueryBudgetExceeded,
+                                     QueryBudgetMiddleware, QueryStats,
+                                     budgets, query_stats, signature,
+                                     violations)
+
+User = get_user_model()
+
+
+class SignatureTest(TestCase):
+
+    def test_blanks_out_literals(self):
+        self.assertEqual(
+            signature("SELECT * FROM t WHERE id = 12 AND name = 'it''s'"),
+            'SELECT * FROM t WHERE id = ? AND name = ?')
+
+    def test_collapses_value_lists(self):
+        self.assertEqual(signature('SELECT * FROM t WHERE id IN (1, 2, 3)'),
+                         signature('SELECT * FROM t WHERE id IN (4, 5)'))
+        self.assertIn('IN (...)', signature('WHERE id IN (1, 2)'))
+
+    def test_ignores_executemany_count(self):
+        self.assertEqual(signature('3 times: INSERT INTO t VALUES (%s)'),
+                         'INSERT INTO t VALUES (%s)')
+
+
+class QueryStatsTest(TestCase):
+
+    def test_counts_repeated_signatures(self):
+        stats = query_stats([
+            {'sql': 'SELECT * FROM t WHERE id = 1', 'time': '0.001'},
+            {'sql': 'SELECT * FROM t WHERE id = 2', 'time': '0.002'},
+            {'sql': 'SELECT * FROM u', 'time': '0.001'},
+        ])
+        self.assertEqual(stats.count, 3)
+        self.assertAlmostEqual(stats.time_ms, 4)
+        self.assertEqual(stats.repeated,
+                         {'SELECT * FROM t WHERE id = ?': 2})
+
+    def test_ignores_transaction_control(self):
+        stats = query_stats([
+            {'sql': sql, 'time': '0.001'} for sql in (
+                'BEGIN', 'SAVEPOINT "s1"', 'INSERT INTO t VALUES (1)',
+                'RELEASE SAVEPOINT "s1"', 'ROLLBACK TO SAVEPOINT "s2"',
+                'COMMIT')
+        ])
+        self.assertEqual(stats.count, 1)
+
+
+class ViolationsTest(TestCase):
+
+    def test_within_budget(self):
+        stats = QueryStats(3, 10, {'SELECT ?': 2})
+        self.assertEqual(
+            violations(QueryBudget(queries=3, time_ms=10, repeats=2), stats),
+            [])
+
+    def test_time_violations_are_not_enforced(self):
+        stats = QueryStats(5, 20, {'SELECT ?': 3})
+        found = violations(QueryBudget(queries=4, time_ms=10), stats)
+        self.assertEqual([enforced for _, enforced in found],
+                         [True, True, False])
+
+
+class QueryBudgetMiddlewareTest(TestCase):
+
+    def test_records_stats_on_request(self):
+        list_ = List.create_new(first_item_text='an item')
+        response = self.client.get(f'/lists/{list_.id}/')
+        self.assertGreater(response.wsgi_request.query_stats.count, 0)
+
+    def test_raises_over_budget_under_test(self):
+        list_ = List.create_new(first_item_text='an item')
+        with patch.dict(budgets, {'view_list': QueryBudget(queries=1)}):
+            with self.assertRaises(QueryBudgetExceeded), \
+                    self.assertLogs('superlists.query_budget', 'WARNING'):
+                self.client.get(f'/lists/{list_.id}/')
+
+    @override_settings(QUERY_BUDGET_ENFORCE=False)
+    def test_logs_over_budget_when_not_enforcing(self):
+        list_ = List.create_new(first_item_text='an item')
+        with patch.dict(budgets, {'view_list': QueryBudget(queries=1)}):
+            with self.assertLogs('superlists.query_budget', 'WARNING') as logs:
+                response = self.client.get(f'/lists/{list_.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('view_list', logs.output[0])
+
+    def test_catches_n_plus_one(self):
+        for email in ('a@b.com', 'c@d.com'):
+            List.create_new(first_item_text='an item',
+                            owner=User.objects.create(email=email))
+
+        def owner_of_every_list(request):
+            owners = [list_.owner.email for list_ in List.objects.all()]
+            return HttpResponse(', '.join(owners))
+
+        request = RequestFactory().get('/')
+        request.resolver_match = resolve('/lists/users/a@b.com/')
+        middleware = QueryBudgetMiddleware(owner_of_every_list)
+        with patch.dict(budgets, {'my_lists': QueryBudget()}):
+            with self.assertRaisesRegex(QueryBudgetExceeded, 'run 2 times'), \
+                    self.assertLogs('superlists.query_budget', 'WARNING'):
+                middleware(request)
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_records_queries_on_replicas(self):
+        replica = ConnectionHandler({'default': {
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:',
+        }})['default']
+        self.addCleanup(replica.close)
+
+        def read_from_both(request):
+            for db in (connection, replica):
+                with db.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        connections = {'default': connection, 'replica1': replica}
+        with patch('superlists.query_budget.connections', connections):
+            QueryBudgetMiddleware(read_from_both)(request)
+        self.assertEqual(request.query_stats.count, 2)
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_does_not_connect_to_unused_replicas(self):
+        replica = ConnectionHandler({'default': {
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:',
+        }})['default']
+        self.addCleanup(replica.close)
+        request = RequestFactory().get('/')
+        connections = {'default': connection, 'replica1': replica}
+        with patch('superlists.query_budget.connections', connections):
+            QueryBudgetMiddleware(lambda request: HttpResponse())(request)
+        self.assertIsNone(replica.connection)
+
+    def test_leaves_request_signals_alone(self):
+        # Disconnecting them isn't thread-safe.
+        request = RequestFactory().get('/')
+        with patch.object(request_started, 'disconnect') as disconnect:
+            QueryBudgetMiddleware(lambda request: HttpResponse())(request)
+        self.assertFalse(disconnect.called)
+
+    def test_records_queries_when_log_is_full(self):
+        connection.queries_log.extend(
+            {'sql': 'SELECT 1', 'time': '0.000'}
+            for _ in range(connection.queries_log.maxlen))
+
+        def one_query(request):
+            List.objects.count()
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        QueryBudgetMiddleware(one_query)(request)
+        self.assertEqual(request.query_stats.count, 1)
+        self.assertEqual(len(connection.queries_log),
+                         connection.queries_log.maxlen)
+
+
+class ListViewBudgetsTest(TestCase):
+    """
+    Drives the list views at a realistic size, so that the middleware
+    fails the test if any of them goes over its budget.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(email='a@b.com')
+        self.other = User.objects.create(email='c@d.com')
+        for number in range(10):
+            list_ = List.create_new(first_item_text=f'list {number}',
+                                    owner=self.user)
+            for item in range(5):
+                Item.objects.create(list=list_, text=f'item {item}')
+            list_.shared_with.add(self.other)
+        self.list = list_
+        self.client.force_login(self.user)
+
+    def test_list_views(self):
+        self.client.get('/')
+        self.client.get(f'/lists/{self.list.id}/')
+        self.client.post(f'/lists/{self.list.id}/', {'text': 'new item'})
+        self.client.post('/lists/new', {'text': 'new list'})
+        self.client.get('/lists/users/a@b.com/')
+        self.client.get('/lists/users/c@d.com/')
+        self.client.post(f'/lists/{self.list.id}/share',
+                         {'sharee': 'c@d.com'})
+        self.client.get('/lists/search?q=item')
+
+    def test_api_views(self):
+        self.client.get(f'/api/lists/{self.list.id}/')
+        self.client.post(f'/api/lists/{self.list.id}/', {'text': 'new item'})
+        self.client.get('/api/users/a@b.com/lists/')
+        self.client.get('/api/search/?q=item')
@@ -0,0 +1,88 @@
+import time
+
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.contrib.sessions.models import Session
+from django.core.urlresolvers import resolve
+from django.db import router
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from accounts.models import Token
+from lists.models import List
+from superlists.routers import LAST_WRITE_SESSION_KEY, ReplicaMiddleware
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTest(TestCase):
+
+    def handle(self, method, path, writes=False, session=None):
+        """
+        Runs a request through ReplicaMiddleware as the handler would, to
+        a view that notes where List, Session and Token reads would go.
+        """
+        request = getattr(RequestFactory(), method)(path)
+        SessionMiddleware().process_request(request)
+        if session:
+            request.session.update(session)
+            request.session.modified = False
+        request.resolver_match = resolve(path)
+        self.reads = {}
+
+        def view(request):
+            for model in (List, Session, Token):
+                self.reads[model] = router.db_for_read(model)
+            if writes:
+                router.db_for_write(List)
+            return HttpResponse()
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = ReplicaMiddleware(get_response)
+        middleware(request)
+        return request
+
+    def test_reads_from_primary_outside_requests(self):
+        self.assertEqual(router.db_for_read(List), 'default')
+
+    def test_get_of_read_view_reads_from_replica(self):
+        self.handle('get', '/lists/1/')
+        self.assertEqual(self.reads[List], 'replica')
+        self.assertEqual(router.db_for_read(List), 'default')
+
+    def test_sessions_and_tokens_always_use_primary(self):
+        self.handle('get', '/lists/1/')
+        self.assertEqual(self.reads[Session], 'default')
+        self.assertEqual(self.reads[Token], 'default')
+
+    def test_other_views_read_from_primary(self):
+        self.handle('get', '/')
+        self.assertEqual(self.reads[List], 'default')
+
+    def test_posts_read_from_primary_and_note_writes(self):
+        request = self.handle('post', '/lists/1/', writes=True)
+        self.assertEqual(self.reads[List], 'default')
+        self.assertAlmostEqual(request.session[LAST_WRITE_SESSION_KEY],
+                               time.time(), delta=1)
+
+    def test_reads_stick_to_primary_after_a_write(self):
+        self.handle('get', '/api/lists/1/',
+                    session={LAST_WRITE_SESSION_KEY: time.time() - 1})
+        self.assertEqual(self.reads[List], 'default')
+
+    @override_settings(READ_AFTER_WRITE_SECONDS=5)
+    def test_go_back_to_replica_once_write_is_old(self):
+        self.handle('get', '/api/lists/1/',
+                    session={LAST_WRITE_SESSION_KEY: time.time() - 6})
+        self.assertEqual(self.reads[List], 'replica')
+
+    def test_reads_do_not_touch_session(self):
+        request = self.handle('get', '/lists/1/')
+        self.assertFalse(request.session.modified)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_writes_are_not_noted(self):
+        request = self.handle('post', '/lists/1/', writes=True)
+        self.assertEqual(self.reads[List], 'default')
+        self.assertNotIn(LAST_WRITE_SESSION_KEY, request.session)
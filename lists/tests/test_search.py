@@ -0,0 +1,148 @@
+import json
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test import TestCase
+
+from lists.models import Item, List
+from lists.search import fts5_query, search_items
+from superlists import routers
+
+User = get_user_model()
+
+
+class SearchItemsTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(email='edith@example.com')
+        self.other = User.objects.create(email='oni@example.com')
+
+    def texts(self, page):
+        return [result.text for result in page.results]
+
+    def test_finds_items_in_owned_lists(self):
+        list_ = List.create_new(first_item_text='buy peacock feathers',
+                                owner=self.user)
+        Item.objects.create(list=list_, text='use feathers to make a fly')
+        Item.objects.create(list=list_, text='go fishing')
+        page = search_items(self.user, 'feathers')
+        self.assertEqual(
+            sorted(self.texts(page)),
+            ['buy peacock feathers', 'use feathers to make a fly'])
+        self.assertEqual(page.results[0].list_name, 'buy peacock feathers')
+
+    def test_reads_from_replica_chosen_for_request(self):
+        List.create_new(first_item_text='feathers', owner=self.user)
+        routers.state.replica = 'replica1'
+        self.addCleanup(delattr, routers.state, 'replica')
+        with patch('lists.search.connections', {'replica1': connection}):
+            page = search_items(self.user, 'feathers')
+        self.assertEqual(self.texts(page), ['feathers'])
+
+    def test_finds_items_in_lists_shared_with_user(self):
+        list_ = List.create_new(first_item_text='shared feathers',
+                                owner=self.other)
+        list_.shared_with.add(self.user)
+        self.assertEqual(self.texts(search_items(self.user, 'feathers')),
+                         ['shared feathers'])
+
+    def test_ignores_other_peoples_and_anonymous_lists(self):
+        List.create_new(first_item_text='their feathers', owner=self.other)
+        List.create_new(first_item_text='anonymous feathers')
+        self.assertEqual(self.texts(search_items(self.user, 'feathers')), [])
+
+    def test_matches_all_words_and_prefix_of_last(self):
+        List.create_new(first_item_text='buy peacock feathers',
+                        owner=self.user)
+        List.create_new(first_item_text='buy bread', owner=self.user)
+        self.assertEqual(self.texts(search_items(self.user, 'buy pea')),
+                         ['buy peacock feathers'])
+
+    def test_ranks_better_matches_first(self):
+        List.create_new(first_item_text='feathers and a long list of '
+                        'other things to buy at the shops', owner=self.user)
+        List.create_new(first_item_text='feathers feathers', owner=self.user)
+        self.assertEqual(self.texts(search_items(self.user, 'feathers'))[0],
+                         'feathers feathers')
+
+    def test_sees_batch_inserted_and_edited_items(self):
+        list_ = List.objects.create(owner=self.user)
+        Item.objects.bulk_create([Item(list=list_, text='bulk feathers',
+                                       position=1)])
+        item = Item.objects.create(list=list_, text='old text')
+        item.text = 'new feathers'
+        item.save()
+        page = search_items(self.user, 'feathers')
+        self.assertEqual(sorted(self.texts(page)),
+                         ['bulk feathers', 'new feathers'])
+        self.assertEqual(self.texts(search_items(self.user, 'old')), [])
+
+    def test_forgets_deleted_items(self):
+        list_ = List.create_new(first_item_text='keep', owner=self.user)
+        Item.objects.create(list=list_, text='feathers').delete()
+        self.assertEqual(self.texts(search_items(self.user, 'feathers')), [])
+
+    def test_paginates(self):
+        list_ = List.objects.create(owner=self.user)
+        for i in range(5):
+            Item.objects.create(list=list_, text=f'feathers {i}')
+        first = search_items(self.user, 'feathers', page_size=3)
+        second = search_items(self.user, 'feathers', page=2, page_size=3)
+        self.assertEqual(len(first.results), 3)
+        self.assertEqual(first.next_page, 2)
+        self.assertEqual(len(second.results), 2)
+        self.assertIsNone(second.next_page)
+
+    def test_anonymous_user_and_empty_query_find_nothing(self):
+        List.create_new(first_item_text='feathers')
+        self.assertEqual(search_items(AnonymousUser(), 'feathers').results, [])
+        self.assertEqual(search_items(self.user, ' "* ').results, [])
+
+    def test_fallback_treats_wildcards_literally(self):
+        list_ = List.create_new(first_item_text='abc', owner=self.user)
+        Item.objects.create(list=list_, text='a_c and 50% off')
+        with patch.object(connection, 'vendor', 'other'):
+            self.assertEqual(self.texts(search_items(self.user, 'a_c')),
+                             ['a_c and 50% off'])
+            self.assertEqual(self.texts(search_items(self.user, 'a%c')), [])
+
+    def test_fts5_query_quotes_words(self):
+        self.assertEqual(fts5_query('buy "pea'), '"buy" "pea"*')
+
+
+class SearchViewTest(TestCase):
+
+    def test_renders_results_for_logged_in_user(self):
+        user = User.objects.create(email='edith@example.com')
+        List.create_new(first_item_text='peacock feathers', owner=user)
+        self.client.force_login(user)
+        response = self.client.get('/lists/search', {'q': 'peacock'})
+        self.assertTemplateUsed(response, 'search.html')
+        self.assertContains(response, 'peacock feathers')
+
+    def test_asks_anonymous_users_to_log_in(self):
+        response = self.client.get('/lists/search', {'q': 'peacock'})
+        self.assertContains(response, 'Log in to search your lists')
+
+
+class SearchAPITest(TestCase):
+
+    def test_returns_results_as_json(self):
+        user = User.objects.create(email='edith@example.com')
+        list_ = List.create_new(first_item_text='peacock feathers',
+                                owner=user)
+        self.client.force_login(user)
+        response = self.client.get('/api/search/', {'q': 'feathers'})
+        item = list_.item_set.get()
+        self.assertEqual(json.loads(response.content.decode('utf8')), {
+            'results': [{'id': item.id, 'text': 'peacock feathers',
+                         'list': {'id': list_.id, 'name': 'peacock feathers',
+                                  'url': list_.get_absolute_url()}}],
+            'next_page': None,
+        })
+
+    def test_forbidden_for_anonymous_users(self):
+        response = self.client.get('/api/search/', {'q': 'feathers'})
+        self.assertEqual(response.status_code, 403)
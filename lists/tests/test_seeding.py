@@ -0,0 +1,99 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase
+
+from lists.models import Item, List
+from lists.seeding import seed_email, seed_lists
+
+User = get_user_model()
+
+
+def snapshot():
+    return (
+        list(List.objects.order_by('id').values_list(
+            'owner_id', 'first_item_text', 'item_count')),
+        list(Item.objects.order_by('id').values_list('list_id', 'text')),
+        list(List.shared_with.through.objects.order_by('id').values_list(
+            'list_id', 'user_id')),
+    )
+
+
+class SeedListsTest(TestCase):
+
+    def test_creates_requested_rows(self):
+        report = seed_lists(users=5, lists_per_user=4, anonymous_lists=7,
+                            batch_size=6)
+        self.assertEqual(report.users, 5)
+        self.assertEqual(report.lists, 27)
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(List.objects.filter(owner=None).count(), 7)
+        self.assertEqual(
+            List.objects.filter(owner__email=seed_email(0, 3)).count(), 4)
+        self.assertEqual(Item.objects.count(), report.items)
+        self.assertEqual(List.shared_with.through.objects.count(),
+                         report.shares)
+
+    def test_summaries_match_items(self):
+        seed_lists(users=3, lists_per_user=5, anonymous_lists=5)
+        for list_ in List.objects.annotate(items=Count('item')):
+            self.assertEqual(list_.item_count, list_.items)
+            first = list_.item_set.first()
+            self.assertEqual(list_.name, first.text)
+            self.assertEqual(first.text_hash, Item.hash_text(first.text))
+
+    def test_new_items_go_after_seeded_ones(self):
+        seed_lists(users=0, anonymous_lists=1)
+        list_ = List.objects.get()
+        Item.objects.create(list=list_, text='added later')
+        self.assertEqual(list_.item_set.last().text, 'added later')
+
+    def test_lists_are_not_shared_with_their_owner(self):
+        seed_lists(users=4, lists_per_user=10, anonymous_lists=0,
+                   share_ratio=1)
+        self.assertTrue(List.shared_with.through.objects.exists())
+        for list_ in List.objects.all():
+            self.assertNotIn(list_.owner, list_.shared_with.all())
+
+    def test_item_counts_are_bounded(self):
+        seed_lists(users=0, anonymous_lists=200, max_items=10)
+        counts = List.objects.values_list('item_count', flat=True)
+        self.assertEqual(min(counts), 1)
+        self.assertLessEqual(max(counts), 10)
+
+    def test_same_seed_gives_same_data(self):
+        seed_lists(users=3, lists_per_user=3, anonymous_lists=3, seed=7)
+        first = snapshot()
+        List.objects.all().delete()
+        User.objects.all().delete()
+        seed_lists(users=3, lists_per_user=3, anonymous_lists=3, seed=7)
+        second = snapshot()
+        self.assertEqual([row[1:] for row in first[0]],
+                         [row[1:] for row in second[0]])
+        self.assertEqual([row[1] for row in first[1]],
+                         [row[1] for row in second[1]])
+        self.assertEqual([row[1] for row in first[2]],
+                         [row[1] for row in second[2]])
+
+
+class SeedListsCommandTest(TestCase):
+
+    def test_reports_rows_created(self):
+        out = StringIO()
+        call_command('seed_lists', '--users=2', '--lists-per-user=1',
+                     '--anonymous-lists=1', '--keep-search-index', stdout=out)
+        self.assertIn('Created 2 users, 3 lists', out.getvalue())
+
+    @patch('lists.management.commands.seed_lists.seed_lists')
+    def test_reinstalls_search_index_when_seeding_fails(self, mock_seed):
+        mock_seed.side_effect = KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            call_command('seed_lists', stdout=StringIO())
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master "
+                           "WHERE name = 'lists_item_fts'")
+            self.assertEqual(cursor.fetchall(), [('lists_item_fts',)])
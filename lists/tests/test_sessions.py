@@ -0,0 +1,218 @@
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import BACKEND_SESSION_KEY, SESSION_KEY
+from django.contrib.sessions.backends.base import UpdateError
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import User
+from lists.models import List
+from superlists import metrics
+from superlists.local_cache import LocalCache
+from superlists.sessions import SessionStore, local, writer
+
+
+class LocalCacheTest(TestCase):
+
+    def test_drops_least_recently_used(self):
+        cache = LocalCache(2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(len(cache), 2)
+
+    def test_entries_expire(self):
+        cache = LocalCache(10, ttl=60)
+        cache.set('a', 1, ttl=60)
+        cache.set('b', 2, ttl=120)
+        with patch('superlists.local_cache.time.monotonic',
+                   return_value=time.monotonic() + 61):
+            self.assertIsNone(cache.get('a'))
+            self.assertIsNone(cache.get('b'))
+
+    def test_zero_ttl_stores_nothing(self):
+        cache = LocalCache(10, ttl=60)
+        cache.set('a', 1)
+        cache.set('a', 2, ttl=0)
+        self.assertIsNone(cache.get('a'))
+
+
+class SessionStoreTest(TestCase):
+
+    def setUp(self):
+        local.clear()
+        caches['sessions'].clear()
+        metrics.registry.reset()
+
+    def saved_session(self, **data):
+        session = SessionStore()
+        session.update(data)
+        session.save()
+        return session.session_key
+
+    def test_saves_to_database(self):
+        session_key = self.saved_session(colour='red')
+        session = Session.objects.get(session_key=session_key)
+        self.assertEqual(session.get_decoded(), {'colour': 'red'})
+
+    def test_loads_from_local_cache_without_queries(self):
+        session_key = self.saved_session(colour='red')
+        with self.assertNumQueries(0):
+            self.assertEqual(SessionStore(session_key)['colour'], 'red')
+        self.assertEqual(metrics.session_loads.values, {('local',): 1})
+
+    def test_loads_from_shared_cache_without_queries(self):
+        session_key = self.saved_session(colour='red')
+        local.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(SessionStore(session_key)['colour'], 'red')
+        self.assertEqual(metrics.session_loads.values, {('cache',): 1})
+
+    def test_falls_back_to_database_and_caches_result(self):
+        session_key = self.saved_session(colour='red')
+        local.clear()
+        caches['sessions'].clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(SessionStore(session_key)['colour'], 'red')
+        with self.assertNumQueries(0):
+            self.assertEqual(SessionStore(session_key)['colour'], 'red')
+
+    def test_unknown_key_gets_new_session(self):
+        session = SessionStore('x' * 32)
+        self.assertEqual(dict(session), {})
+        self.assertIsNone(session.session_key)
+
+    def test_skips_saving_unchanged_session(self):
+        session_key = self.saved_session(colour='red')
+        session = SessionStore(session_key)
+        session['colour'] = 'red'
+        with self.assertNumQueries(0):
+            session.save()
+        self.assertEqual(metrics.session_saves.values,
+                         {('written',): 1, ('skipped',): 1})
+
+    def test_saves_changed_session(self):
+        session_key = self.saved_session(colour='red')
+        session = SessionStore(session_key)
+        session['colour'] = 'blue'
+        session.save()
+        local.clear()
+        caches['sessions'].clear()
+        self.assertEqual(SessionStore(session_key)['colour'], 'blue')
+
+    def test_cycle_key_keeps_data_and_drops_old_session(self):
+        session_key = self.saved_session(colour='red')
+        session = SessionStore(session_key)
+        session.cycle_key()
+        session.save()
+        self.assertNotEqual(session.session_key, session_key)
+        self.assertFalse(Session.objects.filter(
+            session_key=session_key).exists())
+        self.assertEqual(SessionStore(session.session_key)['colour'], 'red')
+
+    def test_flush_removes_session_everywhere(self):
+        session_key = self.saved_session(colour='red')
+        SessionStore(session_key).flush()
+        self.assertFalse(Session.objects.filter(
+            session_key=session_key).exists())
+        self.assertEqual(dict(SessionStore(session_key)), {})
+
+    def test_saving_deleted_session_raises(self):
+        session_key = self.saved_session(colour='red')
+        in_flight = SessionStore(session_key)
+        in_flight['colour']
+        SessionStore(session_key).flush()
+        in_flight['colour'] = 'blue'
+        with self.assertRaises(UpdateError):
+            in_flight.save()
+        self.assertFalse(Session.objects.filter(
+            session_key=session_key).exists())
+        self.assertEqual(dict(SessionStore(session_key)), {})
+
+    def test_saving_session_deleted_from_database_raises(self):
+        session_key = self.saved_session(colour='red')
+        in_flight = SessionStore(session_key)
+        in_flight['colour']
+        Session.objects.all().delete()
+        caches['sessions'].clear()
+        in_flight['colour'] = 'blue'
+        with self.assertRaises(UpdateError):
+            in_flight.save()
+
+
+@override_settings(SESSION_WRITE_BEHIND_INTERVAL=3600)
+class WriteBehindTest(TestCase):
+
+    def setUp(self):
+        local.clear()
+        caches['sessions'].clear()
+        self.addCleanup(writer.flush)
+
+    def test_writes_reach_database_on_flush(self):
+        sessions = [SessionStore() for _ in range(3)]
+        for session in sessions:
+            session['colour'] = 'red'
+            session.save()
+        self.assertEqual(Session.objects.count(), 0)
+        self.assertEqual(SessionStore(sessions[0].session_key)['colour'],
+                         'red')
+
+        with CaptureQueriesContext(connection) as queries:
+            writer.flush()
+        self.assertEqual(Session.objects.count(), 3)
+        # One DELETE and one INSERT for the whole batch.
+        self.assertEqual(len([query for query in queries
+                              if 'django_session' in query['sql']]), 2)
+
+    def test_only_latest_change_is_written(self):
+        session = SessionStore()
+        session['colour'] = 'red'
+        session.save()
+        session['colour'] = 'blue'
+        session.save()
+        self.assertEqual(len(writer.pending), 1)
+        writer.flush()
+        self.assertEqual(
+            Session.objects.get().get_decoded(), {'colour': 'blue'})
+
+        session.delete()
+        writer.flush()
+        self.assertEqual(Session.objects.count(), 0)
+
+    def test_pending_delete_wins_over_later_saves(self):
+        session = SessionStore()
+        session['colour'] = 'red'
+        session.save()
+        writer.flush()
+        writer.delete(session.session_key)
+        writer.save(session.session_key, 'data', session.get_expiry_date())
+        writer.flush()
+        self.assertEqual(Session.objects.count(), 0)
+
+
+class SessionRequestsTest(TestCase):
+
+    def test_list_pages_make_no_session_queries(self):
+        user = User.objects.create(email='a@b.com')
+        list_ = List.objects.create(owner=user)
+        session = SessionStore()
+        session[SESSION_KEY] = user.pk
+        session[BACKEND_SESSION_KEY] = (
+            'accounts.authentication.PasswordlessAuthenticationBackend')
+        session.save()
+        self.client.cookies['sessionid'] = session.session_key
+
+        for path in (f'/lists/{list_.id}/', f'/api/lists/{list_.id}/'):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(path)
+            self.assertFalse([
+                query for query in queries
+                if 'django_session' in query['sql']
+            ], path)
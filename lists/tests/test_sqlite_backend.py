@@ -0,0 +1,109 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import OperationalError
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase
+
+from superlists import metrics
+from superlists.sqlite_backend import base
+
+
+class TunedSQLiteBackendTest(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'test.sqlite3')
+        self.db = self.connect(pragmas={'busy_timeout': 10})
+        with self.db.cursor() as cursor:
+            cursor.execute('CREATE TABLE thing (id INTEGER PRIMARY KEY)')
+        metrics.registry.reset()
+
+    def connect(self, **options):
+        handler = ConnectionHandler({'default': {
+            'ENGINE': 'superlists.sqlite_backend',
+            'NAME': self.path,
+            'OPTIONS': options,
+        }})
+        db = handler['default']
+        self.addCleanup(db.close)
+        return db
+
+    def lock_database(self):
+        """
+        Takes the write lock from another connection and returns it, to be
+        rolled back to release the lock.
+        """
+        other = sqlite3.connect(self.path, isolation_level=None,
+                                check_same_thread=False)
+        other.execute('BEGIN IMMEDIATE')
+        self.addCleanup(other.close)
+        return other
+
+    def insert(self):
+        with self.db.cursor() as cursor:
+            cursor.execute('INSERT INTO thing DEFAULT VALUES')
+
+    def count(self, counter):
+        return counter.values.get((), 0)
+
+    def test_sets_pragmas(self):
+        with self.db.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 10)
+
+    def test_locked_writes_wait_for_busy_timeout(self):
+        self.db.settings_dict['OPTIONS']['pragmas'] = {'busy_timeout': 1000}
+        self.db.close()
+        other = self.lock_database()
+        threading.Timer(0.03, other.rollback).start()
+        self.insert()
+        self.assertEqual(self.count(base.busy_failures), 0)
+
+    def test_gives_up_after_busy_timeout(self):
+        self.lock_database()
+        start = time.perf_counter()
+        with self.assertRaises(OperationalError):
+            self.insert()
+        # Once, not again for each of several retries.
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(self.count(base.busy_failures), 1)
+
+    def test_transactions_take_the_write_lock_up_front(self):
+        self.db._start_transaction_under_autocommit()
+        self.addCleanup(self.db.connection.rollback)
+        other = sqlite3.connect(self.path, timeout=0)
+        self.addCleanup(other.close)
+        with self.assertRaisesRegex(sqlite3.OperationalError, 'locked'):
+            other.execute('BEGIN IMMEDIATE')
+
+    def test_counts_waits_for_the_write_lock(self):
+        other = self.lock_database()
+        self.db.settings_dict['OPTIONS']['pragmas'] = {'busy_timeout': 1000}
+        self.db.close()
+        threading.Timer(0.03, other.rollback).start()
+        self.db._start_transaction_under_autocommit()
+        self.db.connection.rollback()
+        self.assertEqual(self.count(base.lock_waits), 1)
+        self.assertGreater(self.count(base.lock_wait_time), 0.02)
+
+
+class SQLiteWriteBenchmarkTest(SimpleTestCase):
+
+    def test_reports_both_engines(self):
+        out = StringIO()
+        call_command('sqlite_write_benchmark', '--processes=2',
+                     '--writes=5', stdout=out)
+        self.assertIn('"stock"', out.getvalue())
+        self.assertIn('"tuned"', out.getvalue())
@@ -0,0 +1,114 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from lists.models import Item, List
+from lists.transfer import export_ndjson, import_ndjson
+
+User = get_user_model()
+
+
+def export_lines():
+    out = StringIO()
+    export_ndjson(out, chunk_size=2)
+    return out.getvalue().splitlines()
+
+
+class ExportTest(TestCase):
+
+    def test_writes_records_in_dependency_order(self):
+        user = User.objects.create(email='a@b.com')
+        list_ = List.create_new(first_item_text='first', owner=user)
+        Item.objects.create(list=list_, text='second')
+        list_.shared_with.add(User.objects.create(email='c@d.com'))
+
+        records = [json.loads(line) for line in export_lines()]
+
+        self.assertEqual([record['type'] for record in records],
+                         ['user', 'user', 'list', 'item', 'item', 'share'])
+        self.assertEqual(records[2]['owner'], 'a@b.com')
+        self.assertEqual(records[2]['item_count'], 2)
+        self.assertEqual([records[3]['text'], records[4]['text']],
+                         ['first', 'second'])
+        self.assertEqual(records[5], {'type': 'share', 'list': list_.id,
+                                      'user': 'c@d.com'})
+
+    def test_reads_in_chunks(self):
+        for index in range(5):
+            List.create_new(first_item_text=f'list {index}')
+        with self.assertNumQueries(4 + 4 + 1 + 1):
+            lines = export_lines()
+        self.assertEqual(len(lines), 10)
+
+
+class ImportTest(TestCase):
+
+    def test_round_trip_onto_existing_data(self):
+        user = User.objects.create(email='a@b.com')
+        list_ = List.create_new(first_item_text='first', owner=user)
+        Item.objects.create(list=list_, text='second')
+        list_.shared_with.add(User.objects.create(email='c@d.com'))
+        anonymous = List.create_new(first_item_text='anonymous')
+        lines = export_lines()
+
+        counts = import_ndjson(lines, batch_size=2)
+
+        self.assertEqual(counts, {'user': 0, 'list': 2, 'item': 3,
+                                  'share': 1})
+        self.assertEqual(List.objects.count(), 4)
+        imported = List.objects.exclude(id__in=[list_.id, anonymous.id])
+        copy = imported.get(owner=user)
+        self.assertEqual(copy.name, 'first')
+        self.assertEqual(copy.item_count, 2)
+        self.assertEqual([item.text for item in copy.item_set.all()],
+                         ['first', 'second'])
+        self.assertEqual(list(copy.shared_with.all()),
+                         [User.objects.get(email='c@d.com')])
+        self.assertTrue(copy.item_set.first().text_hash)
+        self.assertEqual(imported.get(owner=None).name, 'anonymous')
+
+    def test_imported_lists_keep_working(self):
+        list_ = List.create_new(first_item_text='first')
+        lines = export_lines()
+        list_.delete()
+        User.objects.all().delete()
+
+        import_ndjson(lines)
+
+        copy = List.objects.get()
+        Item.objects.create(list=copy, text='added later')
+        self.assertEqual([item.text for item in copy.item_set.all()],
+                         ['first', 'added later'])
+        self.assertNotEqual(List.create_new(first_item_text='new').id,
+                            copy.id)
+
+    def test_creates_missing_users(self):
+        owner = User.objects.create(email='a@b.com')
+        List.create_new(first_item_text='first', owner=owner)
+        lines = export_lines()
+        User.objects.all().delete()
+
+        counts = import_ndjson(lines)
+
+        self.assertEqual(counts['user'], 1)
+        self.assertEqual(List.objects.get().owner.email, 'a@b.com')
+
+
+class ExportImportCommandsTest(TestCase):
+
+    def test_commands_round_trip_through_file(self):
+        List.create_new(first_item_text='first')
+        fd, path = tempfile.mkstemp(suffix='.ndjson')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        call_command('export_lists', path, stderr=StringIO())
+        out = StringIO()
+        call_command('import_lists', path, stdout=out)
+        self.assertEqual(List.objects.count(), 2)
+        self.assertIn('Imported 0 users, 1 lists, 1 items and 0 shares',
+                      out.getvalue())
@@ -5,11 +5,12 @@ from lists.views import home_page, new_list, user_not_found_string, view_list
 
 from django.contrib.auth import get_user_model
 from django.http import HttpRequest
-from django.test import TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import resolve
 from django.utils.html import escape
 
 from unittest.mock import patch, Mock
+import json
 import unittest
 
 User = get_user_model()
@@ -27,6 +28,57 @@ class HomePageTest(TestCase):
         response = self.client.get('/')
         self.assertIsInstance(response.context['form'], ItemForm)
 
+    def test_anonymous_home_page_is_publicly_cacheable(self):
+        response = self.client.get('/')
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=300', response['Cache-Control'])
+        self.assertFalse(response.has_header('Vary'))
+        self.assertEqual(response.cookies, {})
+
+    def test_anonymous_home_page_leaves_csrf_token_to_javascript(self):
+        response = self.client.get('/')
+        self.assertContains(response, 'class="lazy-csrf-token"', count=2)
+        self.assertContains(response, 'data-url="/csrf/"')
+
+    @override_settings(ANONYMOUS_HOME_PAGE_MAX_AGE=None)
+    def test_cacheable_mode_can_be_switched_off(self):
+        response = self.client.get('/')
+        self.assertNotContains(response, 'lazy-csrf-token')
+        self.assertIn('csrftoken', response.cookies)
+
+    def test_logged_in_home_page_is_rendered_per_user(self):
+        user = User.objects.create(email='a@b.com')
+        self.client.force_login(user)
+        response = self.client.get('/')
+        self.assertNotIn('public', response.get('Cache-Control', ''))
+        self.assertNotContains(response, 'lazy-csrf-token')
+        self.assertContains(response, 'a@b.com')
+
+    def test_pending_messages_are_not_cached(self):
+        response = self.client.post('/accounts/send_login_email',
+                                    data={'email': 'edith@example.com'},
+                                    follow=True)
+        self.assertNotIn('public', response.get('Cache-Control', ''))
+        self.assertContains(response, 'Check your email')
+
+
+class CsrfTokenViewTest(TestCase):
+
+    def test_returns_token_and_sets_cookie(self):
+        response = self.client.get('/csrf/')
+        token = json.loads(response.content.decode('utf8'))['token']
+        self.assertTrue(token)
+        self.assertIn('csrftoken', response.cookies)
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_token_lets_cached_home_page_forms_post(self):
+        client = Client(enforce_csrf_checks=True)
+        response = client.get('/csrf/')
+        token = json.loads(response.content.decode('utf8'))['token']
+        response = client.post('/lists/new', data={
+            'text': 'A new list item', 'csrfmiddlewaretoken': token})
+        self.assertEqual(response.status_code, 302)
+
 
 class ListViewTest(TestCase):
 
@@ -176,6 +228,35 @@ class MyListsTest(TestCase):
         response = self.client.get('/lists/users/a@b.com/')
         self.assertEqual(response.context['owner'], correct_user)
 
+    def test_shows_owned_and_shared_lists(self):
+        owner = User.objects.create(email='a@b.com')
+        other = User.objects.create(email='other@b.com')
+        List.create_new(first_item_text='mine', owner=owner)
+        shared = List.create_new(first_item_text='theirs', owner=other)
+        shared.shared_with.add(owner)
+        response = self.client.get('/lists/users/a@b.com/')
+        self.assertContains(response, 'mine')
+        self.assertContains(response, 'theirs')
+        self.assertContains(response, 'other@b.com')
+
+    def test_number_of_queries_does_not_grow_with_lists(self):
+        owner = User.objects.create(email='a@b.com')
+        other = User.objects.create(email='other@b.com')
+        for i in range(5):
+            List.create_new(first_item_text=f'mine {i}', owner=owner)
+            List.create_new(first_item_text=f'theirs {i}',
+                            owner=other).shared_with.add(owner)
+        with self.assertNumQueries(3):
+            self.client.get('/lists/users/a@b.com/')
+
+    def test_owned_after_cursor_skips_earlier_lists(self):
+        owner = User.objects.create(email='a@b.com')
+        lists = [List.create_new(first_item_text=f'list {i}', owner=owner)
+                 for i in range(3)]
+        response = self.client.get('/lists/users/a@b.com/',
+                                   {'owned_after': lists[0].id})
+        self.assertEqual(response.context['owned_lists'].lists, lists[1:])
+
 @patch('lists.views.NewListForm')
 class NewListViewUnitTest(unittest.TestCase):
     def setUp(self):
@@ -0,0 +1,167 @@
+"""
+Streaming export and import of lists, items, sharing and users as NDJSON.
+
+Each line is one JSON object with a `type` of "user", "list", "item" or
+"share", written in that order so that everything a record refers to comes
+before it. Both directions work a chunk at a time, so memory use doesn't
+depend on the size of the dataset.
+
+On import, lists and items get new ids: each exported id is shifted past
+the largest id already in the target database, so imported rows can never
+collide with existing ones and no id map has to be kept in memory. Users
+are matched by email.
+"""
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+
+from lists.models import Item, List
+
+User = get_user_model()
+SharedWith = List.shared_with.through
+
+CHUNK_SIZE = 1000
+
+LIST_FIELDS = ('id', 'owner_id', 'first_item_text', 'item_count', 'version',
+               'last_activity')
+ITEM_FIELDS = ('id', 'list_id', 'text', 'position')
+
+
+def chunked(queryset, fields, chunk_size=CHUNK_SIZE):
+    """
+    Yields the `fields` of every row in `queryset` as dicts, reading
+    `chunk_size` rows at a time in primary key order.
+    """
+    last_pk = None
+    while True:
+        chunk = queryset.order_by('pk')
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        rows = list(chunk.values('pk', *fields)[:chunk_size])
+        if not rows:
+            return
+        last_pk = rows[-1].pop('pk')
+        for row in rows[:-1]:
+            row.pop('pk')
+        yield from rows
+
+
+def export_records(chunk_size=CHUNK_SIZE):
+    for row in chunked(User.objects.all(), ['email'], chunk_size):
+        yield {'type': 'user', 'email': row['email']}
+    for row in chunked(List.objects.all(), LIST_FIELDS, chunk_size):
+        yield {'type': 'list',
+               'id': row['id'],
+               'owner': row['owner_id'],
+               'first_item_text': row['first_item_text'],
+               'item_count': row['item_count'],
+               'version': row['version'],
+               'last_activity': row['last_activity']}
+    for row in chunked(Item.objects.all(), ITEM_FIELDS, chunk_size):
+        yield {'type': 'item',
+               'id': row['id'],
+               'list': row['list_id'],
+               'text': row['text'],
+               'position': row['position']}
+    for row in chunked(SharedWith.objects.all(), ['list_id', 'user_id'],
+                       chunk_size):
+        yield {'type': 'share', 'list': row['list_id'],
+               'user': row['user_id']}
+
+
+def export_ndjson(out, chunk_size=CHUNK_SIZE):
+    """
+    Writes every record to the text stream `out`; returns how many.
+    """
+    count = 0
+    for record in export_records(chunk_size):
+        out.write(json.dumps(record, cls=DjangoJSONEncoder) + '\n')
+        count += 1
+    return count
+
+
+class Importer(object):
+
+    def __init__(self, batch_size=CHUNK_SIZE):
+        self.batch_size = batch_size
+        self.list_offset = List.objects.aggregate(last=Max('id'))['last'] or 0
+        self.item_offset = Item.objects.aggregate(last=Max('id'))['last'] or 0
+        self.pending_type = None
+        self.pending = []
+        self.counts = {'user': 0, 'list': 0, 'item': 0, 'share': 0}
+
+    def add(self, record):
+        if record['type'] != self.pending_type or (
+                len(self.pending) >= self.batch_size):
+            self.flush()
+            self.pending_type = record['type']
+        self.pending.append(record)
+
+    def flush(self):
+        if not self.pending:
+            return
+        with transaction.atomic():
+            getattr(self, f'_create_{self.pending_type}s')(self.pending)
+        self.pending = []
+
+    def finish(self):
+        self.flush()
+        # Explicit ids don't advance PostgreSQL's sequences.
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(),
+                                                         [List, Item]):
+                cursor.execute(sql)
+        return self.counts
+
+    def _create_users(self, records):
+        emails = {record['email'] for record in records}
+        existing = set(User.objects.filter(email__in=emails)
+                       .values_list('email', flat=True))
+        User.objects.bulk_create(User(email=email)
+                                 for email in emails - existing)
+        self.counts['user'] += len(emails - existing)
+
+    def _create_lists(self, records):
+        List.objects.bulk_create(
+            List(id=record['id'] + self.list_offset,
+                 owner_id=record['owner'],
+                 first_item_text=record['first_item_text'],
+                 item_count=record['item_count'],
+                 version=record['version'],
+                 last_activity=parse_datetime(record['last_activity']))
+            for record in records)
+        self.counts['list'] += len(records)
+
+    def _create_items(self, records):
+        Item.objects.bulk_create(
+            Item(id=record['id'] + self.item_offset,
+                 list_id=record['list'] + self.list_offset,
+                 text=record['text'],
+                 text_hash=Item.hash_text(record['text']),
+                 position=record['position'])
+            for record in records)
+        self.counts['item'] += len(records)
+
+    def _create_shares(self, records):
+        SharedWith.objects.bulk_create(
+            SharedWith(list_id=record['list'] + self.list_offset,
+                       user_id=record['user'])
+            for record in records)
+        self.counts['share'] += len(records)
+
+
+def import_ndjson(lines, batch_size=CHUNK_SIZE):
+    """
+    Imports records from an iterable of NDJSON lines. Returns the number of
+    rows created of each type.
+    """
+    importer = Importer(batch_size)
+    for line in lines:
+        if line.strip():
+            importer.add(json.loads(line))
+    return importer.finish()
@@ -16,10 +16,22 @@ Including another URLconf
 from django.conf.urls import url
 from django.contrib import admin
 from lists import views
+from superlists.query_budget import QueryBudget, register
 
 urlpatterns = [
     url(r'^new$', views.new_list, name='new_list'),
+    url(r'^search$', views.search, name='search'),
     url(r'^(\d+)/share', views.share_list, name='share_list'),
     url(r'^(\d+)/$', views.view_list, name='view_list'),
     url(r'^users/(.+)/$', views.my_lists, name='my_lists'),
 ]
+
+register(
+    new_list=QueryBudget(queries=6, time_ms=50),
+    search=QueryBudget(queries=3, time_ms=100),
+    # Looks up both the sharee and the logged-in user.
+    share_list=QueryBudget(queries=5, time_ms=50, repeats=2),
+    view_list=QueryBudget(queries=7, time_ms=50),
+    # Looks up both the lists' owner and the logged-in user.
+    my_lists=QueryBudget(queries=5, time_ms=50, repeats=2),
+)
@@ -1,28 +1,68 @@
 import bleach
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage.cookie import CookieStorage
 from django.core.exceptions import ValidationError
+from django.http import JsonResponse
+from django.middleware.csrf import get_token
 from django.shortcuts import redirect, render
+from django.utils.cache import patch_cache_control
+from django.views.decorators.cache import never_cache
 
 from lists.forms import ExistingListItemForm, ItemForm, NewListForm
 from lists.models import Item, List
+from lists.pagination import (owned_lists_page, parse_cursor,
+                              shared_lists_page)
+from lists.permissions import can_add_items
+from lists.search import search_items
 
 User = get_user_model()
 
 
 def home_page(request):
+    if serves_cacheable_home_page(request):
+        # Overriding `user` and `messages` keeps the session untouched, and
+        # `lazy_csrf` leaves the CSRF token for list.js to fetch, so the
+        # response sets no cookies and doesn't vary on them.
+        response = render(request, 'home.html', {
+            'form': ItemForm(),
+            'user': AnonymousUser(),
+            'messages': [],
+            'lazy_csrf': True,
+        })
+        patch_cache_control(response, public=True,
+                            max_age=settings.ANONYMOUS_HOME_PAGE_MAX_AGE)
+        return response
     return render(request, 'home.html', {'form': ItemForm()})
 
 
+def serves_cacheable_home_page(request):
+    """
+    The home page can be shared between visitors who have neither a session
+    nor pending messages, unless the cacheable mode is switched off.
+    """
+    return (settings.ANONYMOUS_HOME_PAGE_MAX_AGE is not None and
+            settings.SESSION_COOKIE_NAME not in request.COOKIES and
+            CookieStorage.cookie_name not in request.COOKIES)
+
+
+@never_cache
+def csrf_token(request):
+    """
+    Hands out a CSRF token, and its cookie, to pages served without one.
+    """
+    return JsonResponse({'token': get_token(request)})
+
+
 def view_list(request, list_id):
-    list_ = List.objects.get(id=list_id)
+    list_ = List.objects.select_related('owner').get(id=list_id)
     form = ExistingListItemForm(for_list=list_)
     if request.method == 'POST':
         form = ExistingListItemForm(for_list=list_, data=request.POST)
         if form.is_valid():
-            if (not(list_.owner) or
-                (request.user == list_.owner) or
-                (request.user in list_.shared_with.all())):
+            if can_add_items(request, list_):
                 Item.objects.create(text=request.POST['text'], list=list_)
             return redirect(list_)
     return render(
@@ -54,8 +94,26 @@ def new_list(request):
 
 
 def my_lists(request, email):
-    owner = User.objects.get(email=email)
-    return render(request, 'my_lists.html', {'owner': owner})
+    if request.user.is_authenticated and request.user.email == email:
+        owner = request.user
+    else:
+        owner = User.objects.get(email=email)
+    owned_lists = owned_lists_page(
+        owner, parse_cursor(request.GET.get('owned_after')))
+    shared_lists = shared_lists_page(
+        owner, parse_cursor(request.GET.get('shared_after')))
+    return render(request, 'my_lists.html', {
+        'owner': owner,
+        'owned_lists': owned_lists,
+        'shared_lists': shared_lists,
+    })
+
+
+def search(request):
+    query = request.GET.get('q', '')
+    page = search_items(request.user, query,
+                        parse_cursor(request.GET.get('page')) or 1)
+    return render(request, 'search.html', {'query': query, 'page': page})
 
 
 def share_list(request, list_id):
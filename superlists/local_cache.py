@@ -0,0 +1,58 @@
+"""
+A small in-process cache, for data read on nearly every request that can
+afford to be a few seconds out of date in other processes.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class LocalCache(object):
+    """
+    A thread-safe mapping of at most `max_entries` values, each kept for
+    at most `ttl` seconds, dropping the least recently used first.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, deadline = entry
+            if deadline <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """
+        Store `value` for `ttl` seconds, or the cache's own TTL if that is
+        shorter or `ttl` is None.
+        """
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.max_entries <= 0:
+            self.delete(key)
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, time.monotonic() + ttl)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,321 @@
+"""
+Prometheus metrics for the site, served at /metrics in the text exposition
+format.
+
+Metrics live in a `Registry` of counters and histograms. Each process
+updates its own copy in memory. When `METRICS_DIR` is set, as it is in
+production, each process also writes its values to its own file in that
+directory, at most every `METRICS_FLUSH_INTERVAL` seconds. A scrape adds up
+every file, so a scrape served by any gunicorn worker reports totals for
+all of them. Files from workers that have exited are kept, so totals never
+go backwards; the directory is emptied when the service starts.
+"""
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Metric(object):
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = None  # Shared with the registry it's added to.
+
+    def key(self, label_values):
+        if len(label_values) != len(self.labels):
+            raise ValueError(f'{self.name} takes labels {self.labels}')
+        return tuple(str(value) for value in label_values)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *label_values, amount=1):
+        key = self.key(label_values)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def merge(self, values, other):
+        for key, value in other:
+            key = tuple(key)
+            values[key] = values.get(key, 0) + value
+
+    def lines(self, values):
+        for key, value in sorted(values.items()):
+            yield f'{self.name}{_labels(self.labels, key)} {_number(value)}'
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *label_values):
+        key = self.key(label_values)
+        with self.lock:
+            counts, total, count = self.values.get(
+                key, ([0] * len(self.buckets), 0, 0))
+            # A new list, so snapshots taken under the lock stay unchanged.
+            counts = list(counts)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self.values[key] = (counts, total + value, count + 1)
+
+    def merge(self, values, other):
+        for key, (counts, total, count) in other:
+            key = tuple(key)
+            old_counts, old_total, old_count = values.get(
+                key, ([0] * len(self.buckets), 0, 0))
+            values[key] = ([a + b for a, b in zip(old_counts, counts)],
+                           old_total + total, old_count + count)
+
+    def lines(self, values):
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _labels(self.labels + ('le',),
+                                 key + (_number(bound),))
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _labels(self.labels + ('le',), key + ('+Inf',))
+            yield f'{self.name}_bucket{labels} {count}'
+            labels = _labels(self.labels, key)
+            yield f'{self.name}_sum{labels} {_number(total)}'
+            yield f'{self.name}_count{labels} {count}'
+
+
+class Registry(object):
+
+    def __init__(self):
+        self.metrics = OrderedDict()
+        self.lock = threading.Lock()
+        # Separate from `lock`, which snapshot() takes while flushing.
+        self.flush_lock = threading.Lock()
+        self.last_flush = 0
+        self.file_name = None
+
+    def counter(self, name, help, labels=()):
+        return self._add(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def _add(self, metric):
+        metric.lock = self.lock
+        self.metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self):
+        with self.lock:
+            return {name: list(metric.values.items())
+                    for name, metric in self.metrics.items()}
+
+    def reset(self):
+        with self.lock:
+            for metric in self.metrics.values():
+                metric.values = {}
+
+    def maybe_flush(self, directory):
+        interval = settings.METRICS_FLUSH_INTERVAL
+        if time.monotonic() - self.last_flush < interval:
+            return
+        # Another thread flushing now will write the same values.
+        if self.flush_lock.acquire(blocking=False):
+            try:
+                self._flush(directory)
+            finally:
+                self.flush_lock.release()
+
+    def flush(self, directory):
+        """
+        Write this process's values to its file in `directory`.
+        """
+        with self.flush_lock:
+            self._flush(directory)
+
+    def _flush(self, directory):
+        self.last_flush = time.monotonic()
+        if self.file_name is None:
+            self.file_name = f'{os.getpid()}-{uuid.uuid4().hex[:8]}.json'
+        os.makedirs(directory, exist_ok=True)
+        # A temporary file of its own, renamed into place once complete, so
+        # readers never see a partly written file.
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as out:
+                json.dump(self.snapshot(), out)
+            os.replace(temp_path, os.path.join(directory, self.file_name))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def collect(self, directory=None):
+        """
+        Returns each metric's values, summed over every process writing to
+        `directory`, or just this process's if it is None.
+        """
+        if directory is None:
+            snapshots = [self.snapshot()]
+        else:
+            self.flush(directory)
+            snapshots = []
+            for file_name in os.listdir(directory):
+                if file_name.endswith('.json'):
+                    snapshot = _read_snapshot(
+                        os.path.join(directory, file_name))
+                    if snapshot is not None:
+                        snapshots.append(snapshot)
+        totals = {name: {} for name in self.metrics}
+        for snapshot in snapshots:
+            for name, values in snapshot.items():
+                if name in self.metrics:
+                    self.metrics[name].merge(totals[name], values)
+        return totals
+
+    def exposition(self, directory=None):
+        totals = self.collect(directory)
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.help}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            lines.extend(metric.lines(totals[name]))
+        return '\n'.join(lines) + '\n'
+
+
+def _read_snapshot(path):
+    """
+    Returns the values in the file at `path`, or None if it has gone or
+    can't be read, which the next scrape will make up for.
+    """
+    try:
+        with open(path) as data:
+            return json.load(data)
+    except (OSError, ValueError):
+        logger.warning('Skipping unreadable metrics file %s', path)
+        return None
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"'
+                     for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _escape(value):
+    return (value.replace('\\', '\\\\').replace('\n', '\\n')
+            .replace('"', '\\"'))
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = Registry()
+
+request_duration = registry.histogram(
+    'superlists_request_duration_seconds',
+    'Time taken to handle requests.', ['view', 'method'])
+responses = registry.counter(
+    'superlists_responses_total',
+    'Responses sent, by status code.', ['view', 'status'])
+db_queries = registry.counter(
+    'superlists_db_queries_total',
+    'Database queries made while handling requests, on every database.',
+    ['view'])
+db_time = registry.counter(
+    'superlists_db_query_seconds_total',
+    'Time spent in database queries while handling requests.', ['view'])
+login_emails_queued = registry.counter(
+    'superlists_login_emails_queued_total', 'Login emails queued to send.')
+emails_sent = registry.counter(
+    'superlists_emails_sent_total', 'Emails sent from the outbox.')
+email_send_errors = registry.counter(
+    'superlists_email_send_errors_total',
+    'Failed attempts at sending emails from the outbox.')
+items_created = registry.counter(
+    'superlists_items_created_total', 'List items created.')
+fragment_cache_lookups = registry.counter(
+    'superlists_fragment_cache_lookups_total',
+    'Lookups of rendered list fragments, by whether they hit the cache.',
+    ['result'])
+user_cache_lookups = registry.counter(
+    'superlists_user_cache_lookups_total',
+    'Lookups of the user of a request, by whether they hit the cache.',
+    ['result'])
+session_loads = registry.counter(
+    'superlists_session_loads_total',
+    'Sessions loaded, by where they were found.', ['source'])
+session_saves = registry.counter(
+    'superlists_session_saves_total',
+    'Session saves, by whether they were written or skipped as unchanged.',
+    ['result'])
+session_db_writes = registry.counter(
+    'superlists_session_db_writes_total',
+    'Session saves and deletes written to the database.')
+
+
+@atexit.register
+def _flush_on_exit():
+    if settings.configured and settings.METRICS_DIR and registry.file_name:
+        registry.flush(settings.METRICS_DIR)
+
+
+class MetricsMiddleware(object):
+    """
+    Times every request and counts its response status and database use,
+    labelled with the name of the URL it resolved to.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or 'unnamed') if match else 'unresolved'
+        request_duration.observe(elapsed, view, request.method)
+        responses.inc(view, response.status_code)
+        stats = getattr(request, 'query_stats', None)
+        if stats is not None:
+            db_queries.inc(view, amount=stats.count)
+            db_time.inc(view, amount=stats.time_ms / 1000)
+        if settings.METRICS_DIR:
+            try:
+                registry.maybe_flush(settings.METRICS_DIR)
+            except Exception:
+                # Metrics are never worth failing a request over.
+                logger.exception('Flushing metrics failed')
+        return response
+
+
+def metrics(request):
+    return HttpResponse(registry.exposition(settings.METRICS_DIR),
+                        content_type=CONTENT_TYPE)
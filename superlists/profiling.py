@@ -0,0 +1,183 @@
+"""
+Opt-in profiling of live requests.
+
+`ProfilingMiddleware` profiles one request in every `PROFILING_SAMPLE_RATE`
+(none if it is 0), plus any request carrying an `X-Profile` header from an
+address in `PROFILING_ALLOWED_IPS`. Each profile is written to a file in a
+folder per URL name under `PROFILING_DIR`, and once there are more than
+`PROFILING_MAX_FILES` of them the oldest are removed.
+
+With `PROFILING_MODE = 'sampler'` a background thread samples the request
+thread's stack every `PROFILING_SAMPLER_INTERVAL` seconds and writes the
+counts as collapsed stacks (`.collapsed`), ready for flamegraph.pl or
+speedscope. With 'cprofile' the request runs under cProfile and its
+statistics are dumped for pstats (`.prof`). `manage.py merge_profiles`
+combines either kind into a single report.
+"""
+import cProfile
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+EXTENSIONS = {'sampler': '.collapsed', 'cprofile': '.prof'}
+
+
+class StackSampler(object):
+    """
+    Counts the stacks seen in thread `thread_id` every `interval` seconds,
+    keyed by their collapsed form: frames from outermost to innermost,
+    separated by semicolons.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+
+    def dump(self, path):
+        with open(path, 'w') as out:
+            for stack, count in self.stacks.most_common():
+                out.write(f'{stack} {count}\n')
+
+
+def collapse(frame):
+    labels = []
+    while frame is not None:
+        code = frame.f_code
+        labels.append(f'{code.co_name} ({short_path(code.co_filename)}:'
+                      f'{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+def short_path(filename):
+    for marker in ('/site-packages/', '/lib/python'):
+        if marker in filename:
+            return filename.rsplit(marker, 1)[1]
+    return os.path.relpath(filename, settings.BASE_DIR)
+
+
+def client_ip(request):
+    header = settings.PROFILING_CLIENT_IP_HEADER
+    return request.META.get(header or 'REMOTE_ADDR', '')
+
+
+def should_profile(request):
+    if PROFILE_HEADER in request.META:
+        return client_ip(request) in settings.PROFILING_ALLOWED_IPS
+    rate = settings.PROFILING_SAMPLE_RATE
+    return bool(rate) and random.randrange(rate) == 0
+
+
+def profile_path(url_name, mode):
+    """
+    Returns a new file path for a profile of a request to `url_name`,
+    creating its folder if need be.
+    """
+    directory = os.path.join(settings.PROFILING_DIR, url_name)
+    os.makedirs(directory, exist_ok=True)
+    name = (f'{time.strftime("%Y%m%dT%H%M%S")}-{os.getpid()}-'
+            f'{uuid.uuid4().hex[:8]}{EXTENSIONS[mode]}')
+    return os.path.join(directory, name)
+
+
+def profile_files(directory, url_names=None):
+    """
+    Returns the paths of every profile under `directory`, or only those
+    for the given URL names, oldest first.
+    """
+    modified = {}
+    if not os.path.isdir(directory):
+        return []
+    for url_name in sorted(os.listdir(directory)):
+        if url_names and url_name not in url_names:
+            continue
+        folder = os.path.join(directory, url_name)
+        if not os.path.isdir(folder):
+            continue
+        for name in os.listdir(folder):
+            if not name.endswith(tuple(EXTENSIONS.values())):
+                continue
+            path = os.path.join(folder, name)
+            try:
+                modified[path] = os.path.getmtime(path)
+            except FileNotFoundError:
+                pass  # Rotated away by another worker since listdir.
+    return sorted(modified, key=modified.get)
+
+
+def rotate(directory, max_files):
+    for path in profile_files(directory)[:-max_files or None]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # Another worker got there first.
+
+
+class ProfilingMiddleware(object):
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not should_profile(request):
+            return self.get_response(request)
+
+        mode = settings.PROFILING_MODE
+        if mode == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = StackSampler(threading.get_ident(),
+                                    settings.PROFILING_SAMPLER_INTERVAL)
+            profiler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            if mode == 'cprofile':
+                profiler.disable()
+            else:
+                profiler.stop()
+
+        match = getattr(request, 'resolver_match', None)
+        try:
+            path = profile_path((match.url_name or 'unnamed') if match
+                                else 'unresolved', mode)
+            if mode == 'cprofile':
+                profiler.dump_stats(path)
+            else:
+                profiler.dump(path)
+            rotate(settings.PROFILING_DIR, settings.PROFILING_MAX_FILES)
+        except Exception:
+            # Never fail the request over its profile.
+            logger.exception('Writing profile failed')
+            return response
+        if PROFILE_HEADER in request.META:
+            response['X-Profile'] = os.path.relpath(path,
+                                                    settings.PROFILING_DIR)
+        return response
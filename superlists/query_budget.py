@@ -0,0 +1,179 @@
+"""
+Per-view budgets for the SQL a request may issue.
+
+`QueryBudgetMiddleware` records every query made while handling a request,
+on `default` and on each of the `DATABASE_REPLICAS`: how many there were,
+how long they took, and which query signatures (the SQL with its literal
+values blanked out) ran more than once, which is the fingerprint of an N+1
+loop. URL modules declare a `QueryBudget` for each of their URL names
+with `register`, and a request that goes over its budget is logged. When
+`QUERY_BUDGET_ENFORCE` is set, as it is under test, going over the query
+count or repeat limits raises `QueryBudgetExceeded` instead, so the test
+that made the request fails. Time limits are only ever logged, since
+timings in CI are too noisy to fail on.
+"""
+import logging
+import re
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudget(namedtuple('QueryBudget', ['queries', 'time_ms',
+                                             'repeats'])):
+    """
+    At most `queries` queries taking `time_ms` milliseconds in total, with
+    no signature run more than `repeats` times. None means unlimited.
+    """
+    __slots__ = ()
+
+    def __new__(cls, queries=None, time_ms=None, repeats=1):
+        return super().__new__(cls, queries, time_ms, repeats)
+
+
+QueryStats = namedtuple('QueryStats', ['count', 'time_ms', 'repeated'])
+
+budgets = {}
+
+
+def register(**url_budgets):
+    """
+    Declare the `QueryBudget` for each URL name given as a keyword.
+    """
+    budgets.update(url_budgets)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+VALUE_LIST = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)')
+EXECUTEMANY_PREFIX = re.compile(r'^\S+ times: ')
+# Transaction control around atomic blocks: BEGIN and COMMIT in autocommit
+# mode, savepoints when nested, as they always are in tests.
+TRANSACTION_CONTROL = re.compile(
+    r'^(?:BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE SAVEPOINT)\b')
+
+
+def signature(sql):
+    """
+    Returns `sql` with literal values replaced by `?`, so that the same
+    query run for different rows has the same signature.
+    """
+    sql = EXECUTEMANY_PREFIX.sub('', sql)
+    sql = STRING_LITERAL.sub('?', sql)
+    sql = NUMBER_LITERAL.sub('?', sql)
+    return VALUE_LIST.sub('(...)', sql)
+
+
+def query_stats(queries):
+    """
+    Summarises `queries`, in the format of `connection.queries`.
+    """
+    queries = [query for query in queries
+               if not TRANSACTION_CONTROL.match(query['sql'])]
+    signatures = Counter(signature(query['sql']) for query in queries)
+    return QueryStats(
+        count=len(queries),
+        time_ms=sum(float(query['time']) for query in queries) * 1000,
+        repeated={sql: count for sql, count in signatures.items()
+                  if count > 1},
+    )
+
+
+def recorded_aliases():
+    """
+    Returns the aliases of the databases whose queries are recorded.
+    """
+    return [DEFAULT_DB_ALIAS] + [alias for alias in settings.DATABASE_REPLICAS
+                                 if alias != DEFAULT_DB_ALIAS]
+
+
+@contextmanager
+def recording_queries(aliases):
+    """
+    Collects the queries this thread makes on each of `aliases` while in
+    the block into the list it yields, in the format of
+    `connection.queries`. Connections are per thread, so this is safe under
+    threaded workers, and none are opened that weren't going to be anyway.
+    """
+    databases = [connections[alias] for alias in aliases]
+    forced = [db.force_debug_cursor for db in databases]
+    # Set aside, so that the log can't fill up with earlier queries; put
+    # back after, for anything else reading it, like assertNumQueries.
+    earlier = [list(db.queries_log) for db in databases]
+    for db in databases:
+        db.force_debug_cursor = True
+        db.queries_log.clear()
+    queries = []
+    try:
+        yield queries
+    finally:
+        for db, was_forced, logged in zip(databases, forced, earlier):
+            db.force_debug_cursor = was_forced
+            if len(db.queries_log) == db.queries_log.maxlen:
+                logger.warning('Only the last %d queries on %s were recorded',
+                               db.queries_log.maxlen, db.alias)
+            recorded = list(db.queries_log)
+            queries.extend(recorded)
+            if logged:
+                db.queries_log.clear()
+                db.queries_log.extend(logged + recorded)
+
+
+def violations(budget, stats):
+    """
+    Returns a list of (description, enforced) pairs, one for each way in
+    which `stats` goes over `budget`.
+    """
+    found = []
+    if budget.queries is not None and stats.count > budget.queries:
+        found.append((f'{stats.count} queries, budget {budget.queries}',
+                      True))
+    if budget.repeats is not None:
+        for sql, count in stats.repeated.items():
+            if count > budget.repeats:
+                found.append((f'query run {count} times, budget '
+                              f'{budget.repeats}: {sql}', True))
+    if budget.time_ms is not None and stats.time_ms > budget.time_ms:
+        found.append((f'{stats.time_ms:.1f}ms in queries, budget '
+                      f'{budget.time_ms}ms', False))
+    return found
+
+
+class QueryBudgetMiddleware(object):
+    """
+    Records the queries made by each request in `request.query_stats` and
+    checks them against the budget for the URL name it resolved to.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with recording_queries(recorded_aliases()) as queries:
+            response = self.get_response(request)
+        request.query_stats = query_stats(queries)
+        match = getattr(request, 'resolver_match', None)
+        budget = budgets.get(match.url_name) if match else None
+        if budget is not None:
+            self.check(match.url_name, budget, request.query_stats)
+        return response
+
+    def check(self, url_name, budget, stats):
+        found = violations(budget, stats)
+        for description, enforced in found:
+            logger.warning('Query budget exceeded by %s: %s',
+                           url_name, description)
+        enforced = [description for description, enforced in found
+                    if enforced]
+        if enforced and settings.QUERY_BUDGET_ENFORCE:
+            raise QueryBudgetExceeded(
+                f'{url_name} went over its query budget: '
+                + '; '.join(enforced))
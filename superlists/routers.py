@@ -0,0 +1,80 @@
+"""
+Read replicas for GET traffic.
+
+`ReplicaMiddleware` decides, per request, whether reads may go to one of
+the `DATABASE_REPLICAS`: only GET and HEAD requests to the URL names in
+`REPLICA_READ_VIEWS` do, and only if the visitor hasn't written anything
+in the last `READ_AFTER_WRITE_SECONDS`, so people always see their own
+changes. Any write made while handling a request is noted in the session
+for that purpose. `ReplicaRouter` then routes reads by that decision,
+except for the models in `PRIMARY_ONLY_MODELS`, which are always read
+from and written to the primary, `default`. Outside of requests, in
+management commands for instance, everything uses the primary.
+"""
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+LAST_WRITE_SESSION_KEY = '_last_write'
+
+state = threading.local()
+
+
+def _is_primary_only(model):
+    return model._meta.label_lower in settings.PRIMARY_ONLY_MODELS
+
+
+class ReplicaRouter(object):
+
+    def db_for_read(self, model, **hints):
+        if _is_primary_only(model):
+            return DEFAULT_DB_ALIAS
+        return getattr(state, 'replica', None) or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if not _is_primary_only(model):
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold copies of the primary's rows.
+        return True
+
+
+def wrote_recently(session):
+    last_write = session.get(LAST_WRITE_SESSION_KEY)
+    return (last_write is not None and
+            time.time() - last_write < settings.READ_AFTER_WRITE_SECONDS)
+
+
+class ReplicaMiddleware(object):
+    """
+    Must come after SessionMiddleware, which saves the note of a write.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state.replica = None
+        state.wrote = False
+        try:
+            response = self.get_response(request)
+            # Without replicas there's nothing to stick to.
+            if state.wrote and settings.DATABASE_REPLICAS:
+                request.session[LAST_WRITE_SESSION_KEY] = time.time()
+            return response
+        finally:
+            state.replica = None
+            state.wrote = False
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (settings.DATABASE_REPLICAS and
+                request.method in ('GET', 'HEAD') and
+                request.resolver_match.url_name in
+                settings.REPLICA_READ_VIEWS and
+                not wrote_recently(request.session)):
+            state.replica = random.choice(settings.DATABASE_REPLICAS)
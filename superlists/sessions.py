@@ -0,0 +1,268 @@
+"""
+A session engine that keeps the database off the request path.
+
+Sessions are looked up in three places, nearest first: a `LocalCache` in
+each process, holding sessions for up to `SESSION_LOCAL_CACHE_TTL`
+seconds; the `SESSION_CACHE_ALIAS` cache, shared by every gunicorn worker;
+and finally `django_session`, which stays the record of every session.
+
+Saves go to both caches straight away, but reach the database through a
+`WriteBehind` queue, flushed in batches by a background thread every
+`SESSION_WRITE_BEHIND_INTERVAL` seconds, or straight away if that is None,
+as it is in tests. Saves that wouldn't change what is stored are skipped,
+so requests that only read their session don't write anything at all.
+
+Another worker can go on seeing a session as it was for up to
+`SESSION_LOCAL_CACHE_TTL` seconds after it changes, so keep that short.
+
+Deleting a session leaves a marker in the shared cache for a while, and
+saving one checks that it hasn't been deleted, raising `UpdateError` as
+the database backend does, so a request that was under way when someone
+logged out can't bring their session back.
+"""
+import atexit
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.backends.base import CreateError, UpdateError
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.cache import caches
+from django.db import DatabaseError, router, transaction
+from django.utils import timezone
+
+from superlists import metrics
+from superlists.local_cache import LocalCache
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'superlists.sessions.'
+
+# Sessions whose data hasn't changed are saved again only once their expiry
+# would move by more than this fraction of SESSION_COOKIE_AGE.
+EXPIRY_DRIFT = 0.01
+
+# Sessions written to the database per statement.
+WRITE_BATCH_SIZE = 500
+
+# Stored in the shared cache in place of a deleted session, for long
+# enough that the delete has reached the database by the time it expires.
+DELETED = 'deleted'
+DELETED_TTL = 60
+
+local = LocalCache(settings.SESSION_LOCAL_CACHE_SIZE,
+                   settings.SESSION_LOCAL_CACHE_TTL)
+
+
+class WriteBehind(object):
+    """
+    Saves and deletes of sessions waiting to be made in the database. Only
+    the latest change to each session is kept, and a pending delete is
+    never undone by a save queued after it.
+    """
+
+    def __init__(self):
+        self.pending = OrderedDict()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def save(self, session_key, session_data, expire_date):
+        self._queue(session_key, (session_data, expire_date))
+
+    def delete(self, session_key):
+        self._queue(session_key, None)
+
+    def _queue(self, session_key, change):
+        interval = settings.SESSION_WRITE_BEHIND_INTERVAL
+        if interval is None:
+            self.write({session_key: change})
+            return
+        with self.lock:
+            if change is not None and session_key in self.pending and (
+                    self.pending[session_key] is None):
+                # Deleted since; session keys are never reused.
+                return
+            self.pending.pop(session_key, None)
+            self.pending[session_key] = change
+            # Also restarts the thread in processes forked after it began.
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.run, args=(interval,), daemon=True,
+                    name='session-write-behind')
+                self.thread.start()
+
+    def run(self, interval):
+        while True:
+            time.sleep(interval)
+            self.flush()
+
+    def flush(self):
+        """
+        Write everything pending to the database. Changes that fail are
+        queued again, unless a later change to the same session has been.
+        """
+        with self.lock:
+            batch, self.pending = self.pending, OrderedDict()
+        if not batch:
+            return
+        try:
+            self.write(batch)
+        except DatabaseError:
+            logger.exception('Writing %d sessions failed', len(batch))
+            with self.lock:
+                for session_key, change in batch.items():
+                    self.pending.setdefault(session_key, change)
+
+    def write(self, batch):
+        model = SessionStore.get_model_class()
+        using = router.db_for_write(model)
+        keys = list(batch)
+        for start in range(0, len(keys), WRITE_BATCH_SIZE):
+            chunk = keys[start:start + WRITE_BATCH_SIZE]
+            with transaction.atomic(using=using):
+                model.objects.using(using).filter(
+                    session_key__in=chunk).delete()
+                model.objects.using(using).bulk_create([
+                    model(session_key=key, session_data=batch[key][0],
+                          expire_date=batch[key][1])
+                    for key in chunk if batch[key] is not None
+                ])
+        metrics.session_db_writes.inc(amount=len(keys))
+
+
+writer = WriteBehind()
+
+
+@atexit.register
+def _flush_on_exit():
+    writer.flush()
+
+
+class SessionStore(DBStore):
+    """
+    Sessions cached in this process and in a shared cache, and written to
+    the database behind the request.
+    """
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        self._cache = caches[settings.SESSION_CACHE_ALIAS]
+        # The data and expiry date last loaded or saved, if any.
+        self._stored = None
+        super().__init__(session_key)
+
+    @property
+    def cache_key(self):
+        return self.cache_key_prefix + self._get_or_create_session_key()
+
+    def _lookup(self, session_key):
+        """
+        Returns the stored (session_data, expire_date) of `session_key`,
+        or None, from the nearest place that has it.
+        """
+        entry = local.get(session_key)
+        if entry is not None:
+            metrics.session_loads.inc('local')
+            return entry
+        try:
+            entry = self._cache.get(self.cache_key_prefix + session_key)
+        except Exception:
+            # Some backends raise on invalid keys; see cached_db.
+            entry = None
+        if entry == DELETED:
+            metrics.session_loads.inc('missing')
+            return None
+        source = 'cache'
+        if entry is None:
+            session = self.model.objects.filter(
+                session_key=session_key).first()
+            if session is None:
+                metrics.session_loads.inc('missing')
+                return None
+            entry = (session.session_data, session.expire_date)
+            source = 'db'
+        age = self.get_expiry_age(expiry=entry[1])
+        local.set(session_key, entry, age)
+        if source == 'db':
+            self._cache.set(self.cache_key_prefix + session_key, entry, age)
+        metrics.session_loads.inc(source)
+        return entry
+
+    def load(self):
+        entry = self._lookup(self.session_key) if self.session_key else None
+        if entry is None or entry[1] <= timezone.now():
+            self._session_key = None
+            return {}
+        session_data, expire_date = entry
+        data = self.decode(session_data)
+        self._stored = (copy.deepcopy(data), expire_date)
+        return data
+
+    def exists(self, session_key):
+        if session_key and (
+                local.get(session_key) is not None or
+                self.cache_key_prefix + session_key in self._cache):
+            return True
+        return super().exists(session_key)
+
+    def _still_exists(self, session_key):
+        entry = self._cache.get(self.cache_key_prefix + session_key)
+        if entry is not None:
+            return entry != DELETED
+        with writer.lock:
+            if session_key in writer.pending:
+                return writer.pending[session_key] is not None
+        return super().exists(session_key)
+
+    def _unchanged(self, data, expire_date):
+        if self._stored is None:
+            return False
+        stored_data, stored_expire_date = self._stored
+        drift = timedelta(seconds=settings.SESSION_COOKIE_AGE * EXPIRY_DRIFT)
+        return (data == stored_data and
+                abs(expire_date - stored_expire_date) < drift)
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            self.create()
+            return self.save()
+        data = self._get_session(no_load=must_create)
+        expire_date = self.get_expiry_date()
+        if not must_create and self._unchanged(data, expire_date):
+            metrics.session_saves.inc('skipped')
+            return
+        session_key = self.session_key
+        entry = (self.encode(data), expire_date)
+        age = self.get_expiry_age(expiry=expire_date)
+        if must_create:
+            # Only reserves the key: create() is always followed by a save,
+            # which writes the session to the database.
+            if not self._cache.add(self.cache_key, entry, age):
+                raise CreateError
+            local.set(session_key, entry, age)
+            self._stored = None
+            return
+        if not self._still_exists(session_key):
+            local.delete(session_key)
+            raise UpdateError
+        self._cache.set(self.cache_key, entry, age)
+        local.set(session_key, entry, age)
+        writer.save(session_key, *entry)
+        self._stored = (copy.deepcopy(data), expire_date)
+        metrics.session_saves.inc('written')
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        local.delete(session_key)
+        self._cache.set(self.cache_key_prefix + session_key, DELETED,
+                        DELETED_TTL)
+        writer.delete(session_key)
+        if session_key == self.session_key:
+            self._stored = None
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/1.11/ref/settings/
 """
 
 import os
+import sys
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -36,6 +37,9 @@ else:
     SECRET_KEY = 'insecure-key-for-dev'
     ALLOWED_HOSTS = []
 
+# Running under `manage.py test`.
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -55,11 +59,81 @@ AUTHENTICATION_BACKENDS = [
     'accounts.authentication.PasswordlessAuthenticationBackend',
 ]
 
+# Users of authenticated requests are cached in each process, up to
+# USER_CACHE_SIZE of them for up to USER_CACHE_TTL seconds, and checked
+# against generations kept in USER_CACHE_ALIAS, which must be a cache all
+# workers share. Tests roll back users without signals, so don't cache.
+USER_CACHE_SIZE = 10000
+USER_CACHE_TTL = 0 if TESTING else 300
+USER_CACHE_ALIAS = 'sessions'
+
+# Login links work once, for this long after they're sent. Spent and
+# expired tokens are removed by `manage.py purge_login_tokens`.
+LOGIN_TOKEN_TTL_MINUTES = 60
+
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_HOST_USER = 'shaun.lee@gmail.com'
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_PASSWORD')
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
+# Seconds to wait on the SMTP server before giving up on a connection.
+EMAIL_TIMEOUT = 30
+
+# Email is queued in the outbox and sent by `manage.py send_queued_email`,
+# EMAIL_OUTBOX_BATCH_SIZE emails at a time over up to
+# EMAIL_OUTBOX_CONCURRENCY connections. Failed emails are retried after
+# EMAIL_OUTBOX_RETRY_BACKOFF seconds, doubling each time up to
+# EMAIL_OUTBOX_MAX_RETRY_BACKOFF, for EMAIL_OUTBOX_MAX_ATTEMPTS attempts,
+# or until the email's send_before, which for login emails is when the
+# link in them stops working.
+# See accounts.outbox.
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_CONCURRENCY = 4
+EMAIL_OUTBOX_LEASE = 300
+EMAIL_OUTBOX_MAX_ATTEMPTS = 8
+EMAIL_OUTBOX_RETRY_BACKOFF = 30
+EMAIL_OUTBOX_MAX_RETRY_BACKOFF = 60 * 60
+EMAIL_OUTBOX_POLL_INTERVAL = 1
+
+# Seconds that shared caches may keep the home page served to visitors
+# with no session; None always renders it per visitor.
+ANONYMOUS_HOME_PAGE_MAX_AGE = 300
+
+# Anonymous lists idle for longer than this are pruned by
+# `manage.py prune_anonymous_lists`.
+ANONYMOUS_LIST_TTL_DAYS = 30
+
+# Server-sent list events: seconds between heartbeats (and cross-process
+# version checks), seconds before a stream is recycled, how long browsers
+# wait before reconnecting, and how many streams each process serves at
+# once, each holding one of gunicorn's --threads.
+LIST_EVENTS_HEARTBEAT = 15
+LIST_EVENTS_MAX_DURATION = 300
+LIST_EVENTS_RETRY_MS = 3000
+LIST_EVENTS_MAX_STREAMS = 40
+
+# Requests over the query budget declared for their URL name are logged;
+# with this set, going over the query count or repeat limits also raises.
+QUERY_BUDGET_ENFORCE = TESTING
+
+# Where each process writes its metrics for /metrics to add up; None keeps
+# them in memory, which only suits a single process. Values are written at
+# most every METRICS_FLUSH_INTERVAL seconds.
+METRICS_DIR = None if DEBUG else os.path.join(BASE_DIR, 'metrics')
+METRICS_FLUSH_INTERVAL = 1
+
+# Profile one request in every PROFILING_SAMPLE_RATE (0 for none), and any
+# request with an X-Profile header from PROFILING_ALLOWED_IPS, as seen in
+# PROFILING_CLIENT_IP_HEADER (REMOTE_ADDR if None). PROFILING_MODE is
+# 'sampler' for collapsed stacks or 'cprofile' for pstats dumps; see
+# superlists.profiling.
+PROFILING_SAMPLE_RATE = int(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_ALLOWED_IPS = os.environ.get('PROFILING_ALLOWED_IPS', '').split()
+PROFILING_CLIENT_IP_HEADER = None if DEBUG else 'HTTP_X_REAL_IP'
+PROFILING_MODE = os.environ.get('PROFILING_MODE', 'sampler')
+PROFILING_SAMPLER_INTERVAL = 0.005
+PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILING_MAX_FILES = 1000
 
 LOGGING = {
     'version': 1,
@@ -74,13 +148,20 @@ LOGGING = {
         'django': {
             'handlers': ['console'],
         },
+        'superlists': {
+            'handlers': ['console'],
+        },
     },
     'root': {'level': 'INFO'}
 }
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'superlists.profiling.ProfilingMiddleware',
+    'superlists.metrics.MetricsMiddleware',
+    'superlists.query_budget.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'superlists.routers.ReplicaMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -112,13 +193,101 @@ WSGI_APPLICATION = 'superlists.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/1.11/ref/settings/#databases
 
+# The tuned SQLite backend in superlists.sqlite_backend takes its settings
+# in OPTIONS, for instance {'pragmas': {'busy_timeout': 10000}}.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'superlists.sqlite_backend',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
     }
 }
 
+# Read replicas of `default`, given as space-separated SQLite files, for
+# instance copies of db.sqlite3 when trying this out locally. Replicas on
+# another engine are added to DATABASES and DATABASE_REPLICAS in the same
+# way. Tests run everything against `default`.
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+        os.environ.get('DJANGO_SQLITE_REPLICAS', '').split(), start=1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        'ENGINE': 'superlists.sqlite_backend',
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['superlists.routers.ReplicaRouter']
+
+# GET requests to these URL names read from a replica, unless the visitor
+# has written something in the last READ_AFTER_WRITE_SECONDS.
+REPLICA_READ_VIEWS = [
+    'view_list', 'my_lists', 'search',
+    'api_list', 'api_user_lists', 'api_search',
+]
+READ_AFTER_WRITE_SECONDS = 10
+
+# Models that are only ever read from the primary.
+PRIMARY_ONLY_MODELS = ['sessions.session', 'accounts.token']
+
+
+# Caches
+# https://docs.djangoproject.com/en/1.11/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fragments',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+if not DEBUG:
+    # Shared by all gunicorn workers on the box.
+    CACHES['fragments'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'fragments'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+    # Sessions culled from here are read back from the database.
+    CACHES['sessions'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'sessions'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    }
+if TESTING:
+    # Test databases reuse list ids, so versioned keys would collide
+    # between tests. Tests of the fragment cache switch it back on.
+    CACHES['fragments'] = {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }
+
+# Rendered fragments of list pages, keyed by list version.
+LIST_FRAGMENT_CACHE = 'fragments'
+LIST_FRAGMENT_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+# Sessions
+# https://docs.djangoproject.com/en/1.11/topics/http/sessions/
+
+# Sessions are read from a per-process LRU of up to SESSION_LOCAL_CACHE_SIZE
+# entries, kept for SESSION_LOCAL_CACHE_TTL seconds, then from the shared
+# SESSION_CACHE_ALIAS cache, and only then from the database. Changes are
+# written to the database in batches every SESSION_WRITE_BEHIND_INTERVAL
+# seconds, or during the request if it is None. See superlists.sessions.
+SESSION_ENGINE = 'superlists.sessions'
+SESSION_CACHE_ALIAS = 'sessions'
+SESSION_LOCAL_CACHE_SIZE = 10000
+SESSION_LOCAL_CACHE_TTL = 2
+SESSION_WRITE_BEHIND_INTERVAL = None if TESTING else 1
+
 
 # Password validation
 # https://docs.djangoproject.com/en/1.11/ref/settings/#auth-password-validators
@@ -0,0 +1,96 @@
+"""
+SQLite tuned for several gunicorn workers writing to one database file.
+
+Every new connection is set up with `PRAGMAS`: write-ahead logging, so
+readers and the writer don't block each other; `synchronous=NORMAL`, which
+is safe under WAL; memory-mapped I/O, a larger page cache, and a busy
+timeout so that a writer waits for the lock instead of failing at once.
+
+Transactions start with BEGIN IMMEDIATE, taking the write lock up front
+where the busy timeout applies, rather than upgrading a read lock half way
+through, which fails immediately if another connection is writing.
+Statements aren't retried: SQLite already backs off and tries again for up
+to the busy timeout, so the busy timeout is the longest a request waits for
+a lock, and a statement that still finds the database locked fails.
+
+Lock waits and failures are counted in `superlists.metrics`.
+
+Settings keys in OPTIONS, besides those of the stock backend: `pragmas`
+(merged over `PRAGMAS`).
+"""
+import time
+
+from django.db.backends.sqlite3 import base
+
+from superlists import metrics
+
+# In order: the busy timeout comes first so that the others wait for locks.
+PRAGMAS = {
+    'busy_timeout': 5000,
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # In KiB when negative.
+    'temp_store': 'memory',
+}
+# Waits for the write lock shorter than this aren't counted.
+LOCK_WAIT_THRESHOLD = 0.001
+
+lock_waits = metrics.registry.counter(
+    'superlists_sqlite_lock_waits_total',
+    'Transactions that had to wait for the SQLite write lock.')
+lock_wait_time = metrics.registry.counter(
+    'superlists_sqlite_lock_wait_seconds_total',
+    'Time spent waiting for the SQLite write lock.')
+busy_failures = metrics.registry.counter(
+    'superlists_sqlite_busy_failures_total',
+    'Statements that found SQLite locked for the whole busy timeout.')
+
+
+def is_locked_error(error):
+    message = str(error)
+    return 'database is locked' in message or 'database is busy' in message
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = dict(PRAGMAS, **kwargs.pop('pragmas', {}))
+        # The busy_timeout pragma takes over from the driver's timeout.
+        kwargs['timeout'] = 0
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def create_cursor(self, name=None):
+        return self.connection.cursor(factory=CountingCursorWrapper)
+
+    def _start_transaction_under_autocommit(self):
+        start = time.perf_counter()
+        self.cursor().execute('BEGIN IMMEDIATE')
+        waited = time.perf_counter() - start
+        if waited >= LOCK_WAIT_THRESHOLD:
+            lock_waits.inc()
+            lock_wait_time.inc(amount=waited)
+
+
+class CountingCursorWrapper(base.SQLiteCursorWrapper):
+
+    def execute(self, query, params=None):
+        return self._count_failures(super().execute, query, params)
+
+    def executemany(self, query, param_list):
+        return self._count_failures(super().executemany, query, param_list)
+
+    def _count_failures(self, method, *args):
+        try:
+            return method(*args)
+        except base.Database.OperationalError as error:
+            if is_locked_error(error):
+                busy_failures.inc()
+            raise
@@ -18,10 +18,20 @@ from lists import views as list_views
 from lists import urls as list_urls
 from lists import api_urls
 from accounts import urls as accounts_urls
+from superlists import metrics
+from superlists.query_budget import QueryBudget, register
 
 urlpatterns = [
     url(r'^$', list_views.home_page, name='home'),
+    url(r'^csrf/$', list_views.csrf_token, name='csrf_token'),
     url(r'^lists/', include(list_urls)),
     url(r'^accounts/', include(accounts_urls)),
     url(r'^api/', include(api_urls)),
+    url(r'^metrics$', metrics.metrics, name='metrics'),
 ]
+
+register(
+    home=QueryBudget(queries=2, time_ms=20),
+    csrf_token=QueryBudget(queries=2, time_ms=20),
+    metrics=QueryBudget(queries=0),
+)